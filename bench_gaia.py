@@ -0,0 +1,410 @@
+"""
+Benchmark / load test for the Gaia MCP server.
+
+Runs gaia_mcp_server in-process against fake_gaia (or an external fake Gaia
+via --upstream) and drives it at fixed concurrency, either through the
+FastAPI app ("http:*" scenarios) or through the FastMCP in-memory client
+transport ("mcp:*" scenarios). Prints one JSON document with RPS, latency
+percentiles, errors, memory (RSS growth per scenario and the process
+high-water mark) and upstream request counts:
+
+    python bench_gaia.py --scenario http:ask --concurrency 32 --requests 500
+    python bench_gaia.py --scenario all --output bench.json
+    python bench_gaia.py --scenario all --baseline bench.json   # exit 1 on regression
+    python bench_gaia.py --scenario http:ask --startup-budget-ms 2000
+
+Cold-start import time of the server modules is measured in fresh
+interpreters and reported under "startup".
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+FAKE_GAIA_HOST = "http://fake-gaia.local"
+
+# Timed in this order; the last one is what --startup-budget-ms applies to
+STARTUP_MODULES = ("gaia_service", "gaia_mcp_server")
+
+SCENARIOS = (
+    "http:ask",
+    "http:ask_stream",
+    "http:search",
+    "http:discover",
+    "mcp:ask",
+    "mcp:ask_stream",
+    "mcp:search",
+    "mcp:discover",
+)
+
+
+# === Statistics ===
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(latencies: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(latencies)
+
+    def ms(v: Optional[float]) -> Optional[float]:
+        return round(v * 1000, 3) if v is not None else None
+
+    return {
+        "p50": ms(percentile(ordered, 50)),
+        "p95": ms(percentile(ordered, 95)),
+        "p99": ms(percentile(ordered, 99)),
+        "max": ms(ordered[-1] if ordered else None),
+        "mean": ms(sum(ordered) / len(ordered) if ordered else None),
+    }
+
+
+def rss_high_water_kb() -> int:
+    # Peak over the whole process lifetime, i.e. every scenario run so far
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def rss_kb() -> Optional[int]:
+    # Current resident set size; Linux only (None elsewhere)
+    try:
+        with open("/proc/self/statm") as f:
+            resident = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident * resource.getpagesize() // 1024
+
+
+# === Scenarios ===
+def _question(args: argparse.Namespace, i: int) -> str:
+    return f"benchmark question {i % args.distinct if args.distinct else i}"
+
+
+def http_scenario(name: str, client: Any, args: argparse.Namespace) -> Callable[[int], Awaitable[None]]:
+    async def check(resp: Any) -> None:
+        if resp.status_code >= 400:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    async def ask(i: int) -> None:
+        await check(await client.post("/gaia_qa", params={"question": _question(args, i)}))
+
+    async def ask_stream(i: int) -> None:
+        resp = await client.post("/gaia_qa/stream", params={"question": _question(args, i)})
+        await check(resp)
+        if "event: error" in resp.text:
+            raise RuntimeError("stream error event")
+
+    async def search(i: int) -> None:
+        params = {"keyword": _question(args, i), "max_results": args.max_results}
+        await check(await client.post("/search_objects/stream", params=params))
+
+    async def discover(i: int) -> None:
+        await check(await client.post("/discover_tools/stream", params={"refresh": args.refresh}))
+
+    return {"ask": ask, "ask_stream": ask_stream, "search": search, "discover": discover}[name]
+
+
+def mcp_scenario(name: str, client: Any, args: argparse.Namespace) -> Callable[[int], Awaitable[None]]:
+    async def ask(i: int) -> None:
+        await client.call_tool("ask", {"question": _question(args, i)})
+
+    async def ask_stream(i: int) -> None:
+        await client.call_tool("ask_stream", {"question": _question(args, i)})
+
+    async def search(i: int) -> None:
+        await client.call_tool(
+            "search_objects_stream", {"keyword": _question(args, i), "max_results": args.max_results}
+        )
+
+    async def discover(i: int) -> None:
+        await client.call_tool("discover_tools_stream", {"refresh": args.refresh})
+
+    return {"ask": ask, "ask_stream": ask_stream, "search": search, "discover": discover}[name]
+
+
+# === Load Generator ===
+async def warm_up(call: Callable[[int], Awaitable[None]], count: int) -> None:
+    for i in range(count):
+        try:
+            await call(-1 - i)
+        except Exception:
+            pass
+
+
+async def drive(call: Callable[[int], Awaitable[None]], args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run `call` from `args.concurrency` workers until `args.requests` calls
+    have completed or `args.duration` seconds have passed.
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+
+    async def worker() -> None:
+        nonlocal issued
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif issued >= args.requests:
+                return
+            i = issued
+            issued += 1
+            t0 = time.perf_counter()
+            try:
+                await call(i)
+            except Exception as e:
+                key = str(e)[:80] or type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+            else:
+                latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": issued,
+        "ok": len(latencies),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+
+async def run_scenario(scenario: str, args: argparse.Namespace, fake: Any) -> Dict[str, Any]:
+    import httpx
+    from fastmcp import Client
+    import gaia_service
+    import gaia_mcp_server
+    from gaia_http import GaiaHTTPPool, init_pool
+
+    kind, name = scenario.split(":", 1)
+    transport = httpx.ASGITransport(fake) if fake is not None else None
+    pool = await init_pool(GaiaHTTPPool(transport=transport))
+    # Start every scenario cold so runs are comparable
+    gaia_service.datasets_cache.invalidate()
+    gaia_service.discovery_cache.invalidate()
+
+    async def measure(call: Callable[[int], Awaitable[None]]) -> Dict[str, Any]:
+        await warm_up(call, args.warmup)
+        if fake is not None:
+            fake.state.requests.clear()
+        before = pool.stats()
+        rss_before = rss_kb()
+        if args.tracemalloc:
+            tracemalloc.start()
+        result = await drive(call, args)
+        if args.tracemalloc:
+            result["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        after = pool.stats()
+        rss_after = rss_kb()
+        upstream = after["requests_total"] - before["requests_total"]
+        result.update({
+            "scenario": scenario,
+            "rss_kb": rss_after,
+            "rss_delta_kb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "process_rss_high_water_kb": rss_high_water_kb(),
+            "upstream_requests": upstream,
+            "upstream_retries": after["retries"] - before["retries"],
+            "upstream_by_endpoint": dict(fake.state.requests) if fake is not None else {},
+            "upstream_per_request": round(upstream / result["ok"], 3) if result["ok"] else None,
+        })
+        return result
+
+    if kind == "http":
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(gaia_mcp_server.app), base_url="http://bench", timeout=None
+        ) as client:
+            result = await measure(http_scenario(name, client, args))
+        await pool.close()
+        return result
+    # The in-memory client runs the server lifespan, which closes the pool on exit
+    async with Client(gaia_mcp_server.mcp) as client:
+        return await measure(mcp_scenario(name, client, args))
+
+
+# === Cold Start ===
+def measure_startup(runs: int) -> Dict[str, Any]:
+    """
+    Import time of each of STARTUP_MODULES in a fresh interpreter (what a
+    new replica pays before serving), plus the whole process for the last
+    one. Min and median over `runs` runs.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    report: Dict[str, Any] = {"runs": runs}
+    for module in STARTUP_MODULES:
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        imports, processes = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True
+            )
+            processes.append(time.perf_counter() - started)
+            imports.append(float(proc.stdout.split()[-1]))
+        imports.sort()
+        processes.sort()
+        report[module] = {
+            "import_ms": {"min": round(imports[0] * 1000, 1), "median": round(imports[runs // 2] * 1000, 1)},
+            "process_ms": {"min": round(processes[0] * 1000, 1), "median": round(processes[runs // 2] * 1000, 1)},
+        }
+    return report
+
+
+# === Regression Check ===
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    startup: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """
+    Flag scenarios whose p95 latency grew, or whose RPS dropped, by more
+    than `tolerance` (a fraction) against a previous run's output; likewise
+    for the server's cold-start import time.
+    """
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    module = STARTUP_MODULES[-1]
+    old_startup = (baseline.get("startup") or {}).get(module)
+    if startup and old_startup:
+        old_ms, new_ms = old_startup["import_ms"]["min"], startup[module]["import_ms"]["min"]
+        if new_ms > old_ms * (1 + tolerance):
+            regressions.append(f"startup: {module} import {old_ms}ms -> {new_ms}ms")
+    for r in results:
+        old = previous.get(r["scenario"])
+        if old is None:
+            continue
+        old_p95, new_p95 = old["latency_ms"]["p95"], r["latency_ms"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{r['scenario']}: p95 {old_p95}ms -> {new_p95}ms")
+        if old["rps"] and r["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}: rps {old['rps']} -> {r['rps']}")
+        if r["errors"] > old["errors"]:
+            regressions.append(f"{r['scenario']}: errors {old['errors']} -> {r['errors']}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Gaia MCP server against a fake Gaia")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS + ("all",),
+                        help="Scenario to run (repeatable). Default: http:ask")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--duration", type=float, default=0.0, help="Run each scenario for this many seconds instead")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded requests before measuring")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Cycle through this many distinct questions/keywords (0 = all distinct)")
+    parser.add_argument("--max-results", type=int, default=100, help="max_results for search scenarios")
+    parser.add_argument("--refresh", action="store_true", help="Bypass dataset/discovery caches in discover scenarios")
+    parser.add_argument("--answer-cache", default="off", help="GAIA_ANSWER_CACHE for the run (memory|sqlite|off)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report Python heap peak (slows the run down noticeably)")
+    # Fake Gaia shape
+    parser.add_argument("--upstream", help="Use an already running Gaia (e.g. fake_gaia.py) instead of an in-process fake")
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--datasets", type=int, default=5)
+    parser.add_argument("--objects", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    # Output
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression vs baseline (fraction)")
+    parser.add_argument("--log-level", default="WARNING")
+    # Cold start
+    parser.add_argument("--startup-runs", type=int, default=3, help="Fresh-interpreter import timings (0 = skip)")
+    parser.add_argument("--startup-budget-ms", type=float, default=0.0,
+                        help="Fail (exit 1) if importing gaia_mcp_server takes longer (0 = no budget)")
+    return parser.parse_args(argv)
+
+
+async def main(args: argparse.Namespace) -> int:
+    from gaia_config import load_config
+
+    # Per-request INFO logs from httpx/mcp would dominate the measurement
+    load_config(log_level=args.log_level)
+    logging.getLogger().setLevel(args.log_level)
+    for name in ("httpx", "mcp", "fastmcp", "FastMCP"):
+        logging.getLogger(name).setLevel(args.log_level)
+    scenarios = args.scenario or ["http:ask"]
+    if "all" in scenarios:
+        scenarios = list(SCENARIOS)
+    fake = None
+    if not args.upstream:
+        import fake_gaia
+        fake = fake_gaia.create_app(
+            datasets=args.datasets,
+            objects=args.objects,
+            latency=args.latency,
+            token_delay=args.token_delay,
+            error_rate=args.error_rate,
+            payload_bytes=args.payload_bytes,
+        )
+    startup = measure_startup(args.startup_runs) if args.startup_runs > 0 else None
+    if startup:
+        for module in STARTUP_MODULES:
+            timing = startup[module]
+            print(
+                f"{'import ' + module:<24} import={timing['import_ms']['min']}ms "
+                f"process={timing['process_ms']['min']}ms (min of {args.startup_runs})",
+                file=sys.stderr,
+            )
+    results = []
+    for scenario in scenarios:
+        result = await run_scenario(scenario, args, fake)
+        lat = result["latency_ms"]
+        print(
+            f"{scenario:<16} rps={result['rps']:<8} p50={lat['p50']}ms p95={lat['p95']}ms "
+            f"p99={lat['p99']}ms errors={result['errors']} upstream={result['upstream_requests']}",
+            file=sys.stderr,
+        )
+        results.append(result)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "python": platform.python_version(),
+        "startup": startup,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, startup)
+    if startup and args.startup_budget_ms:
+        import_ms = startup[STARTUP_MODULES[-1]]["import_ms"]["min"]
+        if import_ms > args.startup_budget_ms:
+            regressions.append(f"startup: {STARTUP_MODULES[-1]} import {import_ms}ms > budget {args.startup_budget_ms}ms")
+    for r in regressions:
+        print(f"REGRESSION {r}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # gaia_service reads its configuration at import time, so set it up first
+    os.environ["GAIA_HOST"] = args.upstream or FAKE_GAIA_HOST
+    os.environ["GAIA_ANSWER_CACHE"] = args.answer_cache
+    # Measure the server, not the per-tenant rate limit
+    os.environ.setdefault("GAIA_TENANT_RATE", "0")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Cohesity Gaia endpoints used by gaia_service.
+
+Not a faithful reimplementation: it serves deterministic, synthetic data
+shaped like Gaia's responses so the MCP server can be exercised without
+a real Gaia host. Point GAIA_HOST at it:
+
+    python fake_gaia.py --port 9000
+    GAIA_HOST=http://127.0.0.1:9000 python gaia_mcp_server.py
+"""
+import json
+import random
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.routing import Match
+
+
+_EXTENSIONS = ("txt", "pdf", "docx")
+
+
+def create_app(
+    datasets: int = 5,
+    objects: int = 25,
+    latency: float = 0.0,
+    token_delay: float = 0.02,
+    error_rate: float = 0.0,
+    payload_bytes: int = 0,
+    seed: int = 0,
+    sse: bool = True,
+) -> FastAPI:
+    """
+    Build the fake Gaia app.
+
+    - datasets: number of datasets returned by /datasets
+    - objects: total number of objects matched by every /objects search
+    - latency: delay (seconds) before every response
+    - token_delay: delay between streamed /ask tokens
+    - error_rate: fraction of requests (0-1) answered with 503
+    - payload_bytes: pad each object's text and each answer to about this size
+    - sse: stream /ask as server-sent events when the client accepts them
+      (False: always answer with plain JSON)
+
+    Requests received per route (including injected failures) are counted in
+    app.state.requests, e.g. {"GET /v2/mcm/gaia/objects": 12}.
+    """
+    app = FastAPI(title="Fake Gaia")
+    app.state.requests = Counter()
+    rng = random.Random(seed)
+
+    def _pad(text: str) -> str:
+        if len(text) >= payload_bytes:
+            return text
+        return text + " " + "x" * (payload_bytes - len(text) - 1)
+
+    @app.middleware("http")
+    async def inject_errors(request: Request, call_next):
+        if error_rate and rng.random() < error_rate:
+            await asyncio.sleep(latency)
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def count_requests(request: Request, call_next):
+        # Label by route template so /dataset/{ds_id}/discovery is one counter
+        path = next(
+            (r.path for r in app.routes if r.matches(request.scope)[0] == Match.FULL),
+            request.url.path,
+        )
+        app.state.requests[f"{request.method} {path}"] += 1
+        return await call_next(request)
+
+    def _datasets() -> List[Dict[str, Any]]:
+        return [
+            {"id": f"ds-{i}", "name": f"dataset_{i}", "description": f"Synthetic dataset {i}"}
+            for i in range(datasets)
+        ]
+
+    @app.get("/v2/mcm/gaia/datasets")
+    async def list_datasets() -> Dict[str, Any]:
+        await asyncio.sleep(latency)
+        return {"datasets": _datasets()}
+
+    @app.get("/v2/mcm/gaia/dataset/{ds_id}/discovery")
+    async def discovery(ds_id: str) -> Dict[str, Any]:
+        await asyncio.sleep(latency)
+        return {"results": [{"description": f"Documents about topic {ds_id}"}]}
+
+    @app.get("/v2/mcm/gaia/objects")
+    async def list_objects(
+        request: Request,
+        keyword: str = "",
+        semanticSearchString: str = "",
+        pageSize: int = 100,
+        paginationCookie: str = "0",
+    ) -> Dict[str, Any]:
+        await asyncio.sleep(latency)
+        query = keyword or semanticSearchString
+        start = int(paginationCookie or 0)
+        end = min(start + pageSize, objects)
+        # A dataset-scoped search sees a shifted window of objects (datasets overlap),
+        # scored a little lower per dataset; scores descend within each result list
+        dataset_ids = request.query_params.getlist("datasetIds")
+        d = int(dataset_ids[0].rpartition("-")[2]) if dataset_ids else 0
+        # Filters are deliberately ignored so the server's local fallback is exercised
+        return {
+            "objects": [
+                {
+                    "id": f"obj-{i + 3 * d}",
+                    "text": _pad(f"Object {i + 3 * d} matching {query!r}"),
+                    "name": f"file_{i + 3 * d}.{_EXTENSIONS[(i + 3 * d) % len(_EXTENSIONS)]}",
+                    "sizeBytes": 1024 * ((i + 3 * d) % 50 + 1),
+                    "score": round(1 - i / (objects + 1) - d * 0.01, 4),
+                }
+                for i in range(start, end)
+            ],
+            "paginationCookie": str(end) if end < objects else None,
+        }
+
+    @app.post("/v2/mcm/gaia/ask")
+    async def ask(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        question = body.get("queryString", "")
+        words = _pad(f"This is a synthetic answer to: {question}").split(" ")
+        citations = [{"documentId": "obj-0", "text": "Synthetic citation"}]
+        if not sse or "text/event-stream" not in request.headers.get("accept", ""):
+            return {"responseString": " ".join(words), "documents": [{"citations": citations}]}
+
+        async def events():
+            for i, word in enumerate(words):
+                token = word if i == 0 else " " + word
+                yield f"data: {json.dumps({'responseString': token})}\n\n"
+                await asyncio.sleep(token_delay)
+            yield f"data: {json.dumps({'documents': [{'citations': citations}]})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake Gaia server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--datasets", type=int, default=5)
+    parser.add_argument("--objects", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--no-sse", action="store_true", help="answer /ask with plain JSON only")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(
+            datasets=args.datasets,
+            objects=args.objects,
+            latency=args.latency,
+            token_delay=args.token_delay,
+            error_rate=args.error_rate,
+            payload_bytes=args.payload_bytes,
+            sse=not args.no_sse,
+        ),
+        host=args.host,
+        port=args.port,
+    )
@@ -0,0 +1,818 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from gaia_deadline import detached, within_deadline
+from gaia_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+GAIA_CACHE_TTL = float(os.getenv("GAIA_CACHE_TTL", "300"))
+GAIA_CACHE_STALE_TTL = float(os.getenv("GAIA_CACHE_STALE_TTL", "3600"))
+GAIA_CACHE_MAXSIZE = int(os.getenv("GAIA_CACHE_MAXSIZE", "1024"))
+# Answers may be stale while their datasets change, so the answer cache is opt-in
+GAIA_ANSWER_CACHE = os.getenv("GAIA_ANSWER_CACHE", "off")  # memory | sqlite | off
+GAIA_ANSWER_CACHE_PATH = os.getenv("GAIA_ANSWER_CACHE_PATH", "gaia_answers.sqlite3")
+GAIA_ANSWER_CACHE_TTL = float(os.getenv("GAIA_ANSWER_CACHE_TTL", "3600"))
+GAIA_ANSWER_CACHE_MAXSIZE = int(os.getenv("GAIA_ANSWER_CACHE_MAXSIZE", "1000"))
+# Jaccard similarity (0-1) of query shingles for a near-duplicate hit; unset disables
+GAIA_ANSWER_CACHE_SIMILARITY = os.getenv("GAIA_ANSWER_CACHE_SIMILARITY", "")
+# Local copies of Gaia objects by id: memory only, memory + sqlite cold tier, or off
+GAIA_CONTENT_STORE = os.getenv("GAIA_CONTENT_STORE", "memory")  # memory | sqlite | off
+GAIA_CONTENT_STORE_PATH = os.getenv("GAIA_CONTENT_STORE_PATH", "gaia_content.sqlite3")
+GAIA_CONTENT_STORE_TTL = float(os.getenv("GAIA_CONTENT_STORE_TTL", "3600"))
+# Byte budgets (encoded JSON) of the hot in-memory tier and the cold on-disk tier
+GAIA_CONTENT_MEMORY_BYTES = int(os.getenv("GAIA_CONTENT_MEMORY_BYTES", str(64 * 1024 * 1024)))
+GAIA_CONTENT_DISK_BYTES = int(os.getenv("GAIA_CONTENT_DISK_BYTES", str(1024 * 1024 * 1024)))
+# Pages of fetched objects waiting to be stored in the background; more are dropped
+GAIA_CONTENT_QUEUE_PAGES = int(os.getenv("GAIA_CONTENT_QUEUE_PAGES", "64"))
+
+
+def credential_digest(api_key: str) -> str:
+    """
+    Short, non-reversible fingerprint of an API key for use in cache keys.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+# === Single-flight ===
+class _Flight:
+    __slots__ = ("task", "waiters", "abandoned")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls onto one in-flight task.
+
+    Every caller awaits the shared task through asyncio.shield, so a caller
+    being cancelled (e.g. its MCP client disconnected) never cancels the work
+    for the others. With cancel_when_abandoned, the shared task is cancelled
+    once the last waiting caller has gone; otherwise it runs to completion.
+    The shared task runs without the leader's deadline; each caller waits
+    only until its own deadline (see gaia_deadline).
+    """
+
+    def __init__(self, name: str, cancel_when_abandoned: bool = True):
+        self.name = name
+        self.cancel_when_abandoned = cancel_when_abandoned
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        # A cancelled flight may take a few loop iterations to finish; don't join it
+        if flight is None or flight.abandoned:
+            flight = self._flights[key] = _Flight(detached(fn))
+            self.leaders += 1
+
+            def done(t: "asyncio.Task[Any]", key: Hashable = key, flight: _Flight = flight) -> None:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                # Mark the exception as retrieved even if every caller went away
+                if not t.cancelled():
+                    t.exception()
+
+            flight.task.add_done_callback(done)
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await within_deadline(asyncio.shield(flight.task))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done() and self.cancel_when_abandoned:
+                self.abandoned += 1
+                flight.abandoned = True
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.stored_at = time.monotonic()
+
+
+# === TTL + Stale-While-Revalidate Cache ===
+class AsyncTTLCache:
+    """
+    In-process async cache with TTL, LRU size bound and stale-while-revalidate.
+
+    - Fresh entries (age < ttl) are returned directly.
+    - Stale entries (ttl <= age < ttl + stale_ttl) are returned immediately while
+      a single background task refreshes them.
+    - Misses are single-flight: concurrent callers for the same key share one
+      upstream fetch, which completes (and is cached) even if they all go away.
+      Failed fetches are never cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = GAIA_CACHE_TTL,
+        stale_ttl: float = GAIA_CACHE_STALE_TTL,
+        maxsize: int = GAIA_CACHE_MAXSIZE,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flight = SingleFlight(name, cancel_when_abandoned=False)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        refresh: bool = False,
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and not refresh:
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._revalidate(key, fetch)
+                return entry.value
+        self.misses += 1
+        return await self._flight.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._flight:
+            return
+        # Not bound by the deadline of the request that noticed the stale entry
+        task = detached(lambda: self._flight.do(key, lambda: self._fetch_and_store(key, fetch)))
+
+        def done(t: "asyncio.Task[Any]") -> None:
+            if not t.cancelled() and t.exception() is not None:
+                self.refresh_errors += 1
+                logger.warning("Background refresh of %s cache failed: %r", self.name, t.exception())
+
+        task.add_done_callback(done)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = _Entry(value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "in_flight": len(self._flight),
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+# === Answer Cache ===
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case-fold, drop punctuation and collapse whitespace so trivially
+    rephrased questions ("What is X?" / "what is x") share a cache key.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.casefold())).strip()
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + size] for i in range(max(1, len(padded) - size + 1)))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AnswerCacheBackend:
+    """
+    Storage interface for AnswerCache. Values are JSON-serializable dicts;
+    `scope` groups entries that may answer each other's similar queries.
+    """
+
+    def get(self, key: str, min_stored_at: float) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, key: str, scope: str, query: str, value: Dict[str, Any]) -> int:
+        """Store an entry and return how many entries were evicted to make room."""
+        raise NotImplementedError
+
+    def candidates(self, scope: str, min_stored_at: float) -> List[Tuple[str, str]]:
+        """(key, normalized query) for every live entry in a scope."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryAnswerBackend(AnswerCacheBackend):
+    def __init__(self, maxsize: int = GAIA_ANSWER_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[str, str, Dict[str, Any], float]]" = OrderedDict()
+        self._scopes: Dict[str, Set[str]] = {}
+
+    def get(self, key: str, min_stored_at: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[3] < min_stored_at:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: str, scope: str, query: str, value: Dict[str, Any]) -> int:
+        self._entries[key] = (scope, query, value, time.time())
+        self._entries.move_to_end(key)
+        self._scopes.setdefault(scope, set()).add(key)
+        evicted = 0
+        while len(self._entries) > self.maxsize:
+            old_key, (old_scope, _, _, _) = self._entries.popitem(last=False)
+            keys = self._scopes.get(old_scope)
+            if keys is not None:
+                keys.discard(old_key)
+                if not keys:
+                    del self._scopes[old_scope]
+            evicted += 1
+        return evicted
+
+    def candidates(self, scope: str, min_stored_at: float) -> List[Tuple[str, str]]:
+        out = []
+        for key in self._scopes.get(scope, ()):
+            _, query, _, stored_at = self._entries[key]
+            if stored_at >= min_stored_at:
+                out.append((key, query))
+        return out
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerBackend(AnswerCacheBackend):
+    """
+    On-disk backend so cached answers survive restarts. LRU is tracked with
+    an accessed_at column; expiry uses wall-clock stored_at.
+    """
+
+    def __init__(self, path: str = GAIA_ANSWER_CACHE_PATH, maxsize: int = GAIA_ANSWER_CACHE_MAXSIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # Only this (non-default) backend needs sqlite3; keep it off the import path
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, scope TEXT NOT NULL, query TEXT NOT NULL,"
+            " value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed_at)")
+
+    def get(self, key: str, min_stored_at: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM answers WHERE key = ? AND stored_at >= ?", (key, min_stored_at)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, scope: str, query: str, value: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, scope, query, value, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, query, json.dumps(value), now, now),
+            )
+            cur = self._db.execute(
+                "DELETE FROM answers WHERE key IN ("
+                " SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+            return cur.rowcount
+
+    def candidates(self, scope: str, min_stored_at: float) -> List[Tuple[str, str]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, query FROM answers WHERE scope = ? AND stored_at >= ?", (scope, min_stored_at)
+            ).fetchall()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class AnswerCache:
+    """
+    Cache of QA answers keyed by (scope, normalized query).
+
+    `scope` is an opaque digest of everything else that determines the answer
+    (Gaia identity, datasets, LLM, conversation history). Exact hits match the
+    normalized query; if a similarity threshold is set, a query whose shingle
+    Jaccard similarity with a cached query in the same scope reaches it is
+    also served from the cache.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[AnswerCacheBackend],
+        ttl: float = GAIA_ANSWER_CACHE_TTL,
+        similarity: Optional[float] = None,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity = similarity
+        self._shingles: Dict[str, FrozenSet[str]] = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        kind = GAIA_ANSWER_CACHE.lower()
+        backend: Optional[AnswerCacheBackend] = None
+        if kind == "sqlite":
+            backend = SQLiteAnswerBackend()
+        elif kind != "off":
+            backend = MemoryAnswerBackend()
+        similarity = float(GAIA_ANSWER_CACHE_SIMILARITY) if GAIA_ANSWER_CACHE_SIMILARITY else None
+        return cls(backend, similarity=similarity)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(scope: str, query: str) -> str:
+        return digest(scope, normalize_query(query))
+
+    def _query_shingles(self, query: str) -> FrozenSet[str]:
+        sh = self._shingles.get(query)
+        if sh is None:
+            if len(self._shingles) > 4 * GAIA_ANSWER_CACHE_MAXSIZE:
+                self._shingles.clear()
+            sh = self._shingles[query] = shingles(query)
+        return sh
+
+    def _lookup(self, scope: str, query: str) -> Optional[Dict[str, Any]]:
+        min_stored_at = time.time() - self.ttl
+        norm = normalize_query(query)
+        value = self.backend.get(digest(scope, norm), min_stored_at)
+        if value is not None:
+            self.exact_hits += 1
+            return value
+        if self.similarity is not None:
+            target = self._query_shingles(norm)
+            best_key, best = None, self.similarity
+            for key, cached_query in self.backend.candidates(scope, min_stored_at):
+                score = jaccard(target, self._query_shingles(cached_query))
+                if score >= best:
+                    best_key, best = key, score
+            if best_key is not None:
+                value = self.backend.get(best_key, min_stored_at)
+                if value is not None:
+                    self.similar_hits += 1
+                    return value
+        self.misses += 1
+        return None
+
+    def _store(self, scope: str, query: str, value: Dict[str, Any]) -> None:
+        norm = normalize_query(query)
+        self.evictions += self.backend.put(digest(scope, norm), scope, norm, value)
+        self.stores += 1
+
+    async def get(self, scope: str, query: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        if isinstance(self.backend, SQLiteAnswerBackend):
+            return await asyncio.to_thread(self._lookup, scope, query)
+        return self._lookup(scope, query)
+
+    async def put(self, scope: str, query: str, value: Dict[str, Any]) -> None:
+        if self.backend is None:
+            return
+        if isinstance(self.backend, SQLiteAnswerBackend):
+            await asyncio.to_thread(self._store, scope, query, value)
+        else:
+            self._store(scope, query, value)
+
+    def bypass(self) -> None:
+        self.bypassed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "size": len(self.backend) if self.backend is not None else 0,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+# === Content Store ===
+# Object fields that identify a revision, in order of preference
+_VERSION_FIELDS = ("etag", "version", "versionId", "lastModifiedTimeUsecs", "lastModified", "modifiedTime")
+
+
+def object_version(o: Dict[str, Any]) -> Optional[str]:
+    """
+    The object's etag/version/modification time as a string, or None.
+    """
+    for key in _VERSION_FIELDS:
+        value = o.get(key)
+        if value is not None and value != "":
+            return str(value)
+    return None
+
+
+class _Content:
+    __slots__ = ("version", "value", "stored_at")
+
+    def __init__(self, version: Optional[str], value: bytes, stored_at: float):
+        self.version = version
+        self.value = value
+        self.stored_at = stored_at
+
+
+class SQLiteContentTier:
+    """
+    Cold tier of ContentStore: encoded objects in a SQLite file, bounded by
+    total bytes with least recently used rows deleted first.
+    """
+
+    def __init__(self, path: str = GAIA_CONTENT_STORE_PATH, max_bytes: int = GAIA_CONTENT_DISK_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS content ("
+            " key TEXT PRIMARY KEY, version TEXT, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS content_accessed ON content (accessed_at)")
+        self.bytes, self.items = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM content").fetchone()
+
+    def read(self, keys: List[str]) -> Dict[str, _Content]:
+        """
+        Return the stored entries for `keys`; write() removes the ones promoted to the hot tier.
+        """
+        found: Dict[str, _Content] = {}
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(
+                    "SELECT version, value, stored_at FROM content WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    version, value, stored_at = row
+                    found[key] = _Content(version, bytes(value), stored_at)
+        return found
+
+    def _delete(self, key: str) -> bool:
+        row = self._db.execute("SELECT size FROM content WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        self._db.execute("DELETE FROM content WHERE key = ?", (key,))
+        self.bytes -= row[0]
+        self.items -= 1
+        return True
+
+    def write(self, entries: List[Tuple[str, _Content]], discard: Iterable[str] = ()) -> int:
+        """
+        Delete the `discard` keys, then store demoted entries; returns how many
+        rows were evicted to stay in budget.
+        """
+        now = time.time()
+        evicted = 0
+        with self._lock:
+            # One transaction per batch instead of one per row
+            self._db.execute("BEGIN")
+            try:
+                for key in discard:
+                    self._delete(key)
+                for key, entry in entries:
+                    self._delete(key)
+                    self._db.execute(
+                        "INSERT INTO content (key, version, value, size, stored_at, accessed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, entry.version, entry.value, len(entry.value), entry.stored_at, now),
+                    )
+                    self.bytes += len(entry.value)
+                    self.items += 1
+                if self.bytes > self.max_bytes:
+                    # Oldest access first; rows demoted together go in insertion order
+                    for key, in self._db.execute(
+                        "SELECT key FROM content ORDER BY accessed_at, rowid"
+                    ).fetchall():
+                        if self.bytes <= self.max_bytes:
+                            break
+                        evicted += self._delete(key)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self.bytes, self.items = self._db.execute(
+                    "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM content"
+                ).fetchone()
+                raise
+        return evicted
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class ContentStore:
+    """
+    Local copies of Gaia objects (documents) keyed by an opaque object key,
+    so repeated access to the same document skips the network.
+
+    Entries are stored as encoded JSON. The hot tier is an in-memory LRU
+    bounded by `memory_bytes`; entries it evicts are demoted to the optional
+    cold tier (SQLite, bounded by its own byte budget) and promoted back on
+    their next hit. Each entry remembers the object's version (etag, version
+    or modification time): storing a different version replaces it, and a
+    lookup naming a version only matches that version. Entries older than
+    `ttl` are never served.
+
+    Request paths hand pages to store_later(), which only queues them: keys
+    and encoding are computed by a background writer, and pages arriving
+    while `queue_pages` are already waiting are dropped.
+    """
+
+    def __init__(
+        self,
+        cold: Optional[SQLiteContentTier] = None,
+        memory_bytes: int = GAIA_CONTENT_MEMORY_BYTES,
+        ttl: float = GAIA_CONTENT_STORE_TTL,
+        queue_pages: int = GAIA_CONTENT_QUEUE_PAGES,
+    ):
+        self.cold = cold
+        self.memory_bytes = memory_bytes
+        self.ttl = ttl
+        self.queue_pages = queue_pages
+        self._queue: "deque[Tuple[Tuple[Any, ...], List[Dict[str, Any]]]]" = deque()
+        self._writer: Optional["asyncio.Future[None]"] = None
+        self.dropped = 0
+        self._hot: "OrderedDict[str, _Content]" = OrderedDict()
+        self._hot_bytes = 0
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stores = 0
+        self.demotions = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ContentStore"]:
+        kind = GAIA_CONTENT_STORE.lower()
+        if kind == "off":
+            return None
+        return cls(SQLiteContentTier() if kind == "sqlite" else None)
+
+    def __len__(self) -> int:
+        return len(self._hot) + (self.cold.items if self.cold is not None else 0)
+
+    def _pop_hot(self, key: str) -> Optional[_Content]:
+        entry = self._hot.pop(key, None)
+        if entry is not None:
+            self._hot_bytes -= len(entry.value)
+        return entry
+
+    def _insert_hot(self, key: str, entry: _Content) -> List[Tuple[str, _Content]]:
+        # Returns the entries pushed out of the hot tier
+        self._pop_hot(key)
+        self._hot[key] = entry
+        self._hot_bytes += len(entry.value)
+        demoted: List[Tuple[str, _Content]] = []
+        while self._hot_bytes > self.memory_bytes and len(self._hot) > 1:
+            old_key, old = self._hot.popitem(last=False)
+            self._hot_bytes -= len(old.value)
+            demoted.append((old_key, old))
+        return demoted
+
+    async def _demote(self, demoted: List[Tuple[str, _Content]], discard: Sequence[str] = ()) -> None:
+        # Moves `demoted` to the cold tier and drops its copies of `discard` in one write
+        if not demoted and not discard:
+            return
+        if self.cold is None:
+            self.evictions += len(demoted)
+            return
+        self.demotions += len(demoted)
+        self.evictions += await asyncio.to_thread(self.cold.write, demoted, discard)
+
+    def _check(self, entry: _Content, version: Optional[str], min_stored_at: float) -> str:
+        # "ok", "expired" or "other_version"
+        if entry.stored_at < min_stored_at:
+            state = "expired"
+        elif version is not None and entry.version != version:
+            state = "other_version"
+        else:
+            return "ok"
+        self.stale += 1
+        return state
+
+    async def get_many(self, wanted: Dict[str, Optional[str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up {key: expected version or None}; returns {key: object} for the hits.
+        Expired entries are dropped. An entry of another version is a miss but
+        stays stored, since other lookups may still ask for that version.
+        """
+        min_stored_at = time.time() - self.ttl
+        found: Dict[str, Dict[str, Any]] = {}
+        cold_keys: List[str] = []
+        for key, version in wanted.items():
+            entry = self._hot.get(key)
+            if entry is None:
+                cold_keys.append(key)
+                continue
+            state = self._check(entry, version, min_stored_at)
+            if state == "ok":
+                self._hot.move_to_end(key)
+                found[key] = loads(entry.value)
+                self.hot_hits += 1
+                continue
+            if state == "expired":
+                self._pop_hot(key)
+            self.misses += 1
+        if cold_keys and self.cold is not None:
+            stored = await asyncio.to_thread(self.cold.read, cold_keys)
+            demoted: List[Tuple[str, _Content]] = []
+            # Promoted and expired rows leave the cold tier; other versions stay
+            dropped: List[str] = []
+            for key, entry in stored.items():
+                state = self._check(entry, wanted[key], min_stored_at)
+                if state == "ok":
+                    found[key] = loads(entry.value)
+                    demoted += self._insert_hot(key, entry)
+                    self.cold_hits += 1
+                if state != "other_version":
+                    dropped.append(key)
+            await self._demote(demoted, dropped)
+        self.misses += sum(1 for key in cold_keys if key not in found)
+        return found
+
+    async def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Store (key, object) pairs, replacing any older copy.
+        """
+        now = time.time()
+        demoted: List[Tuple[str, _Content]] = []
+        replaced: List[str] = []
+        for key, obj in items:
+            version = object_version(obj)
+            old = self._hot.get(key)
+            if old is not None and old.version == version and old.stored_at > now - self.ttl / 2:
+                # Same revision, recently stored: only refresh its recency
+                self._hot.move_to_end(key)
+                continue
+            if old is None and self.cold is not None:
+                replaced.append(key)
+            demoted += self._insert_hot(key, _Content(version, dumps(obj), now))
+            self.stores += 1
+        # Drop copies the cold tier may hold so they can't resurface
+        await self._demote(demoted, replaced)
+
+    @staticmethod
+    def key(scope: Tuple[Any, ...], object_id: str) -> str:
+        return digest(*scope, object_id)
+
+    def store_later(self, scope: Tuple[Any, ...], objects: List[Dict[str, Any]]) -> None:
+        """
+        Queue objects to be stored under key(scope, id) without blocking the caller.
+        """
+        if not objects:
+            return
+        if len(self._queue) >= self.queue_pages:
+            self.dropped += len(objects)
+            return
+        self._queue.append((scope, objects))
+        if self._writer is None or self._writer.done():
+            self._writer = detached(self._write_queued)
+
+    async def _write_queued(self) -> None:
+        while self._queue:
+            scope, objects = self._queue.popleft()
+            try:
+                await self.put_many((self.key(scope, o["id"]), o) for o in objects if o.get("id"))
+            except Exception:
+                logger.warning("Content store write failed", exc_info=True)
+            # One page at a time, so requests interleave with a long backlog
+            await asyncio.sleep(0)
+
+    async def flush(self) -> None:
+        """
+        Wait until the queued pages are stored.
+        """
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def close(self) -> None:
+        self._queue.clear()
+        if self.cold is not None:
+            self.cold.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hot_hits + self.cold_hits + self.misses
+        return {
+            "backend": "sqlite" if self.cold is not None else "memory",
+            "hot_items": len(self._hot),
+            "hot_bytes": self._hot_bytes,
+            "cold_items": self.cold.items if self.cold is not None else 0,
+            "cold_bytes": self.cold.bytes if self.cold is not None else 0,
+            "hot_hits": self.hot_hits,
+            "cold_hits": self.cold_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "stores": self.stores,
+            "demotions": self.demotions,
+            "evictions": self.evictions,
+            "queued": sum(len(objects) for _, objects in self._queue),
+            "dropped": self.dropped,
+            "hit_rate": round((self.hot_hits + self.cold_hits) / lookups, 3) if lookups else 0.0,
+        }
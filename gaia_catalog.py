@@ -0,0 +1,273 @@
+import os
+import re
+import math
+import time
+import zlib
+import heapq
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from gaia_cache import SingleFlight
+from gaia_tenants import Credentials, use_credentials
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+# Seconds between background rebuilds of each catalog, and how long an unused one is kept
+GAIA_CATALOG_REFRESH = float(os.getenv("GAIA_CATALOG_REFRESH", "300"))
+GAIA_CATALOG_IDLE = float(os.getenv("GAIA_CATALOG_IDLE", "3600"))
+# Catalogs kept (one per Gaia identity)
+GAIA_CATALOG_MAXSIZE = int(os.getenv("GAIA_CATALOG_MAXSIZE", "100"))
+# Datasets an "auto" ask is routed to
+GAIA_CATALOG_AUTO_K = int(os.getenv("GAIA_CATALOG_AUTO_K", "3"))
+# Hashed trigram vectors for fuzzy matches: auto (when numpy is installed), on, off
+GAIA_CATALOG_VECTORS = os.getenv("GAIA_CATALOG_VECTORS", "auto").lower()
+GAIA_CATALOG_VECTOR_DIM = int(os.getenv("GAIA_CATALOG_VECTOR_DIM", "256"))
+
+# BM25 parameters; name tokens count this many times over description tokens
+_K1 = 1.2
+_B = 0.75
+_NAME_WEIGHT = 2
+# Weight of vector cosine similarity next to the normalized keyword score
+_VECTOR_WEIGHT = 0.5
+_MIN_COSINE = 0.1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or "
+    "our so that the their there these this to was we what when where which who why will with "
+    "you your about all any".split()
+)
+
+_np: Any = None
+_numpy_loaded = GAIA_CATALOG_VECTORS == "off"
+
+
+def _load_numpy() -> None:
+    # numpy is optional and heavy to import; only load it for the first index
+    global _np, _numpy_loaded
+    _numpy_loaded = True
+    try:
+        import numpy
+    except ImportError:
+        if GAIA_CATALOG_VECTORS == "on":
+            raise
+        return
+    _np = numpy
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens without stopwords, crudely singularized.
+    Underscores and other punctuation split words (dataset names included).
+    """
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _embed(tokens: List[str], dim: int) -> Any:
+    # Signed feature hashing of character trigrams, L2-normalized
+    vector = _np.zeros(dim, dtype=_np.float32)
+    for token in tokens:
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            h = zlib.crc32(padded[i:i + 3].encode())
+            vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = _np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# === Catalog Index ===
+class CatalogIndex:
+    """
+    Search index over dataset names and descriptions (discover_tools output).
+
+    Questions are matched with BM25 over an inverted keyword index. When
+    numpy is available, each dataset also gets a hashed character-trigram
+    vector; cosine similarity with the question's vector adds partial-word
+    matches ("finance" vs "financial") on top of the keyword score.
+    """
+
+    def __init__(self, datasets: List[Dict[str, Any]], dim: int = GAIA_CATALOG_VECTOR_DIM):
+        if not _numpy_loaded:
+            _load_numpy()
+        self.datasets = datasets
+        self.built_at = time.monotonic()
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths: List[int] = []
+        documents: List[List[str]] = []
+        for i, d in enumerate(datasets):
+            tokens = tokenize(d.get("dataset_name") or "") * _NAME_WEIGHT + tokenize(d.get("description") or "")
+            documents.append(tokens)
+            lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                self._postings.setdefault(token, []).append((i, tf))
+        n = len(datasets)
+        self._lengths = lengths
+        self._avg_length = (sum(lengths) / n) if n else 0.0
+        self._idf = {
+            token: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._postings.items()
+        }
+        self.dim = dim
+        self._vectors: Any = None
+        if _np is not None and n:
+            self._vectors = _np.stack([_embed(tokens, dim) for tokens in documents])
+
+    def __len__(self) -> int:
+        return len(self.datasets)
+
+    @property
+    def vectors(self) -> bool:
+        return self._vectors is not None
+
+    def search(self, question: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        The `k` best matching datasets for `question` with their scores (0-1.5),
+        best first. Datasets with nothing in common with the question are left out.
+        """
+        tokens = tokenize(question)
+        scores: Dict[int, float] = {}
+        for token in set(tokens):
+            idf = self._idf.get(token)
+            if idf is None:
+                continue
+            for i, tf in self._postings[token]:
+                norm = _K1 * (1 - _B + _B * self._lengths[i] / (self._avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (_K1 + 1) / (tf + norm)
+        top = max(scores.values(), default=0.0)
+        if top:
+            scores = {i: s / top for i, s in scores.items()}
+        if self._vectors is not None and tokens:
+            similarity = self._vectors @ _embed(tokens, self.dim)
+            for i in _np.flatnonzero(similarity >= _MIN_COSINE).tolist():
+                scores[i] = scores.get(i, 0.0) + _VECTOR_WEIGHT * float(similarity[i])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.datasets[i], round(score, 4)) for i, score in best]
+
+
+class _Catalog:
+    __slots__ = ("index", "credentials", "used_at")
+
+    def __init__(self, index: CatalogIndex, credentials: Optional[Credentials]):
+        self.index = index
+        self.credentials = credentials
+        self.used_at = time.monotonic()
+
+
+# === Catalog Registry ===
+class DatasetCatalog:
+    """
+    One CatalogIndex per Gaia identity, built from `fetch()` (the
+    discover_tools datasets) on first use and rebuilt in the background every
+    `refresh_interval` seconds, so lookups never wait on discovery once warm.
+    fetch() reads through the discovery caches: a rebuild costs no upstream
+    calls while they are fresh, and stale entries are revalidated in the
+    background and picked up by the next rebuild. Catalogs unused for `idle`
+    seconds are dropped; a failed rebuild keeps the previous index.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        refresh_interval: float = GAIA_CATALOG_REFRESH,
+        idle: float = GAIA_CATALOG_IDLE,
+        maxsize: int = GAIA_CATALOG_MAXSIZE,
+    ):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.idle = idle
+        self.maxsize = maxsize
+        self._catalogs: "OrderedDict[Hashable, _Catalog]" = OrderedDict()
+        self._flight = SingleFlight("catalog", cancel_when_abandoned=False)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.builds = 0
+        self.refresh_errors = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._catalogs)
+
+    async def index(self, key: Hashable, credentials: Optional[Credentials]) -> CatalogIndex:
+        """
+        The catalog for `key` (a Gaia identity), building it on first use with
+        `credentials` (None: the server defaults).
+        """
+        catalog = self._catalogs.get(key)
+        if catalog is not None:
+            catalog.used_at = time.monotonic()
+            self._catalogs.move_to_end(key)
+            return catalog.index
+        return await self._flight.do(key, lambda: self._build(key, credentials))
+
+    async def _build(self, key: Hashable, credentials: Optional[Credentials]) -> CatalogIndex:
+        with use_credentials(credentials):
+            datasets = await self.fetch()
+        index = CatalogIndex(datasets)
+        self.builds += 1
+        previous = self._catalogs.get(key)
+        catalog = self._catalogs[key] = _Catalog(index, credentials)
+        if previous is not None:
+            catalog.used_at = previous.used_at
+        self._catalogs.move_to_end(key)
+        while len(self._catalogs) > self.maxsize:
+            self._catalogs.popitem(last=False)
+            self.expired += 1
+        return index
+
+    def start(self, warm: Optional[List[Tuple[Hashable, Optional[Credentials]]]] = None) -> None:
+        """
+        Start the background refresh task; `warm` catalogs are built right away.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._refresh_loop(warm or []))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh(self, key: Hashable, credentials: Optional[Credentials]) -> None:
+        if key in self._flight:
+            return
+        try:
+            await self._flight.do(key, lambda: self._build(key, credentials))
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Dataset catalog refresh failed: %r", e)
+
+    async def _refresh_loop(self, warm: List[Tuple[Hashable, Optional[Credentials]]]) -> None:
+        for key, credentials in warm:
+            await self._refresh(key, credentials)
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            cutoff = time.monotonic() - self.idle
+            for key, catalog in list(self._catalogs.items()):
+                if catalog.used_at < cutoff:
+                    del self._catalogs[key]
+                    self.expired += 1
+                else:
+                    await self._refresh(key, catalog.credentials)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._catalogs),
+            "datasets": sum(len(c.index) for c in self._catalogs.values()),
+            "vectors": _np is not None,
+            "builds": self.builds,
+            "refresh_errors": self.refresh_errors,
+            "expired": self.expired,
+        }
@@ -0,0 +1,71 @@
+import os
+import logging
+from typing import NamedTuple, Optional, Set
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+_loaded: Optional["GaiaConfig"] = None
+_env_files: Set[str] = set()
+
+
+class GaiaConfig(NamedTuple):
+    env_file: Optional[str]
+    log_level: str
+    gaia_host: str
+    api_key_set: bool
+
+
+def _find_env_file() -> Optional[str]:
+    for directory in (os.getcwd(), os.path.dirname(os.path.abspath(__file__))):
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_env(env_file: Optional[str] = None) -> Optional[str]:
+    """
+    Load `env_file` (default GAIA_ENV_FILE, else ./.env) into os.environ
+    without overriding variables already set; returns the file loaded.
+    Runs when this module is imported, so gaia_mcp_server imports it first:
+    the other gaia_* modules read their settings from the environment on
+    import. Each file is loaded once.
+    """
+    env_file = env_file or os.getenv("GAIA_ENV_FILE") or _find_env_file()
+    if env_file and env_file not in _env_files:
+        load_dotenv(env_file, override=False)
+        _env_files.add(env_file)
+    return env_file
+
+
+def load_config(env_file: Optional[str] = None, log_level: Optional[str] = None) -> GaiaConfig:
+    """
+    Startup configuration for the entrypoints (gaia_mcp_server run as a
+    script, gaia_serve, bench_gaia): loads the .env file (see load_env) and
+    configures logging. Later calls return the first result.
+    """
+    global _loaded
+    if _loaded is not None:
+        return _loaded
+    env_file = load_env(env_file)
+    level = (log_level or os.getenv("GAIA_LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(level=level)
+    _loaded = GaiaConfig(
+        env_file=env_file,
+        log_level=level,
+        gaia_host=os.getenv("GAIA_HOST", "https://helios.cohesity.com"),
+        api_key_set=bool(os.getenv("API_KEY_HEADER")),
+    )
+    # Never log the key itself
+    logger.info(
+        "Gaia host %s (API key %s)%s",
+        _loaded.gaia_host,
+        "set" if _loaded.api_key_set else "not set",
+        f", settings from {env_file}" if env_file else "",
+    )
+    return _loaded
+
+
+load_env()
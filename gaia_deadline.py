@@ -0,0 +1,228 @@
+import os
+import time
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterator, Mapping, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# === Configuration ===
+# Request header with the caller's time budget in seconds (relative, so clocks needn't agree)
+GAIA_DEADLINE_HEADER = os.getenv("GAIA_DEADLINE_HEADER", "x-gaia-deadline").lower()
+# Budget for tool calls that send no header (0 = none), and per-tool overrides ("ask=120,search_objects=30")
+GAIA_DEFAULT_DEADLINE = float(os.getenv("GAIA_DEFAULT_DEADLINE", "0"))
+GAIA_TOOL_DEADLINES = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (
+        item.partition("=") for item in os.getenv("GAIA_TOOL_DEADLINES", "").split(",") if "=" in item
+    )
+}
+# Upper bound on budgets requested by callers
+GAIA_MAX_DEADLINE = float(os.getenv("GAIA_MAX_DEADLINE", "600"))
+
+_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("gaia_deadline", default=None)
+_counters = {"exceeded": 0, "disconnects": 0}
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a call's deadline passes before Gaia has answered.
+    """
+
+    def __init__(self, message: str = "Deadline exceeded before Gaia answered"):
+        super().__init__(message)
+
+
+# === Deadline Context ===
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline (may be negative), or None without one.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget(seconds: float) -> float:
+    """
+    `seconds`, shortened to what is left of the current deadline.
+    """
+    left = remaining()
+    return seconds if left is None else max(0.0, min(seconds, left))
+
+
+def check() -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+@contextlib.contextmanager
+def use_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Run the enclosed calls with at most `seconds` left (None: unchanged).
+    A deadline set further up is only ever shortened, never extended.
+    """
+    token = None
+    if seconds is not None and seconds > 0:
+        deadline = time.monotonic() + min(seconds, GAIA_MAX_DEADLINE)
+        current = _deadline.get()
+        token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        if token is not None:
+            _deadline.reset(token)
+
+
+def detached(fn: Callable[[], Awaitable[T]]) -> "asyncio.Future[T]":
+    """
+    Start fn() as a task without the caller's deadline, for work shared by
+    callers with different deadlines (coalesced fetches, cache refreshes).
+    Each caller bounds its own wait with within_deadline().
+    """
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    # Tasks copy the context current at creation, i.e. ctx
+    return ctx.run(lambda: asyncio.ensure_future(fn()))
+
+
+async def within_deadline(aw: Awaitable[T]) -> T:
+    """
+    Await `aw`, cancelling it and raising DeadlineExceeded once the current deadline passes.
+    """
+    left = remaining()
+    if left is None:
+        return await aw
+    if left <= 0:
+        if asyncio.isfuture(aw):
+            aw.cancel()
+        elif asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+
+def parse_budget(headers: Mapping[str, str], tool: Optional[str] = None) -> Optional[float]:
+    """
+    The time budget for a call: the deadline header (lower-cased names) if
+    present and valid, else the tool's configured default.
+    """
+    raw = headers.get(GAIA_DEADLINE_HEADER)
+    if raw:
+        try:
+            seconds = float(raw)
+        except ValueError:
+            logger.debug("Ignoring malformed %s header %r", GAIA_DEADLINE_HEADER, raw)
+        else:
+            if seconds > 0:
+                return seconds
+    seconds = GAIA_TOOL_DEADLINES.get(tool or "", GAIA_DEFAULT_DEADLINE)
+    return seconds or None
+
+
+def deadline_tool(name: str, headers: Callable[[], Mapping[str, str]]) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator running a native MCP tool under the deadline from the request
+    headers returned by `headers()` (or the tool's default); keeps the signature.
+    """
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with use_deadline(parse_budget(headers(), name)):
+                try:
+                    return await within_deadline(fn(*args, **kwargs))
+                except DeadlineExceeded:
+                    _counters["exceeded"] += 1
+                    raise
+        return wrapper
+    return decorate
+
+
+# === ASGI Middleware ===
+class DeadlineMiddleware:
+    """
+    Runs each HTTP request under the deadline from its GAIA_DEADLINE_HEADER
+    header (or the default for its tool, named by `tool(path)`), and cancels
+    the request's work, upstream Gaia calls included, as soon as the client
+    disconnects before the response has been sent.
+    """
+
+    def __init__(self, app: Any, tool: Callable[[str], Optional[str]] = lambda path: None):
+        self.app = app
+        self.tool = tool
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        seconds = parse_budget(headers, self.tool(scope.get("path", "")))
+
+        # One reader owns the client's receive channel so it can notice a disconnect
+        # while the app is busy; the app reads the same messages through a queue.
+        messages: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        task = asyncio.current_task()
+        state = {"started": False, "responded": False, "disconnected": False}
+
+        async def read_client() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not state["responded"]:
+                        state["disconnected"] = True
+                        _counters["disconnects"] += 1
+                        task.cancel()
+                    return
+
+        async def app_receive() -> Dict[str, Any]:
+            return await messages.get()
+
+        async def app_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                state["started"] = True
+                if message["status"] == 504:
+                    _counters["exceeded"] += 1
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["responded"] = True
+            await send(message)
+
+        reader = asyncio.ensure_future(read_client())
+        try:
+            with use_deadline(seconds):
+                await self.app(scope, app_receive, app_send)
+        except asyncio.CancelledError:
+            if not state["disconnected"]:
+                raise
+            # Nobody is left to answer; the cancellation was ours
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            logger.debug("Client went away; cancelled %s", scope.get("path"))
+        except DeadlineExceeded:
+            if state["started"]:
+                raise
+            await _send_timeout(app_send)
+        finally:
+            reader.cancel()
+
+
+def deadline_stats() -> Dict[str, Any]:
+    return {"exceeded": _counters["exceeded"], "client_disconnects": _counters["disconnects"]}
+
+
+async def _send_timeout(send: Any) -> None:
+    body = b'{"detail":"Deadline exceeded before Gaia answered"}'
+    await send({
+        "type": "http.response.start",
+        "status": 504,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,435 @@
+import os
+import re
+import time
+import asyncio
+import contextlib
+import importlib.util
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from gaia_deadline import DeadlineExceeded, remaining, within_deadline
+from gaia_logging import should_trace, trace_request, trace_response
+from gaia_metrics import (
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_REQUESTS,
+    UPSTREAM_RESPONSE_BYTES,
+    UPSTREAM_SECONDS,
+    span,
+)
+from gaia_resilience import (
+    GAIA_HEDGE,
+    GAIA_HEDGE_MIN_DELAY,
+    GAIA_HEDGE_PERCENTILE,
+    CircuitBreaker,
+    LatencyTracker,
+    RetryPolicy,
+)
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+GAIA_HTTP2 = os.getenv("GAIA_HTTP2", "true").lower() in ("1", "true", "yes")
+GAIA_MAX_CONNECTIONS = int(os.getenv("GAIA_MAX_CONNECTIONS", "100"))
+GAIA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GAIA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GAIA_KEEPALIVE_EXPIRY = float(os.getenv("GAIA_KEEPALIVE_EXPIRY", "30"))
+GAIA_MAX_CONNECTIONS_PER_HOST = int(os.getenv("GAIA_MAX_CONNECTIONS_PER_HOST", "50"))
+GAIA_HTTP_TIMEOUT = float(os.getenv("GAIA_HTTP_TIMEOUT", "30"))
+
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+_DATASET_ID = re.compile(r"/dataset/[^/]+/")
+# Fewer samples than this and hedging waits for more data
+_HEDGE_MIN_SAMPLES = 20
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """
+    Low-cardinality endpoint label, e.g. "GET /v2/mcm/gaia/dataset/{id}/discovery".
+    """
+    return f"{method} {_DATASET_ID.sub('/dataset/{id}/', urlsplit(url).path)}"
+
+
+# === Shared Connection Pool ===
+class GaiaHTTPPool:
+    """
+    A single pooled httpx.AsyncClient shared by every Gaia call.
+
+    Keeps TCP/TLS connections to the Gaia host alive between MCP tool calls,
+    caps concurrent requests per host, and tracks saturation for /healthz.
+
+    Every request also goes through the resilience layer: a per-host circuit
+    breaker, jittered retries for idempotent methods, and (if enabled) a hedged
+    second attempt once an idempotent request outlives the endpoint's p95.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = GAIA_MAX_CONNECTIONS,
+        max_keepalive_connections: int = GAIA_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = GAIA_KEEPALIVE_EXPIRY,
+        max_connections_per_host: int = GAIA_MAX_CONNECTIONS_PER_HOST,
+        http2: bool = GAIA_HTTP2,
+        timeout: float = GAIA_HTTP_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        retry: Optional[RetryPolicy] = None,
+        hedge: bool = GAIA_HEDGE,
+        breaker_factory: Any = CircuitBreaker,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        # HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("GAIA_HTTP2 requested but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self.requests_total = 0
+        self.retry = retry or RetryPolicy()
+        self.hedge = hedge
+        self._breaker_factory = breaker_factory
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Optional cross-pool admission control (see gaia_tenants.FairScheduler)
+        self.scheduler: Any = None
+        self.tenant = "default"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def start(self) -> None:
+        self.client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return slot
+
+    @contextlib.asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        if self.scheduler is None:
+            async with self._pool_slot(url):
+                yield
+            return
+        async with self.scheduler.slot(self.tenant), self._pool_slot(url):
+            yield
+
+    @contextlib.asynccontextmanager
+    async def _pool_slot(self, url: str) -> AsyncIterator[None]:
+        host = urlsplit(url).netloc
+        self._waiting[host] = self._waiting.get(host, 0) + 1
+        try:
+            await self._slot(host).acquire()
+        finally:
+            self._waiting[host] -= 1
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        self.requests_total += 1
+        try:
+            yield
+        finally:
+            self._in_flight[host] -= 1
+            self._slot(host).release()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = self._breaker_factory()
+        return breaker
+
+    def latency(self, endpoint: str) -> LatencyTracker:
+        tracker = self._latency.get(endpoint)
+        if tracker is None:
+            tracker = self._latency[endpoint] = LatencyTracker()
+        return tracker
+
+    def _traced_headers(self, kwargs: Dict[str, Any]) -> Dict[str, str]:
+        # Copy so trace context injected per attempt never leaks into the caller's dict
+        headers = dict(kwargs.get("headers") or {})
+        kwargs["headers"] = headers
+        return headers
+
+    def _observe(self, endpoint: str, status: Any, elapsed: float) -> None:
+        UPSTREAM_SECONDS.observe(elapsed, endpoint=endpoint, status=status)
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=status)
+
+    async def _send(self, method: str, url: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        traced = should_trace(logger)
+        if traced:
+            trace_request(logger, method, url, kwargs.get("headers"), kwargs.get("params"), kwargs.get("json"))
+        headers = self._traced_headers(kwargs)
+        with span("gaia.upstream", headers, **{"http.method": method, "gaia.endpoint": endpoint}) as s:
+            async with self._host_slot(url):
+                UPSTREAM_IN_FLIGHT.inc(endpoint=endpoint)
+                started = time.monotonic()
+                try:
+                    resp = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    self._observe(endpoint, "error", time.monotonic() - started)
+                    raise
+                finally:
+                    UPSTREAM_IN_FLIGHT.dec(endpoint=endpoint)
+            elapsed = time.monotonic() - started
+            if s is not None:
+                s.set_attribute("http.status_code", resp.status_code)
+        self.latency(endpoint).record(elapsed)
+        self._observe(endpoint, resp.status_code, elapsed)
+        UPSTREAM_RESPONSE_BYTES.inc(len(resp.content), endpoint=endpoint)
+        if traced:
+            trace_response(logger, method, url, resp.status_code, resp.content, elapsed)
+        return resp
+
+    async def _send_hedged(self, method: str, url: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        tracker = self.latency(endpoint)
+        if len(tracker) < _HEDGE_MIN_SAMPLES:
+            return await self._send(method, url, endpoint, **kwargs)
+        delay = max(GAIA_HEDGE_MIN_DELAY, tracker.percentile(GAIA_HEDGE_PERCENTILE) or 0.0)
+        first = asyncio.ensure_future(self._send(method, url, endpoint, **kwargs))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            self.hedges += 1
+            pending.add(asyncio.ensure_future(self._send(method, url, endpoint, **kwargs)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not first:
+                            self.hedge_wins += 1
+                        return t.result()
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send a request through the breaker, retrying idempotent requests on
+        transport errors and retryable statuses. Non-idempotent requests are
+        attempted once unless `idempotent=True` is passed explicitly.
+
+        `timeout` (default: the pool's) caps each attempt; within it, attempts
+        get the endpoint's adaptive timeout (see LatencyTracker.timeout). The
+        whole call, retries and queueing for a slot included, ends with
+        DeadlineExceeded at the caller's deadline (see gaia_deadline).
+        """
+        return await within_deadline(self._request(method, url, idempotent, **kwargs))
+
+    async def _request(self, method: str, url: str, idempotent: Optional[bool], **kwargs: Any) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method.upper() in _IDEMPOTENT_METHODS
+        endpoint = endpoint_name(method, url)
+        breaker = self.breaker(url)
+        tracker = self.latency(endpoint)
+        ceiling = kwargs.pop("timeout", None) or self.timeout
+        attempts = self.retry.attempts if idempotent else 1
+        send = self._send_hedged if idempotent and self.hedge else self._send
+        for attempt in range(attempts):
+            timeout = tracker.timeout(ceiling)
+            left = remaining()
+            # Deadline-bound attempts time out as DeadlineExceeded, not as a slow endpoint
+            bounded = left is not None and left <= timeout
+            if bounded:
+                timeout = max(0.001, left)
+            delay = self.retry.delay(attempt)
+            breaker.check()
+            try:
+                resp = await send(method, url, endpoint, timeout=timeout, **kwargs)
+            except httpx.TimeoutException as e:
+                breaker.record_failure()
+                if bounded:
+                    raise DeadlineExceeded() from e
+                tracker.record(timeout)
+                if attempt + 1 >= attempts or not self._time_for(delay):
+                    raise
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt + 1 >= attempts or not self._time_for(delay):
+                    raise
+            else:
+                if resp.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if (
+                    attempt + 1 >= attempts
+                    or resp.status_code not in self.retry.retry_statuses
+                    or not self._time_for(delay)
+                ):
+                    return resp
+            self.retries += 1
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _time_for(delay: float) -> bool:
+        # A retry that can't start before the deadline only burns upstream capacity
+        left = remaining()
+        return left is None or left > delay
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """
+        Like request(), but yields the response before its body is read.
+        The host slot is held until the body has been consumed. Streams are
+        guarded by the circuit breaker but never retried. The timeout (the
+        pool's by default) applies per read, shortened to the caller's
+        deadline; callers check the deadline between reads.
+        """
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded()
+            kwargs["timeout"] = min(kwargs.get("timeout") or self.timeout, left)
+        breaker = self.breaker(url)
+        breaker.check()
+        endpoint = endpoint_name(method, url)
+        traced = should_trace(logger)
+        if traced:
+            trace_request(logger, method, url, kwargs.get("headers"), kwargs.get("params"), kwargs.get("json"))
+        headers = self._traced_headers(kwargs)
+        with span("gaia.upstream.stream", headers, **{"http.method": method, "gaia.endpoint": endpoint}):
+            async with self._host_slot(url):
+                UPSTREAM_IN_FLIGHT.inc(endpoint=endpoint)
+                started = time.monotonic()
+                try:
+                    async with self.client.stream(method, url, **kwargs) as resp:
+                        # Time to response headers; body streaming time is the caller's
+                        self._observe(endpoint, resp.status_code, time.monotonic() - started)
+                        if traced:
+                            trace_response(logger, method, url, resp.status_code, "<streamed>", time.monotonic() - started)
+                        if resp.status_code >= 500:
+                            breaker.record_failure()
+                        else:
+                            breaker.record_success()
+                        try:
+                            yield resp
+                        finally:
+                            UPSTREAM_RESPONSE_BYTES.inc(resp.num_bytes_downloaded, endpoint=endpoint)
+                except httpx.TransportError:
+                    breaker.record_failure()
+                    self._observe(endpoint, "error", time.monotonic() - started)
+                    raise
+                finally:
+                    UPSTREAM_IN_FLIGHT.dec(endpoint=endpoint)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool saturation: open/idle connections and per-host load.
+        """
+        connections = []
+        if self._client is not None:
+            # httpcore exposes the live connection list on the transport pool
+            pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        in_flight = sum(self._in_flight.values())
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "connections_open": len(connections),
+            "connections_idle": idle,
+            "connections_active": len(connections) - idle,
+            "requests_in_flight": in_flight,
+            "requests_waiting": sum(self._waiting.values()),
+            "requests_total": self.requests_total,
+            "saturation": round(in_flight / self.max_connections, 3) if self.max_connections else 0.0,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "breakers": {host: b.stats() for host, b in self._breakers.items()},
+            "latency": {endpoint: t.stats() for endpoint, t in self._latency.items()},
+            "hosts": {
+                host: {
+                    "in_flight": self._in_flight.get(host, 0),
+                    "waiting": self._waiting.get(host, 0),
+                }
+                for host in self._host_slots
+            },
+        }
+
+
+_pool: Optional[GaiaHTTPPool] = None
+
+
+def get_pool() -> GaiaHTTPPool:
+    """
+    Return the process-wide pool, creating it lazily if startup hasn't run.
+    """
+    global _pool
+    if _pool is None:
+        _pool = GaiaHTTPPool()
+    return _pool
+
+
+async def init_pool(pool: Optional[GaiaHTTPPool] = None) -> GaiaHTTPPool:
+    global _pool
+    if pool is not None:
+        if _pool is not None and _pool is not pool:
+            await _pool.close()
+        _pool = pool
+    await get_pool().start()
+    return get_pool()
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def pool_started() -> bool:
+    return _pool is not None and _pool._client is not None and not _pool._client.is_closed
+
+
+def pool_stats() -> Dict[str, Any]:
+    if _pool is None:
+        return {"connections_open": 0, "requests_in_flight": 0, "requests_total": 0}
+    return _pool.stats()
@@ -0,0 +1,53 @@
+import os
+import json
+from typing import Any, Union
+
+from pydantic import BaseModel
+
+# === Configuration ===
+# "auto" uses orjson when installed, "stdlib" forces the json module
+GAIA_JSON = os.getenv("GAIA_JSON", "auto").lower()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+if GAIA_JSON == "stdlib":
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, BaseModel):
+        return o.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Decode JSON straight from the response bytes, skipping the str decode
+    httpx's Response.json() does first.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Compact UTF-8 JSON. Pydantic models are serialized by pydantic-core
+    directly instead of being dumped to dicts first.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json().encode()
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    """
+    dumps() as text; used as the MCP tool result serializer.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json()
+    return dumps(obj).decode()
@@ -0,0 +1,95 @@
+import os
+import json
+import codecs
+import random
+import logging
+from typing import Any, Callable, Dict, Mapping, Optional
+
+# === Configuration ===
+# Max characters of a request/response body included in a debug line
+GAIA_DEBUG_BODY_LIMIT = int(os.getenv("GAIA_DEBUG_BODY_LIMIT", "2048"))
+# Fraction (0-1) of requests traced when DEBUG is enabled
+GAIA_DEBUG_SAMPLE_RATE = float(os.getenv("GAIA_DEBUG_SAMPLE_RATE", "1.0"))
+GAIA_REDACT_HEADERS = frozenset(
+    h.strip().lower()
+    for h in os.getenv("GAIA_REDACT_HEADERS", "apikey,authorization,x-api-key,cookie,set-cookie").split(",")
+    if h.strip()
+)
+
+REDACTED = "***"
+
+
+def should_trace(logger: logging.Logger) -> bool:
+    """
+    Decide once per request whether to emit debug traces for it.
+    Costs a level check (and a random draw when sampling) and nothing else.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return GAIA_DEBUG_SAMPLE_RATE >= 1.0 or random.random() < GAIA_DEBUG_SAMPLE_RATE
+
+
+def redact_headers(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    return {
+        k: (REDACTED if k.lower() in GAIA_REDACT_HEADERS else v)
+        for k, v in (headers or {}).items()
+    }
+
+
+def preview(value: Any, limit: int = GAIA_DEBUG_BODY_LIMIT) -> str:
+    """
+    Size-capped text rendering of a body. Bytes are sliced before decoding so
+    a multi-megabyte response costs at most `limit` bytes of work; a UTF-8
+    character cut by the slice is left out rather than shown as garbage.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        total = len(value)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        text = decoder.decode(bytes(value[:limit]), final=total <= limit)
+    else:
+        if not isinstance(value, str):
+            value = json.dumps(value, default=str)
+        total = len(value)
+        text = value[:limit]
+    if total > limit:
+        text += f"... [{total - limit} more]"
+    return text
+
+
+class Lazy:
+    """
+    Defers formatting until a log record is actually rendered:
+    logger.debug("body: %s", Lazy(preview, resp.content)).
+    """
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+
+def trace_request(
+    logger: logging.Logger,
+    method: str,
+    url: str,
+    headers: Optional[Mapping[str, str]] = None,
+    params: Any = None,
+    body: Any = None,
+) -> None:
+    logger.debug(
+        "Gaia request %s %s headers=%s params=%s body=%s",
+        method, url, Lazy(redact_headers, headers), Lazy(preview, params), Lazy(preview, body),
+    )
+
+
+def trace_response(logger: logging.Logger, method: str, url: str, status: int, body: Any, elapsed: float) -> None:
+    logger.debug(
+        "Gaia response %s %s status=%s elapsed=%.3fs body=%s",
+        method, url, status, elapsed, Lazy(preview, body),
+    )
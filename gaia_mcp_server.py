@@ -1,13 +1,156 @@
 import json
-from typing import Any, Dict, List, Optional, NamedTuple, Tuple
+import asyncio
+import logging
+import functools
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Union
 from fastapi import FastAPI, HTTPException
-from fastmcp.client.transports import StreamableHttpTransport
-from fastmcp.exceptions import ClientError
-from fastmcp import FastMCP
-from gaia_service import *
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastmcp import FastMCP, Context
+from fastmcp.server.openapi import HTTPRoute, MCPType
+from fastmcp.server.dependencies import get_http_headers
+# Imported first: loads .env before the gaia_* modules below read their settings
+from gaia_config import load_config
+from gaia_service import (
+    GAIA_BATCH_CONCURRENCY,
+    GAIA_BATCH_MAX_QUESTIONS,
+    GAIA_CATALOG_AUTO_K,
+    GAIA_FEDERATED_MIN_SCORE,
+    GAIA_FEDERATED_TOP_K,
+    GAIA_OBJECTS_MAX_RESULTS,
+    GAIA_OBJECTS_PAGE_SIZE,
+    AskBatchItem,
+    AskBatchResult,
+    AskParams,
+    AskResult,
+    AskSessionResult,
+    BatchConcurrency,
+    DiscoverTool,
+    Document,
+    DocumentsResult,
+    ExecuteParams,
+    ExecuteResult,
+    FederatedSearchResult,
+    ListDiscoverToolsResult,
+    MaxResults,
+    PageSize,
+    SelectDatasetsResult,
+    cache_stats,
+    gaia_qa,
+    gaia_qa_batch,
+    get_documents,
+    gaia_qa_session,
+    gaia_qa_session_stream,
+    gaia_qa_stream,
+    iter_discover_tools,
+    iter_gaia_qa_batch,
+    iter_search_objects,
+    probe_upstream,
+    search_federated,
+    search_objects,
+    select_datasets,
+    start_dataset_catalog,
+    stop_dataset_catalog,
+    tenants,
+)
+from gaia_http import init_pool, close_pool, pool_started, pool_stats
+from gaia_resilience import CircuitOpenError
+from gaia_deadline import DeadlineExceeded, DeadlineMiddleware, deadline_stats, deadline_tool
+from gaia_json import dumps, dumps_str
+from gaia_tenants import TenantMiddleware, use_credentials
+from gaia_serve import GAIA_DRAIN_TIMEOUT, DrainMiddleware, drain, drain_on_sigterm
+from gaia_metrics import (
+    CACHE_GAUGE,
+    POOL_GAUGE,
+    REGISTRY,
+    MetricsMiddleware,
+    export_stats,
+    instrument_tool,
+)
+
+logger = logging.getLogger(__name__)
+
+# === Lifespan ===
+_lifespan_users = 0
+_lifespan_open = False
+_restore_sigterm: Callable[[], None] = lambda: None
+# Serializes opening and closing, so a session entering while the last one
+# drains can't have its freshly opened pool closed under it
+_lifespan_lock = asyncio.Lock()
+
+@asynccontextmanager
+async def gaia_lifespan(_app: Any):
+    """
+    Open the shared Gaia connection pool on startup and close it on shutdown.
+    Used by the FastAPI app (uvicorn), the FastMCP server (mcp.run()) and
+    gaia_serve. FastMCP enters it once per session (per request in stateless
+    HTTP mode), so only the first entry opens the pool and only the last
+    exit drains in-flight asks and closes it. A session entering while the
+    last one drains takes over, and the pool stays open.
+    """
+    global _lifespan_users, _lifespan_open, _restore_sigterm
+    async with _lifespan_lock:
+        if _lifespan_open and not _lifespan_users:
+            # The last session is draining; take over from it
+            drain.resume()
+        elif not _lifespan_open:
+            drain.reset()
+            await init_pool()
+            start_dataset_catalog()
+            _restore_sigterm = drain_on_sigterm()
+            _lifespan_open = True
+        _lifespan_users += 1
+    try:
+        yield
+    finally:
+        async with _lifespan_lock:
+            _lifespan_users -= 1
+            last = not _lifespan_users
+            if last:
+                drain.start()
+        if last:
+            if not await drain.wait(GAIA_DRAIN_TIMEOUT):
+                logger.warning("Shutting down with %d ask calls still in flight", drain.in_flight)
+            async with _lifespan_lock:
+                # Re-checked: another session may have entered during the drain
+                if not _lifespan_users and _lifespan_open:
+                    await stop_dataset_catalog()
+                    await tenants.close()
+                    await close_pool()
+                    _restore_sigterm()
+                    _lifespan_open = False
 
 # === FastAPI App & FastMCP Setup ===
-app = FastAPI()
+app = FastAPI(lifespan=gaia_lifespan)
+
+def _tool_label(path: str) -> str:
+    # Keep metric labels bounded: unknown paths (404s, scans) share one label
+    return path if any(getattr(r, "path", None) == path for r in app.routes) else "unmatched"
+
+def _tool_name(path: str) -> Optional[str]:
+    # The MCP tool (operation id) served at `path`, for GAIA_TOOL_DEADLINES
+    for r in app.routes:
+        if getattr(r, "path", None) == path:
+            return getattr(r, "operation_id", None)
+    return None
+
+# Added first so they run inside MetricsMiddleware, which then also counts 401/429/503/504s
+app.add_middleware(TenantMiddleware, registry=tenants, exempt={"/healthz", "/readyz", "/metrics"})
+# Tool calls arriving during shutdown (batch, federated and stream routes included) get a 503
+# before they touch a tenant's rate limit; probes and /metrics keep answering
+DRAINED_PREFIXES = ("/gaia_qa", "/search_objects", "/discover_tools", "/documents", "/select_datasets")
+app.add_middleware(DrainMiddleware, drain=drain, prefixes=DRAINED_PREFIXES)
+# Deadlines and client-disconnect cancellation cover everything behind the drain check
+app.add_middleware(DeadlineMiddleware, tool=_tool_name)
+app.add_middleware(MetricsMiddleware, label=_tool_label)
+
+class GaiaJSONResponse(JSONResponse):
+    """
+    Serializes results (pydantic models included) in one pass with gaia_json,
+    skipping FastAPI's response_model validation and jsonable_encoder copy.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
 
 # # === The MCP Server ===
 # class GaiaMCPClient:
@@ -125,72 +268,80 @@ app = FastAPI()
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=f"Error in list_datasets_descriptions: {str(e)}")
 
-# @app.post(
-#     "/search_objects",
-#     response_model=List[Document],
-#     operation_id="search_objects",
-#     summary="Search and filter content objects from Gaia",
-#     description="""
-# Tool Name: Search Objects
+@app.post(
+    "/search_objects",
+    response_model=ExecuteResult,
+    response_class=GaiaJSONResponse,
+    operation_id="search_objects",
+    summary="Search and filter content objects from Gaia",
+    description="""
+Tool Name: Search Objects
 
-# Purpose:
-#     This tool retrieves a list of available objects from Gaia based on filtering criteria such as keyword,
-#     semantic search string, object types, file types, and file size range. It supports both keyword-based
-#     and semantic (vector-based) search.
+Purpose:
+    This tool retrieves a list of available objects from Gaia based on filtering criteria such as keyword,
+    semantic search string, object types, file types, and file size range. It supports both keyword-based
+    and semantic (vector-based) search. Results are paged: pass next_cursor back as cursor to continue.
 
-# Inputs:
-#     - keyword (str, optional): A keyword to match in object content or metadata.
-#     - semantic_search_string (str, optional): A natural language query string used for semantic (vector) search.
-#     - object_types (List[str], optional): List of object types to include in the result (e.g., "pdf", "email").
-#     - file_type (List[str], optional): List of file types to include (e.g., "docx", "txt").
-#     - file_gt_kb (int, optional): Return only objects with file size greater than this value in kilobytes.
-#     - file_lt_kb (int, optional): Return only objects with file size less than this value in kilobytes.
+Inputs:
+    - keyword (str, optional): A keyword to match in object content or metadata.
+    - semantic_search_string (str, optional): A natural language query string used for semantic (vector) search.
+    - object_types (List[str], optional): List of object types to include in the result (e.g., "pdf", "email").
+    - file_type (List[str], optional): List of file types to include (e.g., "docx", "txt").
+    - file_gt_kb (int, optional): Return only objects with file size greater than this value in kilobytes.
+    - file_lt_kb (int, optional): Return only objects with file size less than this value in kilobytes.
+    - page_size (int, optional): Objects per upstream page, from 1 up to GAIA_OBJECTS_MAX_PAGE_SIZE (1000 by default).
+    - cursor (str, optional): next_cursor from a previous call, to resume after its last object.
+    - max_results (int, optional): Return at most this many objects (at least 1).
+    - metadata_fields (List[str], optional): Object fields to include in each document's
+      metadata. Default: every field except id and text; ["*"] for the raw object.
 
-# Output:
-#     A list of Document objects. Each object includes:
-#     - id (str): A unique identifier for the object.
-#     - text (str, optional): Extracted text content from the object, if available.
-#     - metadata (dict): Metadata associated with the object (e.g., filename, size, type, date created).
+Output:
+    A dictionary with:
+    - documents (List[dict]): id, text (if available) and metadata (e.g., filename, size, type) per object.
+    - next_cursor (str, optional): Pass as cursor to get the objects after these; null when there are no more.
+    - pruned (int): Objects Gaia returned that the local file type/size filter dropped.
 
-# Usage Notes:
-#     - You can combine multiple filters (e.g., keyword + file type + size range).
-#     - If both `keyword` and `semantic_search_string` are provided, both will be used in conjunction.
-#     - Returns an empty list if no matching objects are found.
-# """
-# )
-# async def search_objects_endpoint(
-#     keyword: Optional[str] = None,
-#     semantic_search_string: Optional[str] = None,
-#     object_types: Optional[List[str]] = None,
-#     file_type: Optional[List[str]] = None,
-#     file_gt_kb: Optional[int] = None,
-#     file_lt_kb: Optional[int] = None
-# ) -> List[dict]:
-#     try:
-#         params = ExecuteParams(
-#             keyword=keyword,
-#             semantic_search_string=semantic_search_string,
-#             object_types=object_types,
-#             file_type=file_type,
-#             file_greater_than_kb=file_gt_kb,
-#             file_less_than_kb=file_lt_kb
-#         )
+Usage Notes:
+    - You can combine multiple filters (e.g., keyword + file type + size range).
+    - If both `keyword` and `semantic_search_string` are provided, both will be used in conjunction.
+    - Returns an empty documents list if no matching objects are found.
+"""
+)
+async def search_objects_endpoint(
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    page_size: PageSize = GAIA_OBJECTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    max_results: Optional[MaxResults] = GAIA_OBJECTS_MAX_RESULTS,
+    metadata_fields: Optional[List[str]] = None
+) -> GaiaJSONResponse:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        page_size=page_size,
+        cursor=cursor,
+        max_results=max_results,
+        metadata_fields=metadata_fields
+    )
+    try:
+        return GaiaJSONResponse(await search_objects(params))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error in search_objects: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in search_objects: {str(e)}")
 
-#         raw = await search_objects(params)
-#         return [
-#             {
-#                 "id": d.id,
-#                 "text": d.text,
-#                 "metadata": d.metadata
-#             }
-#             for d in raw.documents
-#         ]
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=f"Error in search_objects: {str(e)}")
-    
 @app.post(
     "/gaia_qa",
-    response_model=dict,
+    response_model=Union[AskSessionResult, AskResult],
+    response_class=GaiaJSONResponse,
     operation_id="ask",
     summary="Query datasets using a specified LLM and return answers with citations.",
     description="""
@@ -203,20 +354,28 @@ Purpose:
 
 Inputs:
     - question (str, required): The natural language question to be answered by the LLM.
-    - dataset_names (List[str], optional): A list of dataset names to search the query against. Default is ["data_explorer_create_themes_test"].
+    - dataset_names (List[str], optional): A list of dataset names to search the query against. Default is ["ashok_test", "vpangha_qure6"].
+      Pass ["auto"] to ask the datasets that select_datasets picks for the question.
     - llm_name (str, optional): The name of the LLM to use. Default is "Cohesity LLM Advanced".
     - llm_id (str, optional): The identifier for the LLM to be used. Default is "ADV".
     - history (List[Any], optional): List of prior interactions or query history, used to provide context.
+    - use_cache (bool, optional): Serve a cached answer for the same (or equivalent) question when the
+      server's answer cache is enabled. Default is true.
+    - session_id (str, optional): Keep the conversation history on the server. Pass "" (or any new id)
+      to start a session, then the returned session_id on every later turn with just the new question.
 
 Output:
     A dictionary with the following keys:
     - responseString (str): The answer string generated by the LLM.
     - citations (List[dict]): A list of citation objects (e.g., documents, source snippets) 
       that were referenced to generate the answer.
+    - session_id (str) and turns (int): Only for session asks; the session to continue and its length.
 
 Usage Notes:
     - If no LLM is specified, defaults are used.
-    - This endpoint is asynchronous and supports chat-style context via the `history` parameter.
+    - This endpoint is asynchronous and supports chat-style context via the `history` parameter,
+      or via server-side sessions (`session_id`), which send Gaia a compacted window of recent turns.
+    - Sessions expire after 30 minutes of inactivity; an expired session_id starts a new session.
 """
 )
 async def ask_endpoint(
@@ -224,8 +383,10 @@ async def ask_endpoint(
     dataset_names: List[str] = ["ashok_test", "vpangha_qure6"], #data_explorer_create_themes_test
     llm_name: str = "Cohesity LLM Advanced",
     llm_id:   str = "ADV",
-    history:  List[Any] = []
-) -> dict:
+    history:  List[Any] = [],
+    use_cache: bool = True,
+    session_id: Optional[str] = None
+) -> GaiaJSONResponse:
     try:
         params = AskParams(
             llmName=llm_name,
@@ -234,14 +395,211 @@ async def ask_endpoint(
             queryString=question,
             history=history
         )
-        raw = await gaia_qa(params)
-        return {
-            "responseString": raw.responseString,
-            "citations": raw.citations
-        }
+        if session_id is not None:
+            return GaiaJSONResponse(await gaia_qa_session(params, session_id, use_cache=use_cache))
+        return GaiaJSONResponse(await gaia_qa(params, use_cache=use_cache))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error in ask: {str(e)}")
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Error in ask: {str(e)}")
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error in ask: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in ask: {str(e)}")
 
+@app.post(
+    "/gaia_qa/batch",
+    response_model=AskBatchResult,
+    response_class=GaiaJSONResponse,
+    operation_id="ask_batch",
+    summary="Ask many questions against the same datasets in one call.",
+    description="""
+Tool Name: Gaia QA (Batch)
+
+Purpose:
+    Answers a list of questions against the same datasets and LLM in a single call.
+    Questions are asked concurrently (bounded), identical questions are asked once,
+    and each question gets its own status so one failure doesn't fail the batch.
+
+Inputs:
+    - questions (List[str], required): The questions to answer.
+    - dataset_names (List[str], optional): Dataset names to search. Default is ["ashok_test", "vpangha_qure6"].
+      Pass ["auto"] to pick the best matching datasets for each question.
+    - llm_name (str, optional): The name of the LLM to use. Default is "Cohesity LLM Advanced".
+    - llm_id (str, optional): The identifier for the LLM to be used. Default is "ADV".
+    - history (List[Any], optional): Prior interactions, shared by every question.
+    - use_cache (bool, optional): Serve cached answers for the same (or equivalent) questions when the
+      server's answer cache is enabled. Default is true.
+    - concurrency (int, optional): Max questions asked in parallel, from 1 up to 8 (the default).
+
+Output:
+    A dictionary with:
+    - results (List[dict]): One entry per question, in input order, with index, question,
+      status ("ok" or "error"), responseString, citations and error.
+    - succeeded (int), failed (int): Counts of answered and failed questions.
+"""
+)
+async def ask_batch_endpoint(
+    questions: List[str],
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id:   str = "ADV",
+    history:  List[Any] = [],
+    use_cache: bool = True,
+    concurrency: BatchConcurrency = GAIA_BATCH_CONCURRENCY
+) -> GaiaJSONResponse:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString="",
+        history=history
+    )
+    try:
+        return GaiaJSONResponse(await gaia_qa_batch(params, questions, use_cache=use_cache, concurrency=concurrency))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error in ask_batch: {str(e)}")
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error in ask_batch: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in ask_batch: {str(e)}")
+
+@app.post(
+    "/search_objects/federated",
+    response_model=FederatedSearchResult,
+    response_class=GaiaJSONResponse,
+    operation_id="search_federated",
+    summary="Search several datasets at once and return one ranked list.",
+    description="""
+Tool Name: Federated Search
+
+Purpose:
+    Runs the same object search on several datasets in parallel and merges the results
+    into a single list ranked by relevance score, with duplicates (same document id)
+    removed. Returns as soon as k high-confidence hits are found, so it is fast when
+    the answer is in one of the first datasets to respond.
+
+Inputs:
+    - keyword (str, optional): A keyword to match in object content or metadata.
+    - semantic_search_string (str, optional): A natural language query for semantic search.
+    - object_types (List[str], optional): Object types to include.
+    - file_type (List[str], optional): File types to include (e.g., "docx", "txt").
+    - file_gt_kb (int, optional): Only objects larger than this many kilobytes.
+    - file_lt_kb (int, optional): Only objects smaller than this many kilobytes.
+    - dataset_names (List[str], optional): Datasets to search. Default is every dataset.
+    - k (int, optional): Number of results to return. Default is 20.
+    - min_score (float, optional): Score that counts as a high-confidence hit. Default is 0.8.
+    - metadata_fields (List[str], optional): Object fields to include in each document's metadata.
+
+Output:
+    A dictionary with:
+    - documents (List[dict]): Best first; id, text, metadata, score and dataset_name.
+    - searched (List[str]): Datasets whose results were all considered.
+    - pending (List[str]): Datasets not finished when the search returned early or timed out.
+    - failed (List[str]), unknown (List[str]): Datasets that errored, and names that match no dataset.
+"""
+)
+async def search_federated_endpoint(
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    dataset_names: Optional[List[str]] = None,
+    k: int = GAIA_FEDERATED_TOP_K,
+    min_score: Optional[float] = GAIA_FEDERATED_MIN_SCORE,
+    metadata_fields: Optional[List[str]] = None
+) -> GaiaJSONResponse:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        metadata_fields=metadata_fields
+    )
+    try:
+        return GaiaJSONResponse(await search_federated(params, dataset_names, k=k, min_score=min_score))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error in search_federated: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in search_federated: {str(e)}")
+
+@app.post(
+    "/documents",
+    response_model=DocumentsResult,
+    response_class=GaiaJSONResponse,
+    operation_id="get_documents",
+    summary="Fetch documents seen in earlier searches or answers by id, without calling Gaia.",
+    description="""
+Tool Name: Get Documents
+
+Purpose:
+    Returns the full text and metadata of documents by object id from this server's local
+    content store, which keeps every object returned by search_objects / search_federated.
+    Use it to re-read documents from earlier results (e.g. the documentId of an ask
+    citation) instead of searching again; it never calls Gaia.
+
+Inputs:
+    - ids (List[str]): Object ids, e.g. document ids from search results or citations.
+    - versions (Dict[str, str], optional): Expected etag/version per id; a stored copy of
+      another version is not returned.
+    - metadata_fields (List[str], optional): Object fields to include in each document's metadata.
+
+Output:
+    A dictionary with:
+    - documents (List[dict]): The documents found (id, text, metadata), in request order.
+    - missing (List[str]): Ids not in the local store (never seen, evicted or outdated);
+      run a search to fetch them.
+"""
+)
+async def get_documents_endpoint(
+    ids: List[str],
+    versions: Optional[Dict[str, str]] = None,
+    metadata_fields: Optional[List[str]] = None
+) -> GaiaJSONResponse:
+    try:
+        return GaiaJSONResponse(await get_documents(ids, versions, metadata_fields))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in get_documents: {str(e)}")
+
+@app.post(
+    "/select_datasets",
+    response_model=SelectDatasetsResult,
+    response_class=GaiaJSONResponse,
+    operation_id="select_datasets",
+    summary="Pick the datasets most relevant to a question, without calling Gaia.",
+    description="""
+Tool Name: Select Datasets
+
+Purpose:
+    Ranks datasets by how well their names and descriptions match a question, using a
+    catalog of the discover_tools output that this server keeps in memory and refreshes
+    in the background. Use it to choose dataset_names for ask or search_federated; it
+    answers in milliseconds and makes no Gaia calls once the catalog is built.
+
+Inputs:
+    - question (str, required): The question (or topic) to find datasets for.
+    - k (int, optional): Number of datasets to return. Default is 3.
+
+Output:
+    A dictionary with:
+    - datasets (List[dict]): Best first; dataset_id, dataset_name, description and score.
+      Datasets sharing no words with the question are left out, so this may be empty.
+    - catalog_size (int): Datasets in the catalog.
+    - catalog_age (float): Seconds since the catalog was rebuilt from discovery.
+"""
+)
+async def select_datasets_endpoint(question: str, k: int = GAIA_CATALOG_AUTO_K) -> GaiaJSONResponse:
+    try:
+        return GaiaJSONResponse(await select_datasets(question, k))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Error in select_datasets: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in select_datasets: {str(e)}")
+
 # @app.post(
 #     "/discover_tools",
 #     response_model=List[DiscoverTool],
@@ -293,34 +651,643 @@ async def ask_endpoint(
     #         for t in payload.get("tools", [])
     #     }
 
+@app.post(
+    "/gaia_qa/stream",
+    include_in_schema=False,
+    summary="Stream a Gaia QA answer as it is generated",
+    description="""
+Description:
+    Streaming variant of the ask tool. Forwards partial answer tokens and
+    citations as server-sent events while Gaia is still generating, so the
+    first bytes arrive as soon as Gaia produces them.
+
+Inputs:
+    Same as ask.
+
+Output:
+    text/event-stream with events named "token", "citations" and "done".
+    Each data payload is a JSON AskChunk; for session asks the "done" chunk
+    carries the session_id and turns. Upstream failures are reported as a final
+    "error" event.
+"""
+)
+async def ask_stream_endpoint(
+    question: str,
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id:   str = "ADV",
+    history:  List[Any] = [],
+    use_cache: bool = True,
+    session_id: Optional[str] = None
+) -> StreamingResponse:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString=question,
+        history=history
+    )
+    if session_id is not None:
+        chunks = gaia_qa_session_stream(params, session_id, use_cache=use_cache)
+    else:
+        chunks = gaia_qa_stream(params, use_cache=use_cache)
+
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield f"event: {chunk.type}\ndata: {chunk.model_dump_json()}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error in ask: {str(e)}'})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post(
+    "/gaia_qa/batch/stream",
+    include_in_schema=False,
+    summary="Stream batch QA answers as they complete",
+    description="""
+Description:
+    Streaming variant of ask_batch. Emits one JSON AskBatchItem per line
+    (application/x-ndjson) as soon as each question is answered, in
+    completion order; use the index field to match answers to questions.
+
+Inputs:
+    Same as ask_batch.
+"""
+)
+async def ask_batch_stream_endpoint(
+    questions: List[str],
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id:   str = "ADV",
+    history:  List[Any] = [],
+    use_cache: bool = True,
+    concurrency: BatchConcurrency = GAIA_BATCH_CONCURRENCY
+) -> StreamingResponse:
+    if len(questions) > GAIA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"Error in ask_batch: at most {GAIA_BATCH_MAX_QUESTIONS} questions per batch")
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString="",
+        history=history
+    )
+
+    async def lines():
+        async for item in iter_gaia_qa_batch(params, questions, use_cache=use_cache, concurrency=concurrency):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post(
+    "/search_objects/stream",
+    include_in_schema=False,
+    summary="Stream search results page by page",
+    description="""
+Description:
+    Paginated variant of search_objects. Emits one JSON ExecuteResult per line
+    (application/x-ndjson) as each upstream page arrives.
+
+Inputs:
+    - keyword, semantic_search_string, object_types, file_type, file_gt_kb, file_lt_kb:
+      Same filters as search_objects.
+    - page_size (int, optional): Objects per page, from 1 up to GAIA_OBJECTS_MAX_PAGE_SIZE (1000 by default).
+    - cursor (str, optional): next_cursor from a previous page, to resume.
+    - max_results (int, optional): Stop after this many objects (at least 1).
+    - metadata_fields (List[str], optional): Object fields to include in each document's
+      metadata. Default: every field except id and text; ["*"] for the raw object.
+
+Output:
+    One {"documents": [...], "next_cursor": str | null, "pruned": int} object per line.
+"""
+)
+async def search_objects_stream_endpoint(
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    page_size: PageSize = GAIA_OBJECTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    max_results: Optional[MaxResults] = GAIA_OBJECTS_MAX_RESULTS,
+    metadata_fields: Optional[List[str]] = None
+) -> StreamingResponse:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        page_size=page_size,
+        cursor=cursor,
+        max_results=max_results,
+        metadata_fields=metadata_fields
+    )
+
+    async def lines():
+        async for page in iter_search_objects(params):
+            yield page.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post(
+    "/discover_tools/stream",
+    include_in_schema=False,
+    summary="Stream dataset descriptions as discovery calls complete",
+    description="""
+Description:
+    Incremental variant of discover_tools. Emits one JSON object per line
+    (application/x-ndjson) as each dataset's discovery call completes, so
+    clients see descriptions without waiting for the slowest dataset.
+
+Output:
+    One DiscoverTool per line. Datasets that miss the overall deadline are
+    emitted last with status "pending".
+"""
+)
+async def discover_tools_stream_endpoint(refresh: bool = False) -> StreamingResponse:
+    async def lines():
+        async for t in iter_discover_tools(refresh=refresh):
+            yield t.model_dump_json() + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # === Health Check ===
 @app.get(
     "/healthz",
     summary="Health check",
     description="""
 Description:
-    Health check endpoint to verify the MCP server is running.
+    Health check endpoint to verify the MCP server is running (liveness).
+    Never calls Gaia; see /readyz for upstream reachability.
 
 Input:
     This endpoint does not require any input parameters.
 
 Output:
-    A JSON object with a status key indicating server health.
+    A JSON object with a status key indicating server health, a pool key
+    with connection pool saturation stats for the Gaia upstream, a cache
+    key with dataset/discovery cache hit rates, tenant stats, and a drain
+    key with the shutdown state and in-flight ask count.
 """
 )
 def health_endpoint() -> dict:
     try:
-        return {"status": "ok"}
+        return {
+            "status": "ok",
+            "pool": pool_stats(),
+            "cache": cache_stats(),
+            "tenants": tenants.stats(),
+            "drain": drain.stats(),
+            "deadline": deadline_stats()
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in health: {str(e)}")
 
+@app.get(
+    "/readyz",
+    include_in_schema=False,
+    summary="Readiness check",
+    description="""
+Description:
+    Readiness check for load balancers: 200 while this instance should get
+    traffic, 503 while it is draining, its Gaia connection pool is not open,
+    or the Gaia host is unreachable (probe results are reused for a few seconds).
+
+Output:
+    A JSON object with status ("ready" or "not_ready") and the individual checks.
+"""
+)
+async def ready_endpoint() -> JSONResponse:
+    upstream_error = await probe_upstream()
+    checks = {
+        "draining": drain.draining,
+        "pool_open": pool_started(),
+        "upstream": upstream_error or "ok",
+    }
+    ready = not drain.draining and checks["pool_open"] and upstream_error is None
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "checks": checks},
+        status_code=200 if ready else 503
+    )
+
+# === Metrics ===
+def _collect_stats() -> None:
+    export_stats(POOL_GAUGE, pool_stats())
+    export_stats(POOL_GAUGE, tenants.stats(), "tenants.")
+    export_stats(POOL_GAUGE, drain.stats(), "drain.")
+    export_stats(POOL_GAUGE, deadline_stats(), "deadline.")
+    for name, stats in cache_stats().items():
+        if isinstance(stats, dict):
+            export_stats(CACHE_GAUGE, stats, cache=name)
+
+REGISTRY.add_collector(_collect_stats)
+
+@app.get(
+    "/metrics",
+    include_in_schema=False,
+    summary="Prometheus metrics",
+    description="""
+Description:
+    Prometheus text exposition of tool and upstream latency histograms,
+    response byte counts, in-flight gauges, per-status request counters,
+    JSON decode / model build phase timings, and pool and cache stats.
+"""
+)
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Operation ids registered below as native MCP tools rather than generated from OpenAPI
+NATIVE_TOOLS = frozenset({
+    "ask", "ask_batch", "search_objects", "search_federated", "get_documents", "select_datasets"
+})
+
+def _route_map(route: HTTPRoute, mcp_type: MCPType) -> Optional[MCPType]:
+    return MCPType.EXCLUDE if route.operation_id in NATIVE_TOOLS else None
+
+def _route_description(operation_id: str) -> str:
+    return next(r.description for r in app.routes if getattr(r, "operation_id", None) == operation_id)
+
 # Register with FastMCP
 mcp = FastMCP.from_fastapi(
     app,
+    route_map_fn=_route_map,
     stateless_http=True,
     http_host="0.0.0.0",
-    http_port=8001  # Use a different port if needed
+    http_port=8001,  # Use a different port if needed
+    lifespan=gaia_lifespan,
+    # Compact JSON straight from the returned models (default is indented)
+    tool_serializer=dumps_str
+)
+
+def tenant_tool(fn):
+    """
+    Run a native MCP tool with the Gaia credentials from the MCP client's
+    HTTP headers (as TenantMiddleware does for FastAPI routes), charging the
+    tenant's rate limit first.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with use_credentials(tenants.from_headers(get_http_headers())):
+            tenants.check_rate()
+            return await fn(*args, **kwargs)
+    return wrapper
+
+# === Native MCP Tools ===
+# Same tools as the REST routes of the same operation id, called directly:
+# OpenAPI-generated tools would go through an in-process HTTP round trip,
+# then FastMCP re-parses the response and re-serializes it indented.
+@mcp.tool(name="ask", description=_route_description("ask"))
+@instrument_tool("ask")
+@drain.tracked
+@deadline_tool("ask", get_http_headers)
+@tenant_tool
+async def ask_tool(
+    question: str,
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id: str = "ADV",
+    history: List[Any] = [],
+    use_cache: bool = True,
+    session_id: Optional[str] = None
+) -> Union[AskSessionResult, AskResult]:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString=question,
+        history=history
+    )
+    if session_id is not None:
+        return await gaia_qa_session(params, session_id, use_cache=use_cache)
+    return await gaia_qa(params, use_cache=use_cache)
+
+@mcp.tool(name="ask_batch", description=_route_description("ask_batch"))
+@instrument_tool("ask_batch")
+@drain.tracked
+@deadline_tool("ask_batch", get_http_headers)
+@tenant_tool
+async def ask_batch_tool(
+    questions: List[str],
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id: str = "ADV",
+    history: List[Any] = [],
+    use_cache: bool = True,
+    concurrency: BatchConcurrency = GAIA_BATCH_CONCURRENCY
+) -> AskBatchResult:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString="",
+        history=history
+    )
+    return await gaia_qa_batch(params, questions, use_cache=use_cache, concurrency=concurrency)
+
+@mcp.tool(name="search_objects", description=_route_description("search_objects"))
+@instrument_tool("search_objects")
+@deadline_tool("search_objects", get_http_headers)
+@tenant_tool
+async def search_objects_tool(
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    page_size: PageSize = GAIA_OBJECTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    max_results: Optional[MaxResults] = GAIA_OBJECTS_MAX_RESULTS,
+    metadata_fields: Optional[List[str]] = None
+) -> ExecuteResult:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        page_size=page_size,
+        cursor=cursor,
+        max_results=max_results,
+        metadata_fields=metadata_fields
+    )
+    return await search_objects(params)
+
+@mcp.tool(name="search_federated", description=_route_description("search_federated"))
+@instrument_tool("search_federated")
+@deadline_tool("search_federated", get_http_headers)
+@tenant_tool
+async def search_federated_tool(
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    dataset_names: Optional[List[str]] = None,
+    k: int = GAIA_FEDERATED_TOP_K,
+    min_score: Optional[float] = GAIA_FEDERATED_MIN_SCORE,
+    metadata_fields: Optional[List[str]] = None
+) -> FederatedSearchResult:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        metadata_fields=metadata_fields
+    )
+    return await search_federated(params, dataset_names, k=k, min_score=min_score)
+
+@mcp.tool(name="get_documents", description=_route_description("get_documents"))
+@instrument_tool("get_documents")
+@deadline_tool("get_documents", get_http_headers)
+@tenant_tool
+async def get_documents_tool(
+    ids: List[str],
+    versions: Optional[Dict[str, str]] = None,
+    metadata_fields: Optional[List[str]] = None
+) -> DocumentsResult:
+    return await get_documents(ids, versions, metadata_fields)
+
+@mcp.tool(name="select_datasets", description=_route_description("select_datasets"))
+@instrument_tool("select_datasets")
+@deadline_tool("select_datasets", get_http_headers)
+@tenant_tool
+async def select_datasets_tool(question: str, k: int = GAIA_CATALOG_AUTO_K) -> SelectDatasetsResult:
+    return await select_datasets(question, k)
+
+# === Streaming MCP Tools ===
+# Registered natively on the MCP server (not via FastAPI) so they can push
+# partial results to the client as progress notifications.
+@mcp.tool(
+    name="discover_tools_stream",
+    description="""
+Tool Name: Discover Tools (Streaming)
+
+Purpose:
+    Discovers available datasets and their descriptions, reporting each dataset as a
+    progress notification as soon as its discovery call completes.
+
+Inputs:
+    - refresh (bool, optional): Bypass the dataset/discovery cache. Default is false.
+
+Output:
+    A dictionary with:
+    - tools (List[dict]): dataset_id, dataset_name, description and status ("ok", "error" or "pending").
+    - pending (List[str]): Names of datasets whose discovery missed the deadline.
+"""
+)
+@instrument_tool("discover_tools_stream")
+@deadline_tool("discover_tools_stream", get_http_headers)
+@tenant_tool
+async def discover_tools_stream_tool(ctx: Context, refresh: bool = False) -> ListDiscoverToolsResult:
+    tools: List[DiscoverTool] = []
+    async for t in iter_discover_tools(refresh=refresh):
+        tools.append(t)
+        await ctx.report_progress(len(tools), None, message=t.model_dump_json())
+    return ListDiscoverToolsResult(
+        tools=tools,
+        pending=[t.dataset_name for t in tools if t.status == "pending"]
+    )
+
+@mcp.tool(
+    name="ask_stream",
+    description="""
+Tool Name: Gaia QA (Streaming)
+
+Purpose:
+    Same as ask, but forwards the answer while Gaia generates it: each partial
+    answer token and each batch of citations is sent as a progress notification.
+
+Inputs:
+    - question (str, required): The natural language question to be answered by the LLM.
+    - dataset_names (List[str], optional): Dataset names to search. Default is ["ashok_test", "vpangha_qure6"].
+      Pass ["auto"] to ask the datasets that select_datasets picks for the question.
+    - llm_name (str, optional): The name of the LLM to use. Default is "Cohesity LLM Advanced".
+    - llm_id (str, optional): The identifier for the LLM to be used. Default is "ADV".
+    - history (List[Any], optional): List of prior interactions, used to provide context.
+    - use_cache (bool, optional): Replay a cached answer for the same (or equivalent) question when the
+      server's answer cache is enabled. Default is true.
+    - session_id (str, optional): Keep the conversation history on the server (see ask).
+
+Output:
+    A dictionary with responseString (the full answer) and citations (List[dict]),
+    plus session_id and turns for session asks.
+"""
+)
+@instrument_tool("ask_stream")
+@drain.tracked
+@deadline_tool("ask_stream", get_http_headers)
+@tenant_tool
+async def ask_stream_tool(
+    ctx: Context,
+    question: str,
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id: str = "ADV",
+    history: List[Any] = [],
+    use_cache: bool = True,
+    session_id: Optional[str] = None
+) -> Union[AskSessionResult, AskResult]:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString=question,
+        history=history
+    )
+    if session_id is not None:
+        chunks = gaia_qa_session_stream(params, session_id, use_cache=use_cache)
+    else:
+        chunks = gaia_qa_stream(params, use_cache=use_cache)
+    answer = ""
+    citations: List[Dict[str, Any]] = []
+    turns = 0
+    sent = 0
+    async for chunk in chunks:
+        if chunk.type == "done":
+            answer = chunk.text
+            session_id = chunk.session_id
+            turns = chunk.turns or 0
+            continue
+        citations.extend(chunk.citations)
+        sent += 1
+        await ctx.report_progress(sent, None, message=chunk.model_dump_json())
+    if session_id is None:
+        return AskResult.model_construct(responseString=answer, citations=citations)
+    return AskSessionResult.model_construct(
+        responseString=answer,
+        citations=citations,
+        session_id=session_id,
+        turns=turns
+    )
+
+@mcp.tool(
+    name="ask_batch_stream",
+    description="""
+Tool Name: Gaia QA (Batch, Streaming)
+
+Purpose:
+    Same as ask_batch, but sends each question's answer (or error) as a progress
+    notification as soon as it completes, so long batches show results early.
+
+Inputs:
+    - questions (List[str], required): The questions to answer.
+    - dataset_names (List[str], optional): Dataset names to search. Default is ["ashok_test", "vpangha_qure6"].
+      Pass ["auto"] to pick the best matching datasets for each question.
+    - llm_name (str, optional): The name of the LLM to use. Default is "Cohesity LLM Advanced".
+    - llm_id (str, optional): The identifier for the LLM to be used. Default is "ADV".
+    - history (List[Any], optional): Prior interactions, shared by every question.
+    - use_cache (bool, optional): Serve cached answers for the same (or equivalent) questions when the
+      server's answer cache is enabled. Default is true.
+    - concurrency (int, optional): Max questions asked in parallel, from 1 up to 8 (the default).
+
+Output:
+    Same as ask_batch: results in input order, plus succeeded and failed counts.
+"""
+)
+@instrument_tool("ask_batch_stream")
+@drain.tracked
+@deadline_tool("ask_batch_stream", get_http_headers)
+@tenant_tool
+async def ask_batch_stream_tool(
+    ctx: Context,
+    questions: List[str],
+    dataset_names: List[str] = ["ashok_test", "vpangha_qure6"],
+    llm_name: str = "Cohesity LLM Advanced",
+    llm_id: str = "ADV",
+    history: List[Any] = [],
+    use_cache: bool = True,
+    concurrency: BatchConcurrency = GAIA_BATCH_CONCURRENCY
+) -> AskBatchResult:
+    params = AskParams(
+        llmName=llm_name,
+        datasetNames=dataset_names,
+        llmId=llm_id,
+        queryString="",
+        history=history
+    )
+    items: List[AskBatchItem] = []
+    async for item in iter_gaia_qa_batch(params, questions, use_cache=use_cache, concurrency=concurrency):
+        items.append(item)
+        await ctx.report_progress(len(items), len(questions), message=item.model_dump_json())
+    items.sort(key=lambda item: item.index)
+    failed = sum(1 for item in items if item.status != "ok")
+    return AskBatchResult(results=items, succeeded=len(items) - failed, failed=failed)
+
+@mcp.tool(
+    name="search_objects_stream",
+    description="""
+Tool Name: Search Objects (Paginated)
+
+Purpose:
+    Searches Gaia objects page by page, sending each page of documents as a progress
+    notification as soon as it arrives. Memory stays bounded to one page plus the
+    capped result set.
+
+Inputs:
+    - keyword (str, optional): A keyword to match in object content or metadata.
+    - semantic_search_string (str, optional): A natural language query string used for semantic search.
+    - object_types (List[str], optional): List of object types to include in the result.
+    - file_type (List[str], optional): List of file types to include (e.g., "docx", "txt").
+    - file_gt_kb (int, optional): Only objects larger than this size in kilobytes.
+    - file_lt_kb (int, optional): Only objects smaller than this size in kilobytes.
+    - page_size (int, optional): Objects per page, from 1 up to GAIA_OBJECTS_MAX_PAGE_SIZE (1000 by default).
+    - cursor (str, optional): next_cursor returned by a previous call, to continue a search.
+    - max_results (int, optional): Stop after this many objects (at least 1).
+    - metadata_fields (List[str], optional): Object fields to include in each document's
+      metadata. Default: every field except id and text; ["*"] for the raw object.
+
+Output:
+    A dictionary with documents (List[dict] of id, text, metadata), next_cursor
+    (str or null) to fetch further results, and pruned (int): objects dropped
+    locally because they didn't match file_type / size filters.
+"""
 )
+@instrument_tool("search_objects_stream")
+@deadline_tool("search_objects_stream", get_http_headers)
+@tenant_tool
+async def search_objects_stream_tool(
+    ctx: Context,
+    keyword: Optional[str] = None,
+    semantic_search_string: Optional[str] = None,
+    object_types: Optional[List[str]] = None,
+    file_type: Optional[List[str]] = None,
+    file_gt_kb: Optional[int] = None,
+    file_lt_kb: Optional[int] = None,
+    page_size: PageSize = GAIA_OBJECTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    max_results: Optional[MaxResults] = GAIA_OBJECTS_MAX_RESULTS,
+    metadata_fields: Optional[List[str]] = None
+) -> ExecuteResult:
+    params = ExecuteParams(
+        keyword=keyword,
+        semantic_search_string=semantic_search_string,
+        objectTypes=object_types,
+        file_type=file_type,
+        file_greater_than_kb=file_gt_kb,
+        file_less_than_kb=file_lt_kb,
+        page_size=page_size,
+        cursor=cursor,
+        max_results=max_results,
+        metadata_fields=metadata_fields
+    )
+    docs: List[Document] = []
+    next_cursor: Optional[str] = None
+    pruned = 0
+    async for page in iter_search_objects(params):
+        docs.extend(page.documents)
+        next_cursor = page.next_cursor
+        pruned += page.pruned
+        await ctx.report_progress(len(docs), max_results, message=page.model_dump_json())
+    return ExecuteResult.model_construct(documents=docs, next_cursor=next_cursor, pruned=pruned)
 
 if __name__ == "__main__":
+    load_config()
     mcp.run()
\ No newline at end of file
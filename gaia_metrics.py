@@ -0,0 +1,290 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Sequence, Tuple
+
+# === Configuration ===
+# "auto" traces with OpenTelemetry when the opentelemetry API is installed
+GAIA_OTEL = os.getenv("GAIA_OTEL", "auto").lower()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+# === Minimal Prometheus Registry ===
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _fmt(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        inner = ",".join(
+            '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + inner + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._fmt(k)} {v}" for k, v in list(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        out = []
+        for key, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                out.append(f"{self.name}_bucket{self._fmt(key, ('le', repr(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            out.append(f"{self.name}_bucket{self._fmt(key, ('le', '+Inf'))} {cumulative}")
+            out.append(f"{self.name}_sum{self._fmt(key)} {self._sums[key]}")
+            out.append(f"{self.name}_count{self._fmt(key)} {cumulative}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges right before rendering."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        for fn in self._collectors:
+            fn()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Upstream (Gaia) calls, recorded by GaiaHTTPPool
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "gaia_upstream_request_seconds", "Latency of Gaia upstream requests", ("endpoint", "status")))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "gaia_upstream_requests_total", "Gaia upstream requests by status ('error' for transport failures)",
+    ("endpoint", "status")))
+UPSTREAM_RESPONSE_BYTES = REGISTRY.register(Counter(
+    "gaia_upstream_response_bytes_total", "Bytes received from Gaia", ("endpoint",)))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "gaia_upstream_in_flight", "Gaia upstream requests in flight", ("endpoint",)))
+
+# Work done on the server between receiving a Gaia response and answering the client
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "gaia_phase_seconds", "Time spent per processing phase (json_decode, model_build)",
+    ("phase", "operation"), buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+# MCP tools / HTTP endpoints, including response serialization
+TOOL_SECONDS = REGISTRY.register(Histogram(
+    "gaia_tool_seconds", "End-to-end latency of MCP tools and HTTP endpoints", ("tool", "status")))
+TOOL_REQUESTS = REGISTRY.register(Counter(
+    "gaia_tool_requests_total", "MCP tool / HTTP endpoint calls by status", ("tool", "status")))
+TOOL_RESPONSE_BYTES = REGISTRY.register(Counter(
+    "gaia_tool_response_bytes_total", "Bytes sent to clients", ("tool",)))
+TOOL_IN_FLIGHT = REGISTRY.register(Gauge(
+    "gaia_tool_in_flight", "MCP tool / HTTP endpoint calls in flight", ("tool",)))
+
+# Pool and cache state, refreshed from their stats() at scrape time
+POOL_GAUGE = REGISTRY.register(Gauge(
+    "gaia_pool", "Gaia connection pool state (connections_open, requests_waiting, ...)", ("stat",)))
+CACHE_GAUGE = REGISTRY.register(Gauge(
+    "gaia_cache", "Cache and request-coalescing counters", ("cache", "stat")))
+
+
+def export_stats(gauge: Gauge, stats: MutableMapping[str, Any], prefix: str = "", **labels: Any) -> None:
+    """
+    Flatten a nested stats() dict into `gauge`, one sample per numeric leaf
+    with a dotted "stat" label (e.g. "breakers.gaia.example.com.failures").
+    """
+    for k, v in stats.items():
+        name = f"{prefix}{k}"
+        if isinstance(v, dict):
+            export_stats(gauge, v, f"{name}.", **labels)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            gauge.set(v, stat=name, **labels)
+
+
+# === Tool Instrumentation ===
+class MetricsMiddleware:
+    """
+    ASGI middleware recording TOOL_* metrics per endpoint. Timing runs until
+    the last body chunk is sent, so it covers response serialization and
+    streamed bodies. `label(path)` maps a request path to a tool name.
+    """
+
+    def __init__(self, app: Any, label: Callable[[str], str] = lambda path: path):
+        self.app = app
+        self.label = label
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tool = self.label(scope.get("path", ""))
+        status = "error"
+        sent = 0
+
+        async def counting_send(message: Dict[str, Any]) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        TOOL_IN_FLIGHT.inc(tool=tool)
+        started = time.perf_counter()
+        try:
+            with span("gaia.tool", tool=tool):
+                await self.app(scope, receive, counting_send)
+        finally:
+            TOOL_IN_FLIGHT.dec(tool=tool)
+            TOOL_SECONDS.observe(time.perf_counter() - started, tool=tool, status=status)
+            TOOL_REQUESTS.inc(tool=tool, status=status)
+            TOOL_RESPONSE_BYTES.inc(sent, tool=tool)
+
+
+def instrument_tool(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator recording TOOL_* metrics for a native (non-FastAPI) MCP tool.
+    The signature is preserved so FastMCP still sees the tool's parameters.
+    Response bytes are not counted here; FastMCP serializes after we return.
+    """
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            status = "error"
+            TOOL_IN_FLIGHT.inc(tool=name)
+            started = time.perf_counter()
+            try:
+                with span("gaia.tool", tool=name):
+                    result = await fn(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                TOOL_IN_FLIGHT.dec(tool=name)
+                TOOL_SECONDS.observe(time.perf_counter() - started, tool=name, status=status)
+                TOOL_REQUESTS.inc(tool=name, status=status)
+        return wrapper
+    return decorate
+
+
+# === OpenTelemetry (optional) ===
+# Imported on the first span rather than at import time, keeping it off the cold-start path
+_tracer: Any = None
+_propagate: Any = None
+_otel_loaded = GAIA_OTEL == "off"
+
+
+def _load_otel() -> None:
+    global _tracer, _propagate, _otel_loaded
+    _otel_loaded = True
+    try:
+        from opentelemetry import propagate, trace
+    except ImportError:
+        if GAIA_OTEL == "on":
+            raise
+        return
+    _propagate = propagate
+    _tracer = trace.get_tracer("gaia_mcp")
+
+
+@contextlib.contextmanager
+def span(name: str, headers: Optional[MutableMapping[str, str]] = None, **attributes: Any) -> Iterator[Any]:
+    """
+    OpenTelemetry span when available (no-op otherwise). If `headers` is given,
+    the trace context is injected into it so Gaia can continue the trace.
+    """
+    if not _otel_loaded:
+        _load_otel()
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as s:
+        if headers is not None:
+            _propagate.inject(headers)
+        yield s
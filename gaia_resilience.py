@@ -0,0 +1,152 @@
+import os
+import time
+import random
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, Optional
+
+# === Configuration ===
+GAIA_RETRY_ATTEMPTS = int(os.getenv("GAIA_RETRY_ATTEMPTS", "3"))
+GAIA_RETRY_BASE_DELAY = float(os.getenv("GAIA_RETRY_BASE_DELAY", "0.2"))
+GAIA_RETRY_MAX_DELAY = float(os.getenv("GAIA_RETRY_MAX_DELAY", "2"))
+GAIA_HEDGE = os.getenv("GAIA_HEDGE", "false").lower() in ("1", "true", "yes")
+GAIA_HEDGE_PERCENTILE = float(os.getenv("GAIA_HEDGE_PERCENTILE", "95"))
+GAIA_HEDGE_MIN_DELAY = float(os.getenv("GAIA_HEDGE_MIN_DELAY", "0.05"))
+GAIA_BREAKER_FAILURES = int(os.getenv("GAIA_BREAKER_FAILURES", "5"))
+GAIA_BREAKER_RESET = float(os.getenv("GAIA_BREAKER_RESET", "30"))
+# Adaptive per-endpoint timeouts: a multiple of the endpoint's recent latency percentile,
+# never below the floor nor above the endpoint's configured timeout
+GAIA_ADAPTIVE_TIMEOUT = os.getenv("GAIA_ADAPTIVE_TIMEOUT", "true").lower() in ("1", "true", "yes")
+GAIA_ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv("GAIA_ADAPTIVE_TIMEOUT_PERCENTILE", "99"))
+GAIA_ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("GAIA_ADAPTIVE_TIMEOUT_MULTIPLIER", "4"))
+GAIA_ADAPTIVE_TIMEOUT_MIN = float(os.getenv("GAIA_ADAPTIVE_TIMEOUT_MIN", "2"))
+
+# Fewer samples than this and the configured timeout is used as is
+_ADAPTIVE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling Gaia while the circuit breaker is open.
+    """
+
+
+# === Retries ===
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for idempotent requests.
+    """
+
+    def __init__(
+        self,
+        attempts: int = GAIA_RETRY_ATTEMPTS,
+        base_delay: float = GAIA_RETRY_BASE_DELAY,
+        max_delay: float = GAIA_RETRY_MAX_DELAY,
+        retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504}),
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+# === Latency Tracking ===
+class LatencyTracker:
+    """
+    Sliding window of recent request durations (seconds) for one endpoint.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def timeout(self, ceiling: float) -> float:
+        """
+        Adaptive timeout for the next request: GAIA_ADAPTIVE_TIMEOUT_MULTIPLIER
+        times the recent latency percentile, between GAIA_ADAPTIVE_TIMEOUT_MIN
+        and `ceiling`. Timed-out attempts are recorded at their timeout, so a
+        slowing endpoint pushes its own timeout up.
+        """
+        if not GAIA_ADAPTIVE_TIMEOUT or len(self._samples) < _ADAPTIVE_MIN_SAMPLES:
+            return ceiling
+        observed = self.percentile(GAIA_ADAPTIVE_TIMEOUT_PERCENTILE) or 0.0
+        return min(ceiling, max(GAIA_ADAPTIVE_TIMEOUT_MIN, observed * GAIA_ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self._samples),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+# === Circuit Breaker ===
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, rejecting calls
+    until `reset_timeout` has passed. Then a single trial call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = GAIA_BREAKER_FAILURES,
+        reset_timeout: float = GAIA_BREAKER_RESET,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_started: Optional[float] = None
+
+    def check(self) -> None:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"Gaia upstream unavailable; retrying after {self.reset_timeout:.0f}s cool-down"
+                )
+            self.state = self.HALF_OPEN
+            self._trial_started = None
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            # A trial that never reported back (e.g. cancelled) expires after reset_timeout
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError("Gaia upstream unavailable; trial request in progress")
+            self._trial_started = now
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
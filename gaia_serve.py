@@ -0,0 +1,272 @@
+"""
+Production entrypoint: serves the MCP streamable-HTTP endpoint and the REST
+API (including /healthz, /readyz and /metrics) from one app, on N uvicorn
+worker processes:
+
+    python gaia_serve.py --workers 4 --port 8001
+
+Each worker is a separate process with its own connection pool, caches,
+sessions and rate limits, so put sticky routing in front of the workers if
+clients rely on ask sessions. uvloop and httptools are used when installed.
+On SIGTERM, workers fail /readyz and turn new asks away for
+GAIA_DRAIN_GRACE seconds, then stop accepting connections and let in-flight
+calls (ask streams included) finish for up to GAIA_DRAIN_TIMEOUT seconds.
+"""
+import os
+import json
+import signal
+import asyncio
+import logging
+import argparse
+import functools
+import threading
+import contextlib
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+GAIA_BIND_HOST = os.getenv("GAIA_BIND_HOST", "0.0.0.0")
+GAIA_PORT = int(os.getenv("GAIA_PORT", "8001"))
+GAIA_MCP_PATH = os.getenv("GAIA_MCP_PATH", "/mcp")
+# Worker processes (0 = one per CPU)
+GAIA_WORKERS = int(os.getenv("GAIA_WORKERS", "1"))
+# Event loop: auto (uvloop when installed), uvloop or asyncio
+GAIA_LOOP = os.getenv("GAIA_LOOP", "auto")
+# Listen backlog, idle keep-alive timeout (seconds), and per-worker connection cap (0 = none)
+GAIA_BACKLOG = int(os.getenv("GAIA_BACKLOG", "2048"))
+GAIA_KEEPALIVE_TIMEOUT = int(os.getenv("GAIA_KEEPALIVE_TIMEOUT", "5"))
+GAIA_LIMIT_CONCURRENCY = int(os.getenv("GAIA_LIMIT_CONCURRENCY", "0"))
+# Restart a worker after this many requests (0 = never)
+GAIA_LIMIT_MAX_REQUESTS = int(os.getenv("GAIA_LIMIT_MAX_REQUESTS", "0"))
+# Seconds in-flight calls get to finish on shutdown
+GAIA_DRAIN_TIMEOUT = float(os.getenv("GAIA_DRAIN_TIMEOUT", "30"))
+# Seconds between SIGTERM and closing the listener, while /readyz already fails
+# so load balancers stop sending traffic here (0 = close right away)
+GAIA_DRAIN_GRACE = float(os.getenv("GAIA_DRAIN_GRACE", "5"))
+
+
+class DrainingError(Exception):
+    """
+    Raised for calls that arrive after shutdown has started.
+    """
+
+
+# === Graceful Drain ===
+class Drain:
+    """
+    Counts in-flight calls that should finish before shutdown (asks), and
+    turns new ones away once draining has started.
+    """
+
+    def __init__(self) -> None:
+        self.draining = False
+        self.in_flight = 0
+        self.rejected = 0
+        self._idle: Optional[asyncio.Event] = None
+
+    def _idle_event(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if not self.in_flight:
+                self._idle.set()
+        return self._idle
+
+    def reset(self) -> None:
+        self.draining = False
+        self._idle = None
+
+    def resume(self) -> None:
+        # Take calls again; unlike reset(), callers already in wait() keep waiting
+        self.draining = False
+
+    def start(self) -> None:
+        self.draining = True
+
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        if self.draining:
+            self.rejected += 1
+            raise DrainingError("Server is shutting down; retry on another instance")
+        self.in_flight += 1
+        self._idle_event().clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle_event().set()
+
+    def tracked(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Decorator tracking a native MCP tool call; keeps the signature for FastMCP.
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with self.track():
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for in-flight calls; True if all finished.
+        """
+        try:
+            await asyncio.wait_for(self._idle_event().wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"draining": self.draining, "in_flight": self.in_flight, "rejected": self.rejected}
+
+
+drain = Drain()
+
+
+def drain_on_sigterm(drain: Drain = drain, grace: float = GAIA_DRAIN_GRACE) -> Callable[[], None]:
+    """
+    Chain onto the server's SIGTERM handler (uvicorn's): start draining as
+    soon as the signal arrives, so /readyz fails and new asks are turned
+    away while the listener stays open, and pass the signal on `grace`
+    seconds later. uvicorn then stops accepting connections and waits for
+    in-flight requests. A second SIGTERM is passed on right away. Returns a
+    function restoring the previous handler; does nothing outside the main
+    thread or when no handler is installed (e.g. stdio MCP).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return lambda: None
+    loop = asyncio.get_running_loop()
+
+    def handle(sig: int, frame: Any) -> None:
+        if drain.draining or grace <= 0:
+            drain.start()
+            previous(sig, frame)
+            return
+        logger.info("SIGTERM: draining, closing the listener in %.1fs", grace)
+        drain.start()
+        loop.call_soon_threadsafe(loop.call_later, grace, previous, sig, frame)
+
+    signal.signal(signal.SIGTERM, handle)
+
+    def restore() -> None:
+        if signal.getsignal(signal.SIGTERM) is handle:
+            signal.signal(signal.SIGTERM, previous)
+    return restore
+
+
+class DrainMiddleware:
+    """
+    ASGI middleware tracking requests under `prefixes` with `drain`; once
+    draining, they get a 503 with Connection: close instead.
+    """
+
+    def __init__(self, app: Any, drain: Drain = drain, prefixes: Collection[str] = ()):
+        self.app = app
+        self.drain = drain
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        if self.drain.draining:
+            self.drain.rejected += 1
+            body = json.dumps({"detail": "Server is shutting down; retry on another instance"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close"),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        with self.drain.track():
+            await self.app(scope, receive, send)
+
+
+# === ASGI App ===
+def create_app() -> Any:
+    """
+    One ASGI app per worker: the MCP endpoint at GAIA_MCP_PATH and the REST
+    API everywhere else. Its lifespan holds the Gaia pool open for the
+    worker's lifetime (rather than per MCP session).
+    """
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    from gaia_config import load_config
+    load_config()
+    from gaia_mcp_server import app as api, gaia_lifespan, mcp
+
+    mcp_app = mcp.http_app(path=GAIA_MCP_PATH)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Any):
+        async with gaia_lifespan(app), mcp_app.lifespan(app):
+            yield
+
+    # mcp_app's middleware (FastMCP's request context) lets MCP tools see the
+    # client's HTTP headers: credentials and deadlines
+    return Starlette(
+        routes=[*mcp_app.routes, Mount("/", app=api)],
+        middleware=mcp_app.user_middleware,
+        lifespan=lifespan
+    )
+
+
+# === Entrypoint ===
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Gaia MCP server with uvicorn workers.")
+    parser.add_argument("--host", default=GAIA_BIND_HOST)
+    parser.add_argument("--port", type=int, default=GAIA_PORT)
+    parser.add_argument("--workers", type=int, default=GAIA_WORKERS, help="0 = one per CPU")
+    parser.add_argument("--loop", default=GAIA_LOOP, choices=("auto", "uvloop", "asyncio"))
+    parser.add_argument("--backlog", type=int, default=GAIA_BACKLOG)
+    parser.add_argument("--keepalive-timeout", type=int, default=GAIA_KEEPALIVE_TIMEOUT)
+    parser.add_argument("--limit-concurrency", type=int, default=GAIA_LIMIT_CONCURRENCY, help="0 = no limit")
+    parser.add_argument("--limit-max-requests", type=int, default=GAIA_LIMIT_MAX_REQUESTS, help="0 = no limit")
+    parser.add_argument("--drain-timeout", type=float, default=GAIA_DRAIN_TIMEOUT)
+    parser.add_argument("--drain-grace", type=float, default=GAIA_DRAIN_GRACE,
+                        help="Seconds /readyz fails after SIGTERM before the listener closes")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    from gaia_config import load_config
+
+    args = parse_args(argv)
+    # Workers are fresh processes that read their settings from the environment
+    load_config(log_level=args.log_level)
+    os.environ["GAIA_DRAIN_TIMEOUT"] = str(args.drain_timeout)
+    os.environ["GAIA_DRAIN_GRACE"] = str(args.drain_grace)
+    os.environ["GAIA_LOG_LEVEL"] = args.log_level
+    uvicorn.run(
+        "gaia_serve:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers or os.cpu_count() or 1,
+        loop=args.loop,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive_timeout,
+        limit_concurrency=args.limit_concurrency or None,
+        limit_max_requests=args.limit_max_requests or None,
+        timeout_graceful_shutdown=args.drain_timeout,
+        lifespan="on",
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,80 @@
 import os
-import json
+import time
+import heapq
 import asyncio
-from typing import Any, Dict, List, Optional
+import contextlib
+from typing import Annotated, Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 import httpx
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 import logging
 
-load_dotenv()
+from gaia_deadline import DeadlineExceeded, budget, check as check_deadline, remaining, use_deadline
+from gaia_http import GaiaHTTPPool
+from gaia_resilience import CircuitOpenError
+from gaia_catalog import GAIA_CATALOG_AUTO_K, DatasetCatalog
+from gaia_cache import AnswerCache, AsyncTTLCache, ContentStore, SingleFlight, credential_digest, digest, object_version
+from gaia_metrics import PHASE_SECONDS
+from gaia_json import loads
+from gaia_sessions import Session, SessionStore
+from gaia_tenants import Credentials, TenantRegistry, use_credentials
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # === Configuration ===
 GAIA_HOST = os.getenv("GAIA_HOST", "https://helios.cohesity.com")
 API_KEY_HEADER = os.getenv("API_KEY_HEADER", "")
-print(GAIA_HOST)
-print(API_KEY_HEADER)
+# Upper bound on one ask (plain or streamed, per read); GETs use the pool's GAIA_HTTP_TIMEOUT.
+# Both are shortened by adaptive timeouts and by the calling client's deadline.
+GAIA_ASK_TIMEOUT = float(os.getenv("GAIA_ASK_TIMEOUT", "60"))
+# Discovery fan-out: max parallel requests, per-request timeout, overall deadline (seconds)
+GAIA_DISCOVERY_CONCURRENCY = int(os.getenv("GAIA_DISCOVERY_CONCURRENCY", "16"))
+GAIA_DISCOVERY_TIMEOUT = float(os.getenv("GAIA_DISCOVERY_TIMEOUT", "10"))
+GAIA_DISCOVERY_DEADLINE = float(os.getenv("GAIA_DISCOVERY_DEADLINE", "20"))
+# Objects search paging: objects per upstream page (default and largest accepted), and default cap per search
+GAIA_OBJECTS_PAGE_SIZE = int(os.getenv("GAIA_OBJECTS_PAGE_SIZE", "100"))
+GAIA_OBJECTS_MAX_PAGE_SIZE = int(os.getenv("GAIA_OBJECTS_MAX_PAGE_SIZE", "1000"))
+GAIA_OBJECTS_MAX_RESULTS = int(os.getenv("GAIA_OBJECTS_MAX_RESULTS", "1000"))
+# ExecuteParams filters sent to Gaia's objects API; all filters are also re-checked locally
+GAIA_PUSHDOWN_FILTERS = {
+    f.strip() for f in os.getenv(
+        "GAIA_PUSHDOWN_FILTERS", "file_type,file_greater_than_kb,file_less_than_kb"
+    ).split(",") if f.strip()
+}
+# Batch QA: parallel upstream asks per batch (default and largest accepted), and max questions per batch
+GAIA_BATCH_CONCURRENCY = int(os.getenv("GAIA_BATCH_CONCURRENCY", "8"))
+GAIA_BATCH_MAX_QUESTIONS = int(os.getenv("GAIA_BATCH_MAX_QUESTIONS", "100"))
+# Object fields copied into Document.metadata (comma-separated). Empty keeps every
+# field except id and text, which Document already carries; "*" keeps the raw object.
+GAIA_METADATA_FIELDS = [
+    f.strip() for f in os.getenv("GAIA_METADATA_FIELDS", "").split(",") if f.strip()
+]
+# Federated search: parallel per-dataset queries, results kept, and the score that
+# counts as a high-confidence hit (k of those end the search early)
+GAIA_FEDERATED_CONCURRENCY = int(os.getenv("GAIA_FEDERATED_CONCURRENCY", "8"))
+GAIA_FEDERATED_TOP_K = int(os.getenv("GAIA_FEDERATED_TOP_K", "20"))
+GAIA_FEDERATED_MIN_SCORE = float(os.getenv("GAIA_FEDERATED_MIN_SCORE", "0.8"))
+GAIA_FEDERATED_DEADLINE = float(os.getenv("GAIA_FEDERATED_DEADLINE", "20"))
+# Readiness probe: upstream timeout, and how long a probe result is reused (seconds)
+GAIA_READY_TIMEOUT = float(os.getenv("GAIA_READY_TIMEOUT", "2"))
+GAIA_READY_TTL = float(os.getenv("GAIA_READY_TTL", "5"))
+# Add metadata of locally stored documents (see GAIA_CONTENT_STORE) to ask citations
+GAIA_ENRICH_CITATIONS = os.getenv("GAIA_ENRICH_CITATIONS", "true").lower() in ("1", "true", "yes")
+
+# Per-request Gaia credentials; GAIA_HOST / API_KEY_HEADER are the defaults
+tenants = TenantRegistry(default=Credentials(GAIA_HOST, API_KEY_HEADER))
+
+def _identity() -> Tuple[str, str]:
+    # (Gaia host, key fingerprint) of the current request; scopes every cache key
+    creds = tenants.current()
+    return creds.host, credential_digest(creds.api_key)
 
 # === Pydantic Models ===
+# Bounded tool inputs, shared by the models, the REST endpoints and the MCP tools
+PageSize = Annotated[int, Field(ge=1, le=GAIA_OBJECTS_MAX_PAGE_SIZE)]
+MaxResults = Annotated[int, Field(ge=1)]
+BatchConcurrency = Annotated[int, Field(ge=1, le=GAIA_BATCH_CONCURRENCY)]
+
 class ExecuteParams(BaseModel):
     semantic_search_string: Optional[str] = None
     keyword: Optional[str] = None
@@ -28,6 +82,14 @@ class ExecuteParams(BaseModel):
     file_type: Optional[List[str]] = None
     file_greater_than_kb: Optional[int] = None
     file_less_than_kb: Optional[int] = None
+    # Paging: objects per upstream request, resume cursor, and overall cap
+    page_size: PageSize = GAIA_OBJECTS_PAGE_SIZE
+    cursor: Optional[str] = None
+    max_results: Optional[MaxResults] = GAIA_OBJECTS_MAX_RESULTS
+    # Metadata projection (see GAIA_METADATA_FIELDS); applied locally, never sent to Gaia
+    metadata_fields: Optional[List[str]] = None
+    # Restrict the search to these datasets (Gaia dataset ids)
+    dataset_ids: Optional[List[str]] = None
 
 class Document(BaseModel):
     id: str
@@ -36,6 +98,31 @@ class Document(BaseModel):
 
 class ExecuteResult(BaseModel):
     documents: List[Document]
+    # Pass back as ExecuteParams.cursor to continue after these documents
+    next_cursor: Optional[str] = None
+    # Objects returned by Gaia but dropped by the local file_type/size filter
+    pruned: int = 0
+
+class DocumentsResult(BaseModel):
+    # In request order; ids not in the local content store are listed in missing
+    documents: List[Document]
+    missing: List[str] = Field(default_factory=list)
+
+class RankedDocument(Document):
+    # Gaia's relevance score, when the object carries one
+    score: Optional[float] = None
+    dataset_name: str
+
+class FederatedSearchResult(BaseModel):
+    # Best first; one entry per document id
+    documents: List[RankedDocument]
+    # Datasets whose results were all considered
+    searched: List[str] = Field(default_factory=list)
+    # Still running at the early return or the deadline; their results may be missing
+    pending: List[str] = Field(default_factory=list)
+    failed: List[str] = Field(default_factory=list)
+    # Requested names that match no dataset
+    unknown: List[str] = Field(default_factory=list)
 
 class Dataset(BaseModel):
     id: str
@@ -56,14 +143,60 @@ class AskResult(BaseModel):
     responseString: str
     citations: List[Dict[str, Any]]
 
+class AskSessionResult(AskResult):
+    # Pass back as session_id on the next turn; turns counts this one
+    session_id: str
+    turns: int
+
+class AskChunk(BaseModel):
+    # "token" (partial answer text), "citations" or "done" (full answer text)
+    type: str
+    text: str = ""
+    citations: List[Dict[str, Any]] = Field(default_factory=list)
+    # Set on the "done" chunk of a session ask
+    session_id: Optional[str] = None
+    turns: Optional[int] = None
+
+class AskBatchItem(BaseModel):
+    # Position of the question in the request
+    index: int
+    question: str
+    # "ok" or "error"; a failed question never affects the others
+    status: str = "ok"
+    responseString: Optional[str] = None
+    citations: List[Dict[str, Any]] = Field(default_factory=list)
+    error: Optional[str] = None
+
+class AskBatchResult(BaseModel):
+    results: List[AskBatchItem]
+    succeeded: int = 0
+    failed: int = 0
+
 # --- DiscoverTools Models ---
 class DiscoverTool(BaseModel):
     dataset_id: str
     dataset_name: str
     description: Optional[str] = None
+    # "ok", "error" (discovery call failed) or "pending" (missed the deadline)
+    status: str = "ok"
 
 class ListDiscoverToolsResult(BaseModel):
     tools: List[DiscoverTool]
+    pending: List[str] = Field(default_factory=list)
+
+class DatasetMatch(BaseModel):
+    dataset_id: str
+    dataset_name: str
+    description: Optional[str] = None
+    # Keyword relevance (best match = 1) plus trigram similarity when vectors are enabled
+    score: float
+
+class SelectDatasetsResult(BaseModel):
+    # Best first
+    datasets: List[DatasetMatch]
+    # Datasets in the catalog, and seconds since it was built from discovery
+    catalog_size: int
+    catalog_age: float
 
 # === Utility Functions ===
 def build_gaia_params(p: ExecuteParams) -> Dict[str, Any]:
@@ -74,158 +207,1017 @@ def build_gaia_params(p: ExecuteParams) -> Dict[str, Any]:
         q["semanticSearchString"] = p.semantic_search_string
     if p.keyword:
         q["keyword"] = p.keyword
+    if p.file_type and "file_type" in GAIA_PUSHDOWN_FILTERS:
+        q["fileTypes"] = [_normalize_file_type(t) for t in p.file_type]
+    if p.file_greater_than_kb is not None and "file_greater_than_kb" in GAIA_PUSHDOWN_FILTERS:
+        q["fileSizeGreaterThanKb"] = p.file_greater_than_kb
+    if p.file_less_than_kb is not None and "file_less_than_kb" in GAIA_PUSHDOWN_FILTERS:
+        q["fileSizeLessThanKb"] = p.file_less_than_kb
+    if p.page_size:
+        q["pageSize"] = p.page_size
+    if p.cursor:
+        q["paginationCookie"] = p.cursor
+    if p.dataset_ids:
+        q["datasetIds"] = p.dataset_ids
     return q
 
-async def call_gaia(params: ExecuteParams) -> List[Dict[str, Any]]:
-    url = f"{GAIA_HOST}/v2/mcm/gaia/objects"
-    headers = {"accept": "application/json", "apiKey": API_KEY_HEADER}
-    logger.debug(f"Gaia objects request URL: {url}")
-    logger.debug(f"Gaia request headers: {headers}")
-    logger.debug(f"Gaia request params: {build_gaia_params(params)}")
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers, params=build_gaia_params(params))
-    logger.debug(f"Gaia objects response status: {r.status_code}")
-    logger.debug(f"Gaia objects response body: {r.text}")
+def _normalize_file_type(t: str) -> str:
+    return t.strip().lower().lstrip(".")
+
+def _object_file_type(o: Dict[str, Any]) -> Optional[str]:
+    ft = o.get("fileType") or o.get("extension")
+    if ft:
+        return _normalize_file_type(str(ft))
+    name = o.get("name") or o.get("fileName") or o.get("path") or ""
+    _, dot, ext = str(name).rpartition(".")
+    return ext.lower() if dot and ext else None
+
+def _object_size_bytes(o: Dict[str, Any]) -> Optional[float]:
+    for key in ("sizeBytes", "size", "fileSize"):
+        size = o.get(key)
+        if isinstance(size, (int, float)):
+            return size
+    return None
+
+def build_local_filter(p: ExecuteParams) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """
+    Predicate enforcing the file_type and size filters on raw Gaia objects, or
+    None when no such filter is set. Objects missing the relevant metadata are
+    kept, since they can't be ruled out.
+    """
+    types = {_normalize_file_type(t) for t in p.file_type or []}
+    min_bytes = p.file_greater_than_kb * 1024 if p.file_greater_than_kb is not None else None
+    max_bytes = p.file_less_than_kb * 1024 if p.file_less_than_kb is not None else None
+    if not types and min_bytes is None and max_bytes is None:
+        return None
+
+    def keep(o: Dict[str, Any]) -> bool:
+        if types:
+            ft = _object_file_type(o)
+            if ft is not None and ft not in types:
+                return False
+        if min_bytes is not None or max_bytes is not None:
+            size = _object_size_bytes(o)
+            if size is not None:
+                if min_bytes is not None and size <= min_bytes:
+                    return False
+                if max_bytes is not None and size >= max_bytes:
+                    return False
+        return True
+
+    return keep
+
+# === Request Coalescing ===
+# Concurrent identical upstream calls share one request; see SingleFlight
+objects_flight = SingleFlight("objects")
+qa_flight = SingleFlight("ask")
+
+# Parameters that only shape the local response, not the upstream request
+_LOCAL_PARAMS = {"metadata_fields"}
+
+def _request_key(kind: str, params: BaseModel) -> str:
+    # Same Gaia identity + same parameters => same upstream request
+    return digest(kind, *_identity(), params.model_dump(mode="json", exclude=_LOCAL_PARAMS))
+
+async def call_gaia_page(
+    params: ExecuteParams,
+    pool: Optional[GaiaHTTPPool] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of objects. Returns (objects, cursor for the next page or None).
+    Identical concurrent page requests are coalesced; the returned objects are
+    shared between callers and must not be mutated.
+    """
+    pool = pool or tenants.pool()
+    return await objects_flight.do(_request_key("objects", params), lambda: _fetch_objects_page(params, pool))
+
+async def _fetch_objects_page(
+    params: ExecuteParams,
+    pool: GaiaHTTPPool
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    creds = tenants.current()
+    url = f"{creds.host}/v2/mcm/gaia/objects"
+    headers = {"accept": "application/json", "apiKey": creds.api_key}
+    # Request/response debug traces (redacted, size-capped) are emitted by the pool
+    r = await pool.get(url, headers=headers, params=build_gaia_params(params))
     r.raise_for_status()
-    return r.json().get("objects", [])
+    with PHASE_SECONDS.time(phase="json_decode", operation="objects"):
+        data = loads(r.content)
+    objects = data.get("objects", [])
+    remember_objects(objects)
+    return objects, data.get("paginationCookie") or None
+
+async def iter_gaia_pages(
+    params: ExecuteParams,
+    pool: Optional[GaiaHTTPPool] = None
+) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str], int]]:
+    """
+    Follow Gaia's pagination cookie, yielding (objects, next cursor, pruned) per
+    page until the results run out or params.max_results objects have been
+    yielded. Objects failing the local file filter are dropped and counted in
+    `pruned` before anything else touches them.
+    """
+    keep = build_local_filter(params)
+    cursor = params.cursor
+    # Objects still wanted; None means no cap
+    left = params.max_results
+    while left is None or left > 0:
+        page_size = params.page_size if left is None else min(params.page_size, left)
+        page_params = params.model_copy(update={"cursor": cursor, "page_size": page_size})
+        raw, cursor = await call_gaia_page(page_params, pool=pool)
+        objects = raw if keep is None else [o for o in raw if keep(o)]
+        pruned = len(raw) - len(objects)
+        if left is not None:
+            objects = objects[:left]
+            left -= len(objects)
+        if objects or pruned:
+            yield objects, cursor, pruned
+        if not raw or cursor is None:
+            return
+
+async def call_gaia(params: ExecuteParams, pool: Optional[GaiaHTTPPool] = None) -> List[Dict[str, Any]]:
+    objects: List[Dict[str, Any]] = []
+    async for page, _, _ in iter_gaia_pages(params, pool=pool):
+        objects.extend(page)
+    return objects
+
+# === Cached Dataset Metadata ===
+datasets_cache = AsyncTTLCache("datasets")
+discovery_cache = AsyncTTLCache("discovery")
+
+def _cache_key(*parts: Any) -> Tuple[Any, ...]:
+    # Scope cached metadata to the Gaia identity that fetched it
+    return _identity() + parts
+
+async def _fetch_datasets(pool: GaiaHTTPPool) -> List[Dict[str, Any]]:
+    creds = tenants.current()
+    url = f"{creds.host}/v2/mcm/gaia/datasets"
+    headers = {
+        "accept": "application/json",
+        "apiKey": creds.api_key
+    }
+    resp = await pool.get(url, headers=headers)
+    resp.raise_for_status()
+    with PHASE_SECONDS.time(phase="json_decode", operation="datasets"):
+        return loads(resp.content).get("datasets", [])
 
-async def list_datasets() -> ListDatasetsResult:
-    url = f"{GAIA_HOST}/v2/mcm/gaia/datasets"
+async def _fetch_discovery(
+    pool: GaiaHTTPPool,
+    ds_id: Any,
+    slots: Optional[asyncio.Semaphore] = None,
+    timeout: float = GAIA_DISCOVERY_TIMEOUT
+) -> Optional[Dict[str, Any]]:
+    creds = tenants.current()
+    url = f"{creds.host}/v2/mcm/gaia/dataset/{ds_id}/discovery?level=1&numLevels=2"
     headers = {
         "accept": "application/json",
-        "apiKey": API_KEY_HEADER
+        "apiKey": creds.api_key
     }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, headers=headers)
+    async with slots or contextlib.nullcontext():
+        resp = await asyncio.wait_for(pool.get(url, headers=headers), timeout)
     resp.raise_for_status()
-    ds = resp.json().get("datasets", [])
+    with PHASE_SECONDS.time(phase="json_decode", operation="discovery"):
+        results = loads(resp.content).get("results", [])
+    return results[0] if results else None
+
+async def get_datasets(pool: Optional[GaiaHTTPPool] = None, refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    Raw Gaia dataset list, served from the TTL cache when warm.
+    """
+    pool = pool or tenants.pool()
+    return await datasets_cache.get_or_fetch(
+        _cache_key("datasets"), lambda: _fetch_datasets(pool), refresh=refresh
+    )
+
+async def get_discovery(
+    ds_id: Any,
+    pool: Optional[GaiaHTTPPool] = None,
+    refresh: bool = False,
+    slots: Optional[asyncio.Semaphore] = None,
+    timeout: float = GAIA_DISCOVERY_TIMEOUT
+) -> Optional[Dict[str, Any]]:
+    """
+    First discovery result for a dataset, served from the TTL cache when warm.
+    """
+    pool = pool or tenants.pool()
+    return await discovery_cache.get_or_fetch(
+        _cache_key("discovery", ds_id),
+        lambda: _fetch_discovery(pool, ds_id, slots=slots, timeout=timeout),
+        refresh=refresh
+    )
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "datasets": datasets_cache.stats(),
+        "discovery": discovery_cache.stats(),
+        "answers": answer_cache.stats(),
+        "sessions": sessions.stats(),
+        "catalog": dataset_catalog.stats(),
+        "content": content_store.stats() if content_store is not None else None,
+        "coalescing": {"objects": objects_flight.stats(), "ask": qa_flight.stats()}
+    }
+
+async def list_datasets(pool: Optional[GaiaHTTPPool] = None, refresh: bool = False) -> ListDatasetsResult:
+    ds = await get_datasets(pool, refresh=refresh)
     # Map raw list to Dataset models
     items = [{"id": d.get("id"), "name": d.get("name"), "description": d.get("description")} for d in ds]
     return ListDatasetsResult(datasets=items)
 
-async def list_datasets_descriptions() -> ListDiscoverToolsResult:
+# === Readiness ===
+_probe_flight = SingleFlight("ready_probe")
+_last_probe: Tuple[float, Optional[str]] = (float("-inf"), None)
+
+async def _probe_upstream() -> Optional[str]:
+    creds = tenants.current()
+    try:
+        resp = await tenants.pool().request(
+            "GET",
+            f"{creds.host}/v2/mcm/gaia/datasets",
+            idempotent=False,
+            headers={"accept": "application/json", "apiKey": creds.api_key},
+            timeout=GAIA_READY_TIMEOUT
+        )
+    except CircuitOpenError as e:
+        return str(e)
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__}: {e}"
+    if resp.status_code >= 500:
+        return f"Gaia returned HTTP {resp.status_code}"
+    return None
+
+async def probe_upstream() -> Optional[str]:
     """
-    Return list of datasets with their descriptions via Gaia discovery API.
+    Check that the default Gaia host answers (any non-5xx status) with one
+    unretried dataset-list call. Returns None if reachable, else the reason.
+    Results are reused for GAIA_READY_TTL seconds so frequent readiness
+    probes don't turn into upstream load.
     """
-    # Fetch all datasets
-    ds_url = f"{GAIA_HOST}/v2/mcm/gaia/datasets"
-    headers = {
-        "accept": "application/json",
-        "apiKey": API_KEY_HEADER
+    global _last_probe
+    checked_at, error = _last_probe
+    if time.monotonic() - checked_at < GAIA_READY_TTL:
+        return error
+    with use_credentials(None):
+        error = await _probe_flight.do("probe", _probe_upstream)
+    _last_probe = (time.monotonic(), error)
+    return error
+
+# === Discovery Fan-out ===
+_PENDING = object()
+
+async def _iter_discovery(
+    ds_list: List[Dict[str, Any]],
+    pool: GaiaHTTPPool,
+    refresh: bool,
+    concurrency: int,
+    request_timeout: float,
+    deadline_at: float
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (index into ds_list, discovery result | exception | _PENDING) in completion order.
+
+    At most `concurrency` discovery requests run at once. Datasets still
+    outstanding at `deadline_at` (loop time) are yielded as _PENDING; their
+    fetches keep running in the background and land in the cache.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    tasks = {
+        asyncio.ensure_future(get_discovery(d.get("id"), pool, refresh=refresh, slots=slots, timeout=request_timeout)): i
+        for i, d in enumerate(ds_list)
     }
-    async with httpx.AsyncClient() as client:
-        resp_ds = await client.get(ds_url, headers=headers)
-    resp_ds.raise_for_status()
-    ds_list = resp_ds.json().get("datasets", [])
-
-    # For each dataset, fetch its discovery description
-    tasks = []
-    async with httpx.AsyncClient() as client:
-        for d in ds_list:
-            ds_id = d.get("id")
-            disc_url = f"{GAIA_HOST}/v2/mcm/gaia/dataset/{ds_id}/discovery?level=1&numLevels=2"
-            tasks.append(client.get(disc_url, headers=headers))
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-
-    tools: List[DiscoverTool] = []
-    for d, r in zip(ds_list, responses):
-        desc: Optional[str] = None
-        if not isinstance(r, Exception):
-            jr = r.json()
-            results = jr.get("results", [])
-            desc = results[0].get("description", "") if results else None
-        tools.append(DiscoverTool(
-            dataset_id=d.get("id", ""),
-            dataset_name=d.get("name", ""),
-            description=desc
-        ))
-
-    return ListDiscoverToolsResult(tools=tools)
+    pending = set(tasks)
+    try:
+        while pending:
+            wait = deadline_at - loop.time()
+            if wait <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                yield tasks[t], (t.exception() or t.result())
+        for t in sorted(pending, key=tasks.__getitem__):
+            yield tasks[t], _PENDING
+    finally:
+        # Only our wait is cancelled: get_discovery fetches through the cache's
+        # SingleFlight (cancel_when_abandoned=False), which shields a detached
+        # fetch, so pending datasets still finish and land in the cache
+        for t in pending:
+            t.cancel()
+
+def _discover_tool(d: Dict[str, Any], r: Any, missing_description: Optional[str]) -> DiscoverTool:
+    status = "ok"
+    desc: Optional[str] = None
+    if r is _PENDING:
+        status = "pending"
+    elif isinstance(r, BaseException):
+        status = "error"
+    else:
+        desc = r.get("description", "") if r else missing_description
+    return DiscoverTool(
+        dataset_id=d.get("id", ""),
+        dataset_name=d.get("name", ""),
+        description=desc,
+        status=status
+    )
+
+async def _iter_indexed_discover_tools(
+    pool: Optional[GaiaHTTPPool] = None,
+    refresh: bool = False,
+    concurrency: int = GAIA_DISCOVERY_CONCURRENCY,
+    request_timeout: float = GAIA_DISCOVERY_TIMEOUT,
+    deadline: float = GAIA_DISCOVERY_DEADLINE,
+    missing_description: Optional[str] = ""
+) -> AsyncIterator[Tuple[int, DiscoverTool]]:
+    pool = pool or tenants.pool()
+    # Leave pending datasets out rather than overrun the caller's deadline
+    deadline = budget(deadline)
+    deadline_at = asyncio.get_running_loop().time() + deadline
+    # Fetch list of datasets
+    with use_deadline(deadline):
+        ds_list = await get_datasets(pool, refresh=refresh)
+    async for i, r in _iter_discovery(ds_list, pool, refresh, concurrency, request_timeout, deadline_at):
+        yield i, _discover_tool(ds_list[i], r, missing_description)
+
+async def iter_discover_tools(**kwargs: Any) -> AsyncIterator[DiscoverTool]:
+    """
+    Stream DiscoverTool entries as each dataset's discovery call completes.
+    Datasets that miss the overall deadline are yielded last with status "pending".
+    Accepts the same keyword arguments as discover_tools.
+    """
+    async for _, tool in _iter_indexed_discover_tools(**kwargs):
+        yield tool
+
+async def _collect_discover_tools(missing_description: Optional[str], **kwargs: Any) -> ListDiscoverToolsResult:
+    indexed = [it async for it in _iter_indexed_discover_tools(missing_description=missing_description, **kwargs)]
+    # Present in Gaia's dataset order rather than completion order
+    tools = [t for _, t in sorted(indexed, key=lambda it: it[0])]
+    return ListDiscoverToolsResult(
+        tools=tools,
+        pending=[t.dataset_name for t in tools if t.status == "pending"]
+    )
+
+async def list_datasets_descriptions(
+    pool: Optional[GaiaHTTPPool] = None,
+    refresh: bool = False,
+    concurrency: int = GAIA_DISCOVERY_CONCURRENCY,
+    request_timeout: float = GAIA_DISCOVERY_TIMEOUT,
+    deadline: float = GAIA_DISCOVERY_DEADLINE
+) -> ListDiscoverToolsResult:
+    """
+    Return list of datasets with their descriptions via Gaia discovery API.
+    """
+    return await _collect_discover_tools(
+        missing_description=None,
+        pool=pool,
+        refresh=refresh,
+        concurrency=concurrency,
+        request_timeout=request_timeout,
+        deadline=deadline
+    )
+
+_DOCUMENTS = TypeAdapter(List[Document])
+
+def _project_metadata(o: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    if not fields:
+        # id and text are already top-level Document fields
+        metadata = dict(o)
+        metadata.pop("id", None)
+        metadata.pop("text", None)
+        return metadata
+    if fields == ["*"]:
+        return o
+    return {k: o[k] for k in fields if k in o}
+
+def _to_documents(objects: List[Dict[str, Any]], fields: List[str] = GAIA_METADATA_FIELDS) -> List[Document]:
+    # One batched validation is cheaper than a Document(...) (or model_construct) per object
+    return _DOCUMENTS.validate_python([
+        {"id": o.get("id", ""), "text": o.get("text"), "metadata": _project_metadata(o, fields)}
+        for o in objects
+    ])
+
+async def iter_search_objects(
+    params: ExecuteParams,
+    pool: Optional[GaiaHTTPPool] = None
+) -> AsyncIterator[ExecuteResult]:
+    """
+    Search via Cohesity Gaia, yielding one ExecuteResult per upstream page.
+    Only one page of objects is held in memory at a time.
+    """
+    fields = GAIA_METADATA_FIELDS if params.metadata_fields is None else params.metadata_fields
+    async for objects, cursor, pruned in iter_gaia_pages(params, pool=pool):
+        with PHASE_SECONDS.time(phase="model_build", operation="objects"):
+            page = ExecuteResult.model_construct(
+                documents=_to_documents(objects, fields), next_cursor=cursor, pruned=pruned
+            )
+        yield page
 
 async def search_objects(
-    params: ExecuteParams
+    params: ExecuteParams,
+    pool: Optional[GaiaHTTPPool] = None
 ) -> ExecuteResult:
     """
     Search via Cohesity Gaia with semantic and facet filters.
     """
-    # Call the generic Gaia objects helper
-    objects = await call_gaia(params) or []
-    # Wrap raw objects into Document models
+    # Wrap raw objects into Document models, page by page
     docs: List[Document] = []
-    for o in objects:
-        docs.append(Document(
-            id=o.get("id", ""),
-            text=o.get("text"),
-            metadata=o
-        ))
-    return ExecuteResult(documents=docs)
-
-async def gaia_qa(params: AskParams):
-    url = f"{GAIA_HOST}/v2/mcm/gaia/ask"
-    logger.debug(f"Gaia QA request URL: {url}")
-    logger.debug(f"Gaia QA headers: {{'accept':'application/json','apiKey': {API_KEY_HEADER}}}")
-    logger.debug(f"Gaia QA payload: {params.dict()}")
+    next_cursor: Optional[str] = None
+    pruned = 0
+    async for page in iter_search_objects(params, pool=pool):
+        docs.extend(page.documents)
+        next_cursor = page.next_cursor
+        pruned += page.pruned
+    if pruned:
+        logger.info("Local file filter pruned %d Gaia objects", pruned)
+    return ExecuteResult.model_construct(documents=docs, next_cursor=next_cursor, pruned=pruned)
+
+# === Content Store ===
+# Every object Gaia returns is kept locally by id (see ContentStore), so
+# get_documents and citation enrichment don't go back to the network
+content_store = ContentStore.from_env()
+
+def _content_key(object_id: str) -> str:
+    # Objects are only visible to the Gaia identity that fetched them
+    return ContentStore.key(_identity(), object_id)
+
+def remember_objects(objects: List[Dict[str, Any]]) -> None:
+    # Queued only: hashing and encoding happen off the request path
+    if content_store is not None:
+        content_store.store_later(_identity(), objects)
+
+async def get_objects(ids: List[str], versions: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Locally stored Gaia objects by id ({id: object} for the ones found).
+    An id with an entry in `versions` only matches that etag/version.
+    """
+    if content_store is None or not ids:
+        return {}
+    versions = versions or {}
+    keys = {_content_key(i): i for i in ids}
+    found = await content_store.get_many({key: versions.get(i) for key, i in keys.items()})
+    return {keys[key]: o for key, o in found.items()}
+
+async def get_documents(
+    ids: List[str],
+    versions: Optional[Dict[str, str]] = None,
+    metadata_fields: Optional[List[str]] = None
+) -> DocumentsResult:
+    """
+    Documents previously returned by a search or cited in an answer, served
+    from the local content store without calling Gaia.
+    """
+    objects = await get_objects(ids, versions)
+    fields = GAIA_METADATA_FIELDS if metadata_fields is None else metadata_fields
+    return DocumentsResult.model_construct(
+        documents=_to_documents([objects[i] for i in ids if i in objects], fields),
+        missing=[i for i in ids if i not in objects]
+    )
+
+def _citation_object_id(c: Dict[str, Any]) -> Optional[str]:
+    object_id = c.get("documentId") or c.get("objectId")
+    return str(object_id) if object_id else None
+
+async def enrich_citations(citations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copies of `citations` with the metadata of the cited document added when
+    it is in the local content store (citations already carrying metadata
+    are left alone). Never calls Gaia.
+    """
+    if not GAIA_ENRICH_CITATIONS or content_store is None or not citations:
+        return citations
+    versions: Dict[str, str] = {}
+    for c in citations:
+        object_id, version = _citation_object_id(c), object_version(c)
+        if object_id and version:
+            # The answer cites that revision; an older local copy doesn't describe it
+            versions[object_id] = version
+    ids = {i for i in map(_citation_object_id, citations) if i}
+    objects = await get_objects(sorted(ids), versions)
+    if not objects:
+        return citations
+    enriched = []
+    for c in citations:
+        o = objects.get(_citation_object_id(c) or "")
+        if o is not None and "metadata" not in c:
+            # Citations (and cached answers) are shared; never mutate them
+            c = {**c, "metadata": _project_metadata(o, GAIA_METADATA_FIELDS)}
+        enriched.append(c)
+    return enriched
+
+# === Federated Search ===
+_RANKED_DOCUMENTS = TypeAdapter(List[RankedDocument])
+
+def _object_score(o: Dict[str, Any]) -> Optional[float]:
+    for key in ("score", "relevanceScore", "similarity"):
+        score = o.get(key)
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            return float(score)
+    return None
+
+class TopK:
+    """
+    The `k` best items offered so far, deduplicated by key: a key offered
+    again keeps whichever rank is higher. A min-heap of the kept ranks makes
+    each offer O(log k); entries superseded by a better offer are skipped
+    when they reach the top.
+    """
+
+    def __init__(self, k: int):
+        self.k = max(1, k)
+        self._heap: List[Tuple[Tuple[Any, ...], int, str]] = []
+        self._best: Dict[str, Tuple[Tuple[Any, ...], int, Any]] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def _live(self, entry: Tuple[Tuple[Any, ...], int, str]) -> bool:
+        best = self._best.get(entry[2])
+        return best is not None and best[1] == -entry[1]
+
+    def _pop_stale(self) -> None:
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def offer(self, key: str, rank: Tuple[Any, ...], item: Any) -> bool:
+        best = self._best.get(key)
+        if best is not None and best[0] >= rank:
+            return False
+        if best is None and len(self._best) >= self.k:
+            self._pop_stale()
+            if rank <= self._heap[0][0]:
+                return False
+        self._seq += 1
+        self._best[key] = (rank, self._seq, item)
+        # Negated sequence: among equal ranks the latest offer is evicted first
+        heapq.heappush(self._heap, (rank, -self._seq, key))
+        while len(self._best) > self.k:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry):
+                del self._best[entry[2]]
+        if len(self._heap) > 4 * self.k:
+            self._heap = [e for e in self._heap if self._live(e)]
+            heapq.heapify(self._heap)
+        return True
+
+    def count_scored(self, min_score: float) -> int:
+        return sum(1 for rank, _, _ in self._best.values() if rank[0] and rank[1] >= min_score)
+
+    def items(self) -> List[Any]:
+        # Best first; equal ranks in the order they were offered
+        return [item for _, _, item in sorted(self._best.values(), key=lambda b: (b[0], -b[1]), reverse=True)]
+
+async def search_federated(
+    params: ExecuteParams,
+    dataset_names: Optional[List[str]] = None,
+    k: int = GAIA_FEDERATED_TOP_K,
+    min_score: Optional[float] = GAIA_FEDERATED_MIN_SCORE,
+    concurrency: int = GAIA_FEDERATED_CONCURRENCY,
+    deadline: float = GAIA_FEDERATED_DEADLINE,
+    pool: Optional[GaiaHTTPPool] = None
+) -> FederatedSearchResult:
+    """
+    Run the search on each dataset (by name, resolved via list_datasets;
+    default all) with at most `concurrency` datasets in flight, and merge
+    the results into one list of the `k` best, ranked by score and
+    deduplicated by document id.
+
+    Returns as soon as `k` results scoring at least `min_score` are in
+    (None: never early), or at `deadline`; datasets still running then are
+    listed as pending. Objects without a score rank after
+    scored ones, interleaved by their position in their dataset's results.
+    """
+    pool = pool or tenants.pool()
+    loop = asyncio.get_running_loop()
+    # Return what is in at the caller's deadline, with the rest pending
+    deadline = budget(deadline)
+    deadline_at = loop.time() + deadline
+    with use_deadline(deadline):
+        available = (await list_datasets(pool)).datasets
+    by_name = {d.name: d for d in available}
+    names = list(dict.fromkeys(dataset_names or [d.name for d in available]))
+    targets = [by_name[n] for n in names if n in by_name]
+    top = TopK(k)
+    enough = asyncio.Event()
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def search_one(ds: Dataset) -> None:
+        # No dataset can contribute more than k results to the merged top k
+        sub = params.model_copy(update={"dataset_ids": [ds.id], "cursor": None, "max_results": k})
+        position = 0
+        async with slots:
+            async for objects, _, _ in iter_gaia_pages(sub, pool=pool):
+                for o in objects:
+                    score = _object_score(o)
+                    rank = (1, score) if score is not None else (0, -position)
+                    top.offer(o.get("id") or f"{ds.name}#{position}", rank, (o, ds.name, score))
+                    position += 1
+                if min_score is not None and top.count_scored(min_score) >= top.k:
+                    enough.set()
+                    return
+
+    tasks = {asyncio.ensure_future(search_one(ds)): ds.name for ds in targets}
+    early = asyncio.ensure_future(enough.wait())
+    pending = set(tasks)
+    searched: Set[str] = set()
+    failed: Set[str] = set()
+    try:
+        while pending and not enough.is_set():
+            wait = deadline_at - loop.time()
+            if wait <= 0:
+                break
+            done, _ = await asyncio.wait(pending | {early}, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for t in done - {early}:
+                pending.remove(t)
+                if t.exception() is not None:
+                    logger.warning("Federated search on %s failed: %s", tasks[t], t.exception())
+                    failed.add(tasks[t])
+                else:
+                    searched.add(tasks[t])
+    finally:
+        early.cancel()
+        for t in pending:
+            t.cancel()
+
+    fields = GAIA_METADATA_FIELDS if params.metadata_fields is None else params.metadata_fields
+    with PHASE_SECONDS.time(phase="model_build", operation="federated"):
+        documents = _RANKED_DOCUMENTS.validate_python([
+            {
+                "id": o.get("id", ""),
+                "text": o.get("text"),
+                "metadata": _project_metadata(o, fields),
+                "score": score,
+                "dataset_name": name
+            }
+            for o, name, score in top.items()
+        ])
+    order = [ds.name for ds in targets]
+    return FederatedSearchResult.model_construct(
+        documents=documents,
+        searched=[n for n in order if n in searched],
+        pending=[n for n in order if n not in searched and n not in failed],
+        failed=[n for n in order if n in failed],
+        unknown=[n for n in names if n not in by_name]
+    )
+
+# === Answer Cache ===
+answer_cache = AnswerCache.from_env()
+
+def _answer_scope(params: AskParams) -> str:
+    # Everything besides the question that determines the answer
+    return digest(
+        *_identity(),
+        sorted(params.datasetNames),
+        params.llmId,
+        digest(params.history)
+    )
+
+async def _cached_answer(params: AskParams, use_cache: bool) -> Optional[AskResult]:
+    if not use_cache:
+        answer_cache.bypass()
+        return None
+    cached = await answer_cache.get(_answer_scope(params), params.queryString)
+    return AskResult.model_construct(**cached) if cached is not None else None
+
+async def _store_answer(params: AskParams, result: AskResult) -> None:
+    if result.responseString:
+        await answer_cache.put(_answer_scope(params), params.queryString, result.model_dump())
+
+async def gaia_qa(params: AskParams, pool: Optional[GaiaHTTPPool] = None, use_cache: bool = True):
+    params = await route_auto(params)
+    result = await _cached_answer(params, use_cache)
+    if result is None:
+        pool = pool or tenants.pool()
+        # Identical in-flight questions share one upstream call
+        result = await qa_flight.do(_request_key("ask", params), lambda: _ask_upstream(params, pool))
+    citations = await enrich_citations(result.citations)
+    if citations is not result.citations:
+        result = AskResult.model_construct(responseString=result.responseString, citations=citations)
+    return result
+
+async def _ask_upstream(params: AskParams, pool: GaiaHTTPPool) -> AskResult:
+    creds = tenants.current()
+    url = f"{creds.host}/v2/mcm/gaia/ask"
     headers = {
         "accept": "application/json",
         "content-type": "application/json",
-        "apiKey": API_KEY_HEADER
+        "apiKey": creds.api_key
     }
-    payload = params.dict()
-    # Use a longer timeout for potentially long-running QA queries
-    async with httpx.AsyncClient(timeout=90.0) as client:
-        resp = await client.post(url, headers=headers, json=payload, timeout=60.0)
-    logger.debug(f"Gaia QA response status: {resp.status_code}")
-    logger.debug(f"Gaia QA response body: {resp.text}")
+    payload = params.model_dump()
+    # Asks run longer than the other Gaia calls
+    resp = await pool.post(url, headers=headers, json=payload, timeout=GAIA_ASK_TIMEOUT)
     resp.raise_for_status()
-    data = resp.json()
+    with PHASE_SECONDS.time(phase="json_decode", operation="ask"):
+        data = loads(resp.content)
     # Extract the free-form answer string
     resp_str = data.get("responseString", "")
+    with PHASE_SECONDS.time(phase="model_build", operation="ask"):
+        result = AskResult.model_construct(responseString=resp_str, citations=_flatten_citations(data))
+    await _store_answer(params, result)
+    return result
+
+# === Batch QA ===
+async def iter_gaia_qa_batch(
+    params: AskParams,
+    questions: List[str],
+    pool: Optional[GaiaHTTPPool] = None,
+    use_cache: bool = True,
+    concurrency: int = GAIA_BATCH_CONCURRENCY
+) -> AsyncIterator[AskBatchItem]:
+    """
+    Ask every question against the datasets/LLM/history in `params`, at most
+    `concurrency` (capped at GAIA_BATCH_CONCURRENCY) at a time, yielding one AskBatchItem per question as soon
+    as its answer (or error) is in. Repeated questions are asked once and
+    answered for every index they appear at.
+    """
+    if len(questions) > GAIA_BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {GAIA_BATCH_MAX_QUESTIONS} questions per batch, got {len(questions)}")
+    pool = pool or tenants.pool()
+    indices: Dict[str, List[int]] = {}
+    for i, q in enumerate(questions):
+        indices.setdefault(q.strip(), []).append(i)
+    slots = asyncio.Semaphore(min(max(1, concurrency), GAIA_BATCH_CONCURRENCY))
+
+    async def ask_one(question: str) -> Tuple[str, Any]:
+        async with slots:
+            try:
+                return question, await gaia_qa(params.model_copy(update={"queryString": question}), pool, use_cache)
+            except Exception as e:
+                return question, e
+
+    tasks = [asyncio.ensure_future(ask_one(q)) for q in indices]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            question, outcome = await next_done
+            for i in indices[question]:
+                if isinstance(outcome, Exception):
+                    yield AskBatchItem(index=i, question=questions[i], status="error", error=str(outcome) or type(outcome).__name__)
+                else:
+                    yield AskBatchItem(
+                        index=i,
+                        question=questions[i],
+                        responseString=outcome.responseString,
+                        citations=outcome.citations
+                    )
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def gaia_qa_batch(
+    params: AskParams,
+    questions: List[str],
+    pool: Optional[GaiaHTTPPool] = None,
+    use_cache: bool = True,
+    concurrency: int = GAIA_BATCH_CONCURRENCY
+) -> AskBatchResult:
+    items = [item async for item in iter_gaia_qa_batch(params, questions, pool, use_cache, concurrency)]
+    items.sort(key=lambda item: item.index)
+    failed = sum(1 for item in items if item.status != "ok")
+    return AskBatchResult(results=items, succeeded=len(items) - failed, failed=failed)
+
+def _flatten_citations(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     # Flatten all citations from each document
-    citations_list: List[Dict[str, Any]] = []
+    citations_list: List[Dict[str, Any]] = list(data.get("citations") or [])
     docs = data.get("documents") or []
     for doc in docs:
         citations = doc.get("citations") or []
         citations_list.extend(citations)
-    return AskResult(responseString=resp_str, citations=citations_list)
+    return citations_list
+
+async def _iter_sse_data(resp: httpx.Response) -> AsyncIterator[str]:
+    """
+    Yield the data payload of each server-sent event in a streaming response.
+    """
+    data_lines: List[str] = []
+    async for line in resp.aiter_lines():
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+        elif line.startswith("data:"):
+            # Only the one space after the colon is framing; the rest is data
+            value = line[5:]
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+    if data_lines:
+        yield "\n".join(data_lines)
+
+@contextlib.asynccontextmanager
+async def _stream_ask(
+    pool: GaiaHTTPPool,
+    url: str,
+    headers: Dict[str, str],
+    params: AskParams
+) -> AsyncIterator[httpx.Response]:
+    try:
+        async with pool.stream("POST", url, headers=headers, json=params.model_dump(), timeout=GAIA_ASK_TIMEOUT) as resp:
+            yield resp
+    except httpx.TimeoutException as e:
+        # Reads are cut short at the caller's deadline
+        left = remaining()
+        if left is not None and left <= 0.01:
+            raise DeadlineExceeded() from e
+        raise
+
+async def gaia_qa_stream(
+    params: AskParams,
+    pool: Optional[GaiaHTTPPool] = None,
+    use_cache: bool = True
+) -> AsyncIterator[AskChunk]:
+    """
+    Ask Gaia and yield the answer incrementally.
+
+    If Gaia answers with text/event-stream, each event's partial responseString
+    is yielded as a "token" chunk as soon as it arrives and citations as
+    "citations" chunks. A plain JSON answer is yielded as a single token once
+    the body has been read. The stream always ends with a "done" chunk
+    carrying the full answer text. Cached answers are replayed the same way.
+    """
+    params = await route_auto(params)
+    cached = await _cached_answer(params, use_cache)
+    if cached is not None:
+        yield AskChunk(type="token", text=cached.responseString)
+        if cached.citations:
+            yield AskChunk(type="citations", citations=await enrich_citations(cached.citations))
+        yield AskChunk(type="done", text=cached.responseString)
+        return
+    pool = pool or tenants.pool()
+    creds = tenants.current()
+    url = f"{creds.host}/v2/mcm/gaia/ask"
+    headers = {
+        "accept": "text/event-stream, application/json",
+        "content-type": "application/json",
+        "apiKey": creds.api_key
+    }
+    answer = ""
+    all_citations: List[Dict[str, Any]] = []
+    async with _stream_ask(pool, url, headers, params) as resp:
+        if resp.is_error:
+            await resp.aread()
+            resp.raise_for_status()
+        if not resp.headers.get("content-type", "").startswith("text/event-stream"):
+            body = await resp.aread()
+            with PHASE_SECONDS.time(phase="json_decode", operation="ask_stream"):
+                data = loads(body)
+            answer = data.get("responseString", "")
+            if answer:
+                yield AskChunk(type="token", text=answer)
+            citations = _flatten_citations(data)
+            if citations:
+                all_citations.extend(citations)
+                yield AskChunk(type="citations", citations=await enrich_citations(citations))
+        else:
+            async for raw in _iter_sse_data(resp):
+                if raw == "[DONE]":
+                    break
+                check_deadline()
+                try:
+                    event = loads(raw)
+                except ValueError:
+                    event = {"responseString": raw}
+                if not isinstance(event, dict):
+                    continue
+                # Each event carries the next slice of the answer, not a snapshot
+                text = event.get("responseString") or ""
+                if text:
+                    answer += text
+                    yield AskChunk(type="token", text=text)
+                citations = _flatten_citations(event)
+                if citations:
+                    all_citations.extend(citations)
+                    yield AskChunk(type="citations", citations=await enrich_citations(citations))
+    await _store_answer(params, AskResult.model_construct(responseString=answer, citations=all_citations))
+    yield AskChunk(type="done", text=answer)
+
+
+# === Sessions ===
+sessions = SessionStore()
+
+def _open_session(params: AskParams, session_id: str) -> Tuple[Session, AskParams]:
+    session = sessions.open(session_id, digest(*_identity()))
+    # The server-side window comes first; history sent by the client (if any) follows it
+    history = sessions.window(session) + list(params.history)
+    return session, params.model_copy(update={"history": history})
+
+async def gaia_qa_session(
+    params: AskParams,
+    session_id: str,
+    pool: Optional[GaiaHTTPPool] = None,
+    use_cache: bool = True
+) -> AskSessionResult:
+    """
+    gaia_qa with server-side history: the client sends only the new question,
+    and the session's compacted history window is sent to Gaia with it.
+    An unknown or expired session_id (or "") starts a new session.
+    """
+    session, params = _open_session(params, session_id)
+    result = await gaia_qa(params, pool, use_cache)
+    if result.responseString:
+        session = sessions.record(session, params.queryString, result.responseString)
+    return AskSessionResult.model_construct(
+        responseString=result.responseString,
+        citations=result.citations,
+        session_id=session.id,
+        turns=len(session)
+    )
+
+async def gaia_qa_session_stream(
+    params: AskParams,
+    session_id: str,
+    pool: Optional[GaiaHTTPPool] = None,
+    use_cache: bool = True
+) -> AsyncIterator[AskChunk]:
+    """
+    gaia_qa_stream with server-side history; the "done" chunk carries the session_id and turns.
+    """
+    session, params = _open_session(params, session_id)
+    async for chunk in gaia_qa_stream(params, pool, use_cache):
+        if chunk.type == "done":
+            if chunk.text:
+                session = sessions.record(session, params.queryString, chunk.text)
+            chunk = chunk.model_copy(update={"session_id": session.id, "turns": len(session)})
+        yield chunk
+
+
+# === Dataset Catalog ===
+# datasetNames value that lets the catalog pick the datasets for an ask
+AUTO_DATASETS = "auto"
+
+async def _catalog_datasets() -> List[Dict[str, Any]]:
+    result = await discover_tools()
+    tools = [t for t in result.tools if t.dataset_name]
+    pending = [i for i, t in enumerate(tools) if t.status == "pending"]
+    if pending:
+        # Their discovery calls keep running after the deadline (see _iter_discovery);
+        # join those flights rather than index the datasets by name alone
+        found = await asyncio.gather(
+            *(get_discovery(tools[i].dataset_id) for i in pending), return_exceptions=True
+        )
+        for i, r in zip(pending, found):
+            tools[i] = _discover_tool({"id": tools[i].dataset_id, "name": tools[i].dataset_name}, r, "")
+    return [t.model_dump() for t in tools]
+
+dataset_catalog = DatasetCatalog(_catalog_datasets)
+
+def start_dataset_catalog() -> None:
+    # Build the server identity's catalog right away; others are built on first use
+    dataset_catalog.start(warm=[(_identity(), None)])
+
+async def stop_dataset_catalog() -> None:
+    await dataset_catalog.stop()
+
+async def select_datasets(question: str, k: int = GAIA_CATALOG_AUTO_K) -> SelectDatasetsResult:
+    """
+    The k datasets whose names and descriptions best match `question`, from
+    the local catalog index (no discovery calls once the catalog is built).
+    """
+    index = await dataset_catalog.index(_identity(), tenants.current())
+    matches = [
+        DatasetMatch(
+            dataset_id=d.get("dataset_id") or "",
+            dataset_name=d["dataset_name"],
+            description=d.get("description"),
+            score=score
+        )
+        for d, score in index.search(question, k)
+    ]
+    return SelectDatasetsResult(
+        datasets=matches,
+        catalog_size=len(index),
+        catalog_age=round(time.monotonic() - index.built_at, 1)
+    )
+
+async def route_auto(params: AskParams) -> AskParams:
+    """
+    Resolve datasetNames == ["auto"] to the GAIA_CATALOG_AUTO_K datasets that
+    best match the question; other params are returned unchanged.
+    """
+    if [n.lower() for n in params.datasetNames] != [AUTO_DATASETS]:
+        return params
+    selected = await select_datasets(params.queryString, GAIA_CATALOG_AUTO_K)
+    if not selected.datasets:
+        raise ValueError("No dataset matches the question; pass dataset_names explicitly")
+    names = [d.dataset_name for d in selected.datasets]
+    logger.info("Routing ask to datasets %s", names)
+    return params.model_copy(update={"datasetNames": names})
 
 
 # === Discover Tools Endpoint ===
-async def discover_tools():
+async def discover_tools(
+    pool: Optional[GaiaHTTPPool] = None,
+    refresh: bool = False,
+    concurrency: int = GAIA_DISCOVERY_CONCURRENCY,
+    request_timeout: float = GAIA_DISCOVERY_TIMEOUT,
+    deadline: float = GAIA_DISCOVERY_DEADLINE
+):
     """
     Discover available datasets and their descriptions via Gaia discovery API.
     """
-    # Fetch list of datasets
-    ds_url = f"{GAIA_HOST}/v2/mcm/gaia/datasets"
-    headers = {"accept": "application/json", "content-type": "application/json", "apiKey": API_KEY_HEADER}
-    async with httpx.AsyncClient() as client:
-        resp_ds = await client.get(ds_url, headers=headers)
-    resp_ds.raise_for_status()
-    ds_list = resp_ds.json().get("datasets", [])
-
-    # For each dataset, fetch its discovery description
-    tasks = []
-    async with httpx.AsyncClient() as client:
-        for d in ds_list:
-            ds_id = d.get("id")
-            disc_url = f"{GAIA_HOST}/v2/mcm/gaia/dataset/{ds_id}/discovery?level=1&numLevels=2"
-            tasks.append(client.get(disc_url, headers=headers))
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-
-    tools: List[DiscoverTool] = []
-    for d, r in zip(ds_list, responses):
-        # default to None if no description found
-        desc: Optional[str] = None
-        if not isinstance(r, Exception):
-            jr = r.json()
-            results = jr.get("results", [])
-            desc = results[0].get("description", "") if results else ""
-        tools.append(DiscoverTool(
-            dataset_id=d.get("id", ""),
-            dataset_name=d.get("name", ""),
-            description=desc
-        ))
-
-    return ListDiscoverToolsResult(tools=tools)
+    return await _collect_discover_tools(
+        missing_description="",
+        pool=pool,
+        refresh=refresh,
+        concurrency=concurrency,
+        request_timeout=request_timeout,
+        deadline=deadline
+    )
 
 # # === FastMCP Setup (after route definitions) ===
 # mcp = FastMCP.from_fastapi(
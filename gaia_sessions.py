@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# === Configuration ===
+GAIA_SESSION_TTL = float(os.getenv("GAIA_SESSION_TTL", "1800"))
+GAIA_SESSION_MAXSIZE = int(os.getenv("GAIA_SESSION_MAXSIZE", "10000"))
+# Turns kept per session; older turns are folded into the running summary
+GAIA_SESSION_MAX_TURNS = int(os.getenv("GAIA_SESSION_MAX_TURNS", "50"))
+# History window sent to Gaia: at most this many recent turns / characters
+GAIA_SESSION_WINDOW_TURNS = int(os.getenv("GAIA_SESSION_WINDOW_TURNS", "6"))
+GAIA_SESSION_WINDOW_CHARS = int(os.getenv("GAIA_SESSION_WINDOW_CHARS", "8000"))
+GAIA_SESSION_SUMMARY_CHARS = int(os.getenv("GAIA_SESSION_SUMMARY_CHARS", "1000"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _first_sentence(text: str, limit: int = 200) -> str:
+    text = " ".join(text.split())
+    head = _SENTENCE_END.split(text, 1)[0]
+    return head if len(head) <= limit else head[: limit - 3] + "..."
+
+
+def _summary_line(question: str, answer: str) -> str:
+    return f"Q: {_first_sentence(question)} A: {_first_sentence(answer)}"
+
+
+def _keep_tail(lines: List[str], limit: int) -> str:
+    """
+    Join lines, dropping the oldest ones until the text fits in `limit`.
+    """
+    kept: List[str] = []
+    size = 0
+    for line in reversed(lines):
+        if kept and size + len(line) + 1 > limit:
+            break
+        kept.append(line[-limit:])
+        size += len(line) + 1
+    return "\n".join(reversed(kept))
+
+
+def _turn_entries(question: str, answer: str) -> List[Dict[str, str]]:
+    # Gaia history entries, oldest first
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+
+class Session:
+    __slots__ = ("id", "scope", "turns", "summary", "summarized_turns", "touched_at")
+
+    def __init__(self, session_id: str, scope: str):
+        self.id = session_id
+        self.scope = scope
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self.summary = ""
+        self.summarized_turns = 0
+        self.touched_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return self.summarized_turns + len(self.turns)
+
+
+# === Session Store ===
+class SessionStore:
+    """
+    In-process conversation history for ask, keyed by session id.
+
+    Sessions expire after `ttl` seconds without a turn and the least recently
+    used ones are evicted beyond `maxsize`. Each session keeps its last
+    `max_turns` turns verbatim; older turns are compacted into a short
+    extractive summary (question + first sentence of the answer).
+
+    window() is what gets sent to Gaia: the summary (if any) followed by the
+    most recent turns that fit in `window_turns` and `window_chars`.
+    """
+
+    def __init__(
+        self,
+        ttl: float = GAIA_SESSION_TTL,
+        maxsize: int = GAIA_SESSION_MAXSIZE,
+        max_turns: int = GAIA_SESSION_MAX_TURNS,
+        window_turns: int = GAIA_SESSION_WINDOW_TURNS,
+        window_chars: int = GAIA_SESSION_WINDOW_CHARS,
+        summary_chars: int = GAIA_SESSION_SUMMARY_CHARS,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_turns = max_turns
+        self.window_turns = window_turns
+        self.window_chars = window_chars
+        self.summary_chars = summary_chars
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.touched_at >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def open(self, session_id: Optional[str], scope: str) -> Session:
+        """
+        Return the live session `session_id`, or a new one (with that id if
+        given, else a random one). Sessions belong to the credentials
+        (`scope`) that created them; another scope never sees their history.
+        A new session is only stored by its first record(), so failed asks
+        don't take up slots.
+        """
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None and session.scope == scope:
+            self._sessions.move_to_end(session.id)
+            session.touched_at = time.monotonic()
+            return session
+        if session is not None or not session_id:
+            session_id = uuid.uuid4().hex
+        return Session(session_id, scope)
+
+    def _store(self, session: Session) -> Session:
+        stored = self._sessions.get(session.id)
+        if stored is not None:
+            if stored.scope == session.scope:
+                # Another ask started the same new session first
+                return stored
+            session.id = uuid.uuid4().hex
+        self._sessions[session.id] = session
+        self.created += 1
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return session
+
+    def record(self, session: Session, question: str, answer: str) -> Session:
+        """
+        Add a turn to `session`, storing it if new. Returns the stored session,
+        whose id callers should hand back to the client.
+        """
+        if self._sessions.get(session.id) is not session:
+            session = self._store(session)
+        session.turns.append((question, answer))
+        session.touched_at = time.monotonic()
+        while len(session.turns) > self.max_turns:
+            self._summarize(session, *session.turns.popleft())
+        return session
+
+    def _summarize(self, session: Session, question: str, answer: str) -> None:
+        lines = session.summary.split("\n") if session.summary else []
+        session.summary = _keep_tail(lines + [_summary_line(question, answer)], self.summary_chars)
+        session.summarized_turns += 1
+
+    def window(self, session: Session) -> List[Any]:
+        budget = self.window_chars
+        recent: List[Tuple[str, str]] = []
+        for question, answer in reversed(session.turns):
+            cost = len(question) + len(answer)
+            if len(recent) >= self.window_turns or (recent and cost > budget):
+                break
+            recent.append((question, answer))
+            budget -= cost
+        history: List[Any] = []
+        # Stored turns that don't fit in the window are still represented in the summary
+        lines = session.summary.split("\n") if session.summary else []
+        lines += [_summary_line(q, a) for q, a in list(session.turns)[: len(session.turns) - len(recent)]]
+        summary = _keep_tail(lines, self.summary_chars)
+        if summary:
+            history.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+        for question, answer in reversed(recent):
+            history.extend(_turn_entries(question, answer))
+        return history
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._sessions),
+            "maxsize": self.maxsize,
+            "created": self.created,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,333 @@
+import os
+import time
+import asyncio
+import logging
+import contextlib
+import contextvars
+import json
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Collection, Deque, Dict, Iterator, Mapping, NamedTuple, Optional
+
+from gaia_cache import credential_digest
+from gaia_http import GaiaHTTPPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+# Request header carrying the caller's Gaia API key (MCP client headers are forwarded as-is)
+GAIA_TENANT_KEY_HEADER = os.getenv("GAIA_TENANT_KEY_HEADER", "x-api-key").lower()
+# Request header selecting the Gaia host; honored only for hosts in GAIA_TENANT_ALLOWED_HOSTS
+GAIA_TENANT_HOST_HEADER = os.getenv("GAIA_TENANT_HOST_HEADER", "x-gaia-host").lower()
+GAIA_TENANT_ALLOWED_HOSTS = frozenset(
+    h.strip().rstrip("/") for h in os.getenv("GAIA_TENANT_ALLOWED_HOSTS", "").split(",") if h.strip()
+)
+# Reject requests without a key header instead of falling back to API_KEY_HEADER
+GAIA_TENANT_REQUIRE_KEY = os.getenv("GAIA_TENANT_REQUIRE_KEY", "false").lower() in ("1", "true", "yes")
+# Token bucket per tenant: sustained tool calls per second and burst size (0 disables)
+GAIA_TENANT_RATE = float(os.getenv("GAIA_TENANT_RATE", "10"))
+GAIA_TENANT_BURST = int(os.getenv("GAIA_TENANT_BURST", "20"))
+# Upstream concurrency: across all tenants, and per tenant
+GAIA_UPSTREAM_CONCURRENCY = int(os.getenv("GAIA_UPSTREAM_CONCURRENCY", "64"))
+GAIA_TENANT_CONCURRENCY = int(os.getenv("GAIA_TENANT_CONCURRENCY", "16"))
+# Tenants (and their connection pools) kept alive; least recently used are closed
+GAIA_MAX_TENANTS = int(os.getenv("GAIA_MAX_TENANTS", "100"))
+
+_EVICTED_POOL_GRACE = 60.0
+
+
+class Credentials(NamedTuple):
+    host: str
+    api_key: str
+
+
+class TenantError(Exception):
+    """
+    Raised when a request carries no usable Gaia credentials.
+    """
+
+
+class RateLimitError(Exception):
+    """
+    Raised when a tenant has used up its token bucket.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded; retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+_credentials: "contextvars.ContextVar[Optional[Credentials]]" = contextvars.ContextVar(
+    "gaia_credentials", default=None
+)
+
+
+@contextlib.contextmanager
+def use_credentials(credentials: Optional[Credentials]) -> Iterator[None]:
+    """
+    Run the enclosed Gaia calls with `credentials` (None: the server defaults).
+    Tasks started inside (coalesced fetches, background refreshes) inherit them.
+    """
+    token = _credentials.set(credentials)
+    try:
+        yield
+    finally:
+        _credentials.reset(token)
+
+
+# === Rate Limiting ===
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.rejected = 0
+
+    def try_acquire(self) -> float:
+        """
+        Take a token. Returns 0 on success, else the seconds until one is available.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        self.rejected += 1
+        return (1 - self.tokens) / self.rate
+
+
+# === Fair Queuing ===
+class FairScheduler:
+    """
+    Shares `capacity` upstream request slots between tenants.
+
+    A tenant holds at most `per_tenant` slots. When slots are contended,
+    waiting tenants are served round-robin (FIFO within a tenant), so one
+    tenant with a deep backlog can't starve the others.
+    """
+
+    def __init__(self, capacity: int = GAIA_UPSTREAM_CONCURRENCY, per_tenant: int = GAIA_TENANT_CONCURRENCY):
+        self.capacity = max(1, capacity)
+        self.per_tenant = max(1, per_tenant)
+        self._in_use = 0
+        self._active: Dict[str, int] = {}
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def _eligible(self, tenant: str) -> bool:
+        return self._in_use < self.capacity and self._active.get(tenant, 0) < self.per_tenant
+
+    def _grant(self, tenant: str) -> None:
+        self._in_use += 1
+        self._active[tenant] = self._active.get(tenant, 0) + 1
+
+    def _release(self, tenant: str) -> None:
+        self._in_use -= 1
+        self._active[tenant] -= 1
+        if not self._active[tenant]:
+            del self._active[tenant]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._in_use < self.capacity:
+            tenant = next((t for t in self._queues if self._eligible(t)), None)
+            if tenant is None:
+                return
+            queue = self._queues.pop(tenant)
+            waiter = queue.popleft()
+            if queue:
+                # Back of the rotation
+                self._queues[tenant] = queue
+            if not waiter.done():
+                self._grant(tenant)
+                waiter.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant: str) -> AsyncIterator[None]:
+        if tenant not in self._queues and self._eligible(tenant):
+            self._grant(tenant)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(tenant, deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as we were cancelled; hand the slot on
+                    self._release(tenant)
+                else:
+                    queue = self._queues.get(tenant)
+                    if queue is not None and waiter in queue:
+                        queue.remove(waiter)
+                        if not queue:
+                            del self._queues[tenant]
+                raise
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "per_tenant": self.per_tenant,
+            "in_use": self._in_use,
+            "waiting": sum(len(q) for q in self._queues.values()),
+        }
+
+
+# === Tenants ===
+class Tenant:
+    __slots__ = ("id", "credentials", "pool", "bucket")
+
+    def __init__(self, credentials: Credentials, pool: GaiaHTTPPool, bucket: TokenBucket):
+        # Never the key itself: ids end up in logs and metrics
+        self.id = credential_digest(f"{credentials.host}\n{credentials.api_key}")
+        self.credentials = credentials
+        self.pool = pool
+        self.bucket = bucket
+
+
+class TenantRegistry:
+    """
+    Per-request Gaia credentials and the per-tenant state that goes with them.
+
+    Each tenant (Gaia host + API key) gets its own connection pool and token
+    bucket; all pools share one FairScheduler. The server's own credentials
+    (GAIA_HOST / API_KEY_HEADER) are the default tenant and use the
+    process-wide pool from gaia_http. At most `max_tenants` other tenants are
+    kept; the least recently used one's pool is closed on eviction.
+    """
+
+    def __init__(
+        self,
+        default: Credentials,
+        max_tenants: int = GAIA_MAX_TENANTS,
+        rate: float = GAIA_TENANT_RATE,
+        burst: int = GAIA_TENANT_BURST,
+        scheduler: Optional[FairScheduler] = None,
+        pool_factory: Callable[[], GaiaHTTPPool] = GaiaHTTPPool,
+    ):
+        self.default = default
+        self.max_tenants = max_tenants
+        self.rate = rate
+        self.burst = burst
+        self.scheduler = scheduler or FairScheduler()
+        self.pool_factory = pool_factory
+        self._tenants: "OrderedDict[Credentials, Tenant]" = OrderedDict()
+        self._default_bucket = TokenBucket(rate, burst)
+        self.evictions = 0
+
+    def current(self) -> Credentials:
+        return _credentials.get() or self.default
+
+    def from_headers(self, headers: Mapping[str, str]) -> Optional[Credentials]:
+        """
+        Credentials named by request headers (lower-cased names), or None for
+        the server defaults. Raises TenantError if a key is required but absent.
+        """
+        api_key = headers.get(GAIA_TENANT_KEY_HEADER)
+        host = (headers.get(GAIA_TENANT_HOST_HEADER) or "").rstrip("/")
+        if host and host not in GAIA_TENANT_ALLOWED_HOSTS:
+            raise TenantError(f"Gaia host {host!r} is not allowed")
+        if not api_key:
+            if GAIA_TENANT_REQUIRE_KEY:
+                raise TenantError(f"Missing {GAIA_TENANT_KEY_HEADER} header")
+            return None
+        return Credentials(host or self.default.host, api_key)
+
+    def _tenant(self, credentials: Credentials) -> Tenant:
+        if credentials == self.default:
+            pool = get_pool()
+            tenant = Tenant(credentials, pool, self._default_bucket)
+        else:
+            tenant = self._tenants.get(credentials)
+            if tenant is None:
+                tenant = self._tenants[credentials] = Tenant(
+                    credentials, self.pool_factory(), TokenBucket(self.rate, self.burst)
+                )
+                self._evict()
+            else:
+                self._tenants.move_to_end(credentials)
+        tenant.pool.scheduler = self.scheduler
+        tenant.pool.tenant = tenant.id
+        return tenant
+
+    def _evict(self) -> None:
+        while len(self._tenants) > self.max_tenants:
+            _, tenant = self._tenants.popitem(last=False)
+            self.evictions += 1
+            # Requests may still be using the pool; close it after a grace period
+            asyncio.get_running_loop().call_later(
+                _EVICTED_POOL_GRACE, lambda pool=tenant.pool: asyncio.ensure_future(pool.close())
+            )
+
+    def tenant(self) -> Tenant:
+        return self._tenant(self.current())
+
+    def pool(self) -> GaiaHTTPPool:
+        return self.tenant().pool
+
+    def check_rate(self) -> None:
+        """
+        Charge one call to the current tenant; raises RateLimitError when over budget.
+        """
+        retry_after = self.tenant().bucket.try_acquire()
+        if retry_after:
+            raise RateLimitError(retry_after)
+
+    async def close(self) -> None:
+        for tenant in self._tenants.values():
+            await tenant.pool.close()
+        self._tenants.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants": len(self._tenants) + 1,
+            "max_tenants": self.max_tenants,
+            "evictions": self.evictions,
+            "rate_limited": self._default_bucket.rejected + sum(t.bucket.rejected for t in self._tenants.values()),
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+# === ASGI Middleware ===
+class TenantMiddleware:
+    """
+    Resolves each HTTP request's Gaia credentials from its headers, charges
+    the tenant's token bucket, and runs the request with those credentials.
+    Paths in `exempt` (health checks, metrics) skip rate limiting.
+    """
+
+    def __init__(self, app: Any, registry: TenantRegistry, exempt: Collection[str] = ()):
+        self.app = app
+        self.registry = registry
+        self.exempt = frozenset(exempt)
+
+    async def _reject(self, send: Any, status: int, detail: str, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        raw_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        raw_headers += [(k.encode(), v.encode()) for k, v in (headers or {}).items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        try:
+            credentials = self.registry.from_headers(headers)
+        except TenantError as e:
+            await self._reject(send, 401, str(e))
+            return
+        with use_credentials(credentials):
+            if scope.get("path") not in self.exempt:
+                try:
+                    self.registry.check_rate()
+                except RateLimitError as e:
+                    await self._reject(send, 429, str(e), {"retry-after": str(max(1, round(e.retry_after)))})
+                    return
+            await self.app(scope, receive, send)
@@ -0,0 +1,86 @@
+import os
+import sys
+import socket
+import subprocess
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The gaia_* modules read their settings on import; never reach a real Gaia host
+os.environ.setdefault("GAIA_HOST", "http://fake-gaia.local")
+os.environ.setdefault("GAIA_ENV_FILE", os.devnull)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Nothing listening on port {port}")
+
+
+@pytest.fixture
+def spawn() -> Iterator:
+    """
+    Start a process from the repo root (python <args>); killed after the test.
+    """
+    procs: List[subprocess.Popen] = []
+
+    def start(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            [sys.executable, *args],
+            cwd=ROOT,
+            env={**os.environ, **(env or {})},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        procs.append(proc)
+        return proc
+
+    yield start
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+@pytest.fixture
+async def gaia(anyio_backend: str) -> AsyncIterator:
+    """
+    Serve fake_gaia in-process as the default tenant's Gaia host:
+    `app = await gaia(pool={...GaiaHTTPPool options}, **create_app options)`.
+    """
+    import gaia_http
+    import gaia_service
+    from fake_gaia import create_app
+
+    async def start(pool: Optional[Dict[str, Any]] = None, **options: Any):
+        app = create_app(**options)
+        # Nothing cached from another test's fake
+        gaia_service.datasets_cache.invalidate()
+        gaia_service.discovery_cache.invalidate()
+        transport = httpx.ASGITransport(app=app)
+        await gaia_http.init_pool(gaia_http.GaiaHTTPPool(transport=transport, **(pool or {})))
+        return app
+
+    yield start
+    await gaia_http.close_pool()
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+import gaia_service
+from gaia_cache import AnswerCache, MemoryAnswerBackend, SQLiteAnswerBackend, normalize_query
+from gaia_service import AskParams
+from gaia_tenants import Credentials, use_credentials
+
+ASK = "POST /v2/mcm/gaia/ask"
+VALUE = {"responseString": "cached", "citations": []}
+
+
+def _params(question: str, **update) -> AskParams:
+    params = AskParams(llmName="llm", datasetNames=["dataset_0"], llmId="llm-1", queryString=question)
+    return params.model_copy(update=update)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend_factory(request, tmp_path):
+    def make(maxsize: int = 100):
+        if request.param == "memory":
+            return MemoryAnswerBackend(maxsize=maxsize)
+        return SQLiteAnswerBackend(str(tmp_path / "answers.sqlite3"), maxsize=maxsize)
+    return make
+
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    # The answer cache is off by default; give the service a memory one
+    cache = AnswerCache(MemoryAnswerBackend(), similarity=0.7)
+    monkeypatch.setattr(gaia_service, "answer_cache", cache)
+    return cache
+
+
+def test_normalization_ignores_case_punctuation_and_whitespace():
+    assert normalize_query("  What is   the *Gaia* API?\n") == "what is the gaia api"
+    assert AnswerCache.key("s", "What is X?") == AnswerCache.key("s", "what is x")
+    assert AnswerCache.key("s", "what is x") != AnswerCache.key("other", "what is x")
+
+
+@pytest.mark.anyio
+async def test_rephrased_question_is_an_exact_hit(gaia, answer_cache):
+    app = await gaia()
+    first = await gaia_service.gaia_qa(_params("What is X?"))
+    again = await gaia_service.gaia_qa(_params("  what IS x "))
+    assert again.responseString == first.responseString
+    assert app.state.requests[ASK] == 1
+    assert answer_cache.stats()["exact_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_similar_question_hits_only_above_the_threshold_and_in_its_scope(gaia, answer_cache):
+    app = await gaia()
+    await gaia_service.gaia_qa(_params("how many files are in the quarterly archive"))
+    await gaia_service.gaia_qa(_params("how many files are in the quarterly archives"))
+    assert answer_cache.stats()["similar_hits"] == 1
+    assert app.state.requests[ASK] == 1
+
+    await gaia_service.gaia_qa(_params("who signed the vendor contract"))
+    # Same near-duplicate, other datasets: a different scope
+    await gaia_service.gaia_qa(_params("how many files are in the quarterly archives", datasetNames=["dataset_1"]))
+    assert answer_cache.stats()["similar_hits"] == 1
+    assert app.state.requests[ASK] == 3
+
+
+@pytest.mark.anyio
+async def test_use_cache_false_bypasses_the_cache(gaia, answer_cache):
+    app = await gaia()
+    await gaia_service.gaia_qa(_params("bypass me"))
+    await gaia_service.gaia_qa(_params("bypass me"), use_cache=False)
+    assert app.state.requests[ASK] == 2
+    assert answer_cache.stats()["bypassed"] == 1
+    assert answer_cache.stats()["exact_hits"] == 0
+
+
+def test_scope_separates_identity_datasets_llm_and_history():
+    base = gaia_service._answer_scope(_params("q"))
+    host = gaia_service.tenants.default.host
+    with use_credentials(Credentials("http://other-gaia.local", gaia_service.tenants.default.api_key)):
+        other_host = gaia_service._answer_scope(_params("q"))
+    with use_credentials(Credentials(host, "another-key")):
+        other_key = gaia_service._answer_scope(_params("q"))
+    scopes = {
+        base,
+        other_host,
+        other_key,
+        gaia_service._answer_scope(_params("q", datasetNames=["dataset_1"])),
+        gaia_service._answer_scope(_params("q", llmId="llm-2")),
+        gaia_service._answer_scope(_params("q", history=[{"role": "user", "content": "earlier"}])),
+    }
+    assert len(scopes) == 6
+    # Dataset order does not matter
+    assert gaia_service._answer_scope(_params("q", datasetNames=["b", "a"])) == \
+        gaia_service._answer_scope(_params("q", datasetNames=["a", "b"]))
+
+
+@pytest.mark.anyio
+async def test_entries_expire_after_the_ttl(backend_factory, anyio_backend):
+    cache = AnswerCache(backend_factory(), ttl=0.05)
+    await cache.put("scope", "question", VALUE)
+    assert await cache.get("scope", "question") == VALUE
+    time.sleep(0.06)
+    assert await cache.get("scope", "question") is None
+
+
+@pytest.mark.anyio
+async def test_least_recently_used_entry_is_evicted(backend_factory, anyio_backend):
+    cache = AnswerCache(backend_factory(maxsize=2))
+    for question in ("a", "b"):
+        await cache.put("scope", question, VALUE)
+        time.sleep(0.002)
+    # Reading a makes b the least recently used
+    assert await cache.get("scope", "a") == VALUE
+    time.sleep(0.002)
+    await cache.put("scope", "c", VALUE)
+    assert await cache.get("scope", "b") is None
+    assert await cache.get("scope", "a") == VALUE
+    assert await cache.get("scope", "c") == VALUE
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.anyio
+async def test_sqlite_answers_survive_a_reopen(tmp_path, anyio_backend):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(SQLiteAnswerBackend(path))
+    await cache.put("scope", "Kept across restarts?", VALUE)
+    cache.backend.close()
+
+    reopened = AnswerCache(SQLiteAnswerBackend(path))
+    assert await reopened.get("scope", "kept across restarts") == VALUE
+    reopened.backend.close()
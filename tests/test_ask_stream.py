@@ -0,0 +1,70 @@
+from typing import List
+
+import httpx
+import pytest
+
+import gaia_http
+import gaia_service
+from gaia_service import AskChunk, AskParams
+
+
+def _params(question: str) -> AskParams:
+    return AskParams(llmName="llm", datasetNames=["dataset_0"], llmId="llm-1", queryString=question)
+
+
+async def _events(body: bytes) -> List[str]:
+    resp = httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+    return [data async for data in gaia_service._iter_sse_data(resp)]
+
+
+async def _chunks(question: str) -> List[AskChunk]:
+    return [c async for c in gaia_service.gaia_qa_stream(_params(question), use_cache=False)]
+
+
+@pytest.mark.anyio
+async def test_sse_events_join_multi_line_data_and_skip_other_fields(anyio_backend):
+    body = (
+        b"event: answer\ndata: first line\ndata:second line\n\n"
+        b": keep-alive comment\n\n"
+        b"id: 7\ndata: {\"responseString\": \"x\"}\n\n"
+        b"data: unterminated"
+    )
+    assert await _events(body) == ["first line\nsecond line", '{"responseString": "x"}', "unterminated"]
+
+
+@pytest.mark.anyio
+async def test_streamed_answer_arrives_as_tokens_then_citations_then_done(gaia):
+    await gaia(token_delay=0)
+    chunks = await _chunks("how does streaming work")
+    tokens = [c.text for c in chunks if c.type == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "This is a synthetic answer to: how does streaming work"
+
+    citations = [c for c in chunks if c.type == "citations"]
+    assert len(citations) == 1
+    assert [c["documentId"] for c in citations[0].citations] == ["obj-0"]
+    assert chunks[-1].type == "done"
+    assert chunks[-1].text == "".join(tokens)
+
+
+@pytest.mark.anyio
+async def test_non_json_event_data_is_taken_as_answer_text(anyio_backend):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: plain\n\ndata:  text\n\ndata: [DONE]\n\n"})
+
+    await gaia_http.init_pool(gaia_http.GaiaHTTPPool(transport=httpx.ASGITransport(app=app)))
+    try:
+        chunks = await _chunks("raw")
+    finally:
+        await gaia_http.close_pool()
+    assert [(c.type, c.text) for c in chunks] == [("token", "plain"), ("token", " text"), ("done", "plain text")]
+
+
+@pytest.mark.anyio
+async def test_plain_json_answer_falls_back_to_one_token(gaia):
+    app = await gaia(sse=False)
+    chunks = await _chunks("no streaming here")
+    assert [c.type for c in chunks] == ["token", "citations", "done"]
+    assert chunks[0].text == chunks[-1].text == "This is a synthetic answer to: no streaming here"
+    assert app.state.requests["POST /v2/mcm/gaia/ask"] == 1
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import gaia_service
+from gaia_service import AskParams, AskResult, gaia_qa_batch, iter_gaia_qa_batch
+
+ASK = "POST /v2/mcm/gaia/ask"
+PARAMS = AskParams(llmName="llm", datasetNames=["dataset_0"], llmId="llm-1", queryString="")
+
+
+@pytest.fixture
+def fake_qa(monkeypatch):
+    """
+    Replace gaia_qa with a scripted one: "slow*" questions take longer,
+    "boom*" questions fail, and every call and the peak in-flight count is recorded.
+    """
+    state = {"calls": [], "in_flight": 0, "peak": 0}
+
+    async def gaia_qa(params, pool=None, use_cache=True):
+        question = params.queryString
+        state["calls"].append(question)
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(0.05 if question.startswith("slow") else 0.01)
+            if question.startswith("boom"):
+                raise RuntimeError(f"upstream failed for {question}")
+            return AskResult(responseString=f"answer to {question}", citations=[])
+        finally:
+            state["in_flight"] -= 1
+
+    monkeypatch.setattr(gaia_service, "gaia_qa", gaia_qa)
+    return state
+
+
+@pytest.mark.anyio
+async def test_duplicate_questions_are_asked_once_and_fanned_out(gaia):
+    app = await gaia()
+    questions = ["what is x", "what is y", " what is x ", "what is x"]
+    result = await gaia_qa_batch(PARAMS, questions, use_cache=False)
+    assert app.state.requests[ASK] == 2
+    assert [item.index for item in result.results] == [0, 1, 2, 3]
+    # Every copy gets the answer, under the question as it was asked
+    assert [item.question for item in result.results] == questions
+    answers = [item.responseString for item in result.results]
+    assert answers[0] == answers[2] == answers[3] != answers[1]
+    assert "what is x" in answers[0]
+    assert (result.succeeded, result.failed) == (4, 0)
+
+
+@pytest.mark.anyio
+async def test_one_failing_question_leaves_the_others_ok(fake_qa):
+    result = await gaia_qa_batch(PARAMS, ["a", "boom", "b", "boom"])
+    assert [item.status for item in result.results] == ["ok", "error", "ok", "error"]
+    assert result.results[1].error == "upstream failed for boom"
+    assert result.results[1].responseString is None
+    assert result.results[2].responseString == "answer to b"
+    assert (result.succeeded, result.failed) == (2, 2)
+    assert sorted(fake_qa["calls"]) == ["a", "b", "boom"]
+
+
+@pytest.mark.anyio
+async def test_stream_yields_in_completion_order_and_batch_in_input_order(fake_qa):
+    questions = ["slow one", "fast one", "slow two", "fast two"]
+    streamed = [item.index async for item in iter_gaia_qa_batch(PARAMS, questions)]
+    assert sorted(streamed) == [0, 1, 2, 3]
+    assert set(streamed[:2]) == {1, 3}
+
+    result = await gaia_qa_batch(PARAMS, questions)
+    assert [item.index for item in result.results] == [0, 1, 2, 3]
+    assert [item.responseString for item in result.results] == [f"answer to {q}" for q in questions]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("asked, expected", [(2, 2), (0, 1), (-5, 1), (1000, 3)])
+async def test_concurrency_is_bounded_between_one_and_the_configured_max(fake_qa, monkeypatch, asked, expected):
+    monkeypatch.setattr(gaia_service, "GAIA_BATCH_CONCURRENCY", 3)
+    await gaia_qa_batch(PARAMS, [f"q{i}" for i in range(8)], concurrency=asked)
+    assert fake_qa["peak"] == expected
+
+
+@pytest.mark.anyio
+async def test_endpoints_reject_too_many_questions_and_out_of_range_concurrency(gaia):
+    import gaia_mcp_server
+
+    app = await gaia()
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    too_many = [f"q{i}" for i in range(gaia_service.GAIA_BATCH_MAX_QUESTIONS + 1)]
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        for path in ("/gaia_qa/batch", "/gaia_qa/batch/stream"):
+            resp = await client.post(path, json={"questions": too_many})
+            assert resp.status_code == 400
+            assert "questions per batch" in resp.json()["detail"]
+            for concurrency in (0, gaia_service.GAIA_BATCH_CONCURRENCY + 1):
+                resp = await client.post(path, params={"concurrency": concurrency}, json={"questions": ["q"]})
+                assert resp.status_code == 422
+        assert app.state.requests[ASK] == 0
+
+        resp = await client.post("/gaia_qa/batch/stream", params={"use_cache": "false"}, json={"questions": ["a", "b", "a"]})
+        assert resp.status_code == 200
+        items = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(item["index"] for item in items) == [0, 1, 2]
+    assert all(item["status"] == "ok" for item in items)
@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import sys
+
+import httpx
+import pytest
+
+import gaia_catalog
+import gaia_service
+from gaia_catalog import CatalogIndex, DatasetCatalog
+from gaia_service import AskParams, route_auto
+
+DISCOVERY = "GET /v2/mcm/gaia/dataset/{ds_id}/discovery"
+
+
+def _datasets(*entries):
+    return [{"dataset_id": f"ds-{i}", "dataset_name": name, "description": desc} for i, (name, desc) in enumerate(entries)]
+
+
+@pytest.fixture
+def keyword_only(monkeypatch):
+    # Index as if numpy were not installed, whether or not it is
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.setattr(gaia_catalog, "_np", None)
+    monkeypatch.setattr(gaia_catalog, "_numpy_loaded", False)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    # A fresh catalog per test instead of the one other tests have built
+    catalog = DatasetCatalog(gaia_service._catalog_datasets)
+    monkeypatch.setattr(gaia_service, "dataset_catalog", catalog)
+    return catalog
+
+
+def test_bm25_ranks_rare_and_repeated_terms_higher(keyword_only):
+    index = CatalogIndex(_datasets(
+        ("alpha", "invoices and invoices for every vendor invoice"),
+        ("beta", "one invoice among contracts, payroll, leases and policies"),
+        ("gamma", "payroll records"),
+    ))
+    assert not index.vectors
+    ranked = index.search("vendor invoices", 3)
+    assert [d["dataset_name"] for d, _ in ranked] == ["alpha", "beta"]
+    # Scores are normalized to the best keyword match
+    assert ranked[0][1] == 1.0 and 0 < ranked[1][1] < 1
+    # A term in every dataset says little; one in a single dataset decides
+    assert [d["dataset_name"] for d, _ in index.search("payroll records", 3)][0] == "gamma"
+    assert index.search("weather forecast", 3) == []
+
+
+def test_name_outweighs_description(keyword_only):
+    index = CatalogIndex(_datasets(
+        ("misc_files", "finance team exports"),
+        ("finance", "team exports of misc files"),
+    ))
+    assert [d["dataset_name"] for d, _ in index.search("finance", 2)] == ["finance", "misc_files"]
+    # Plurals and underscores in names still match
+    assert index.search("Misc file", 1)[0][0]["dataset_name"] == "misc_files"
+
+
+def test_vectors_on_without_numpy_fails_and_auto_falls_back(keyword_only, monkeypatch):
+    monkeypatch.setattr(gaia_catalog, "GAIA_CATALOG_VECTORS", "on")
+    with pytest.raises(ImportError):
+        CatalogIndex(_datasets(("finance", "reports")))
+    monkeypatch.setattr(gaia_catalog, "GAIA_CATALOG_VECTORS", "auto")
+    monkeypatch.setattr(gaia_catalog, "_numpy_loaded", False)
+    index = CatalogIndex(_datasets(("finance", "reports")))
+    assert not index.vectors
+    assert index.search("finance", 1)[0][0]["dataset_name"] == "finance"
+
+
+@pytest.mark.anyio
+async def test_auto_routes_to_the_best_datasets_and_rejects_no_match(gaia, catalog):
+    import gaia_mcp_server
+
+    await gaia(datasets=5)
+    # Discovery describes dataset_i as "Documents about topic ds-i"
+    routed = await route_auto(AskParams(llmName="llm", datasetNames=["auto"], llmId="llm-1", queryString="topic ds-3"))
+    assert routed.datasetNames[0] == "dataset_3"
+
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        resp = await client.post("/gaia_qa", params={"question": "zebra migration"}, json={"dataset_names": ["auto"]})
+    assert resp.status_code == 400
+    assert "No dataset matches the question" in resp.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_failed_rebuild_keeps_the_previous_index():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("discovery down")
+        return _datasets(("finance", "reports"))
+
+    catalog = DatasetCatalog(fetch, refresh_interval=0.01)
+    first = await catalog.index("me", None)
+    catalog.start()
+    try:
+        while catalog.refresh_errors < 2:
+            await asyncio.sleep(0.01)
+    finally:
+        await catalog.stop()
+    assert await catalog.index("me", None) is first
+    assert catalog.stats()["builds"] == 1
+
+
+@pytest.mark.anyio
+async def test_background_rebuilds_read_through_the_discovery_cache(gaia, catalog):
+    app = await gaia(datasets=4)
+    catalog.refresh_interval = 0.01
+    catalog.start(warm=[(gaia_service._identity(), None)])
+    try:
+        while catalog.builds < 4:
+            await asyncio.sleep(0.01)
+    finally:
+        await catalog.stop()
+    # One discovery call per dataset, however many rebuilds ran
+    assert app.state.requests[DISCOVERY] == 4
+
+
+@pytest.mark.anyio
+async def test_pending_datasets_are_indexed_with_their_descriptions(gaia, catalog, monkeypatch):
+    app = await gaia(datasets=3, latency=0.2)
+    await gaia_service.get_datasets()
+    # Every discovery call outlasts the deadline, so discover_tools reports them all pending
+    monkeypatch.setattr(gaia_service, "discover_tools", functools.partial(gaia_service.discover_tools, deadline=0.05))
+    assert (await gaia_service.discover_tools()).pending == ["dataset_0", "dataset_1", "dataset_2"]
+
+    index = await catalog.index(gaia_service._identity(), None)
+    assert [d["description"] for d in index.datasets] == [f"Documents about topic ds-{i}" for i in range(3)]
+    assert {d["status"] for d in index.datasets} == {"ok"}
+    # The catalog joined the discovery calls already running instead of starting new ones
+    assert app.state.requests[DISCOVERY] == 3
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import gaia_http
+import gaia_service
+from gaia_cache import SingleFlight
+from gaia_service import ExecuteParams
+
+
+@pytest.mark.anyio
+async def test_identical_page_requests_share_one_upstream_call(gaia):
+    await gaia(latency=0.2)
+    flight = gaia_service.objects_flight
+    before = flight.stats()
+    params = ExecuteParams(semantic_search_string="coalesce me", page_size=10)
+
+    pages = await asyncio.gather(*(gaia_service.call_gaia_page(params) for _ in range(5)))
+
+    assert gaia_http.get_pool().requests_total == 1
+    assert all(objects == pages[0][0] for objects, _ in pages)
+    assert flight.stats()["leaders"] - before["leaders"] == 1
+    assert flight.stats()["coalesced"] - before["coalesced"] == 4
+    assert len(flight) == 0
+
+
+@pytest.mark.anyio
+async def test_different_requests_are_not_coalesced(gaia):
+    await gaia(latency=0.05)
+    await asyncio.gather(
+        gaia_service.call_gaia_page(ExecuteParams(semantic_search_string="one", page_size=10)),
+        gaia_service.call_gaia_page(ExecuteParams(semantic_search_string="two", page_size=10)),
+    )
+    assert gaia_http.get_pool().requests_total == 2
+
+
+@pytest.mark.anyio
+async def test_shared_call_survives_one_cancelled_waiter():
+    flight = SingleFlight("test")
+    started = 0
+
+    async def fetch():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.1)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("k", fetch))
+    second = asyncio.ensure_future(flight.do("k", fetch))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+    assert started == 1
+    assert flight.stats()["abandoned"] == 0
+
+
+@pytest.mark.anyio
+async def test_shared_call_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight("test")
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiters = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for w in waiters:
+        w.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.sleep(0)
+    assert flight.stats()["abandoned"] == 1
+    assert "k" not in flight
+
+    # A new caller starts a fresh flight rather than joining the cancelled one
+    async def again():
+        return "fresh"
+
+    assert await flight.do("k", again) == "fresh"
+
+
+@pytest.mark.anyio
+async def test_shared_call_runs_on_without_cancel_when_abandoned():
+    flight = SingleFlight("test", cancel_when_abandoned=False)
+    finished = asyncio.Event()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        finished.set()
+
+    waiter = asyncio.ensure_future(flight.do("k", fetch))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.wait_for(finished.wait(), 1)
+    assert flight.stats()["abandoned"] == 0
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from gaia_cache import ContentStore, SQLiteContentTier
+
+
+@pytest.mark.anyio
+async def test_store_later_writes_in_the_background_and_drops_when_full():
+    store = ContentStore(queue_pages=2)
+    scope = ("http://gaia", "key")
+    store.store_later(scope, [{"id": "a"}, {"id": "b"}])
+    store.store_later(scope, [{"id": "c"}])
+    store.store_later(scope, [{"id": "d"}])
+    # Nothing is encoded on the caller's path
+    assert store.stats()["stores"] == 0
+    assert store.stats()["queued"] == 3
+    assert store.stats()["dropped"] == 1
+
+    await store.flush()
+    found = await store.get_many({store.key(scope, i): None for i in "abcd"})
+    assert sorted(o["id"] for o in found.values()) == ["a", "b", "c"]
+    # Another identity never sees these objects
+    assert await store.get_many({store.key(("http://gaia", "other"), "a"): None}) == {}
+
+    store.store_later(scope, [{"id": "d"}])
+    await asyncio.sleep(0.01)
+    assert store.stats()["queued"] == 0
+    assert await store.get_many({store.key(scope, "d"): None})
+
+
+@pytest.fixture(params=["hot", "cold"])
+def tiered_store(request, tmp_path):
+    if request.param == "hot":
+        store = ContentStore()
+    else:
+        # Room for one entry in memory: the next put demotes the first to SQLite
+        store = ContentStore(SQLiteContentTier(str(tmp_path / "content.sqlite3")), memory_bytes=1)
+    yield store
+    store.close()
+
+
+@pytest.mark.anyio
+async def test_other_version_is_a_miss_but_the_entry_stays(tiered_store):
+    store = tiered_store
+    await store.put_many([("a", {"id": "a", "etag": "v1"}), ("filler", {"id": "filler"})])
+
+    assert await store.get_many({"a": "v2"}) == {}
+    assert store.stats()["misses"] == 1
+    assert store.stats()["stale"] == 1
+    # The v1 copy is still there for callers that want it
+    assert await store.get_many({"a": "v1"}) == {"a": {"id": "a", "etag": "v1"}}
+    assert await store.get_many({"a": None}) == {"a": {"id": "a", "etag": "v1"}}
+    assert len(store) == 2
+
+
+@pytest.mark.anyio
+async def test_expired_entries_are_dropped(tiered_store, monkeypatch):
+    store = tiered_store
+    await store.put_many([("a", {"id": "a", "etag": "v1"}), ("filler", {"id": "filler"})])
+    monkeypatch.setattr(store, "ttl", -1)
+    assert await store.get_many({"a": "v1"}) == {}
+    assert store.stats()["stale"] == 1
+    monkeypatch.setattr(store, "ttl", 3600)
+    assert await store.get_many({"a": "v1"}) == {}
+    assert len(store) == 1
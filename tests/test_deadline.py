@@ -0,0 +1,56 @@
+import time
+
+import httpx
+import pytest
+
+from conftest import free_port, wait_for_port
+from gaia_deadline import deadline_stats
+
+
+@pytest.mark.anyio
+async def test_deadline_header_turns_a_slow_ask_into_504(gaia):
+    import gaia_mcp_server
+
+    fake = await gaia(latency=2)
+    before = deadline_stats()["exceeded"]
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        started = time.monotonic()
+        resp = await client.post(
+            "/gaia_qa",
+            params={"question": "too slow", "use_cache": "false"},
+            headers={"x-gaia-deadline": "0.2"},
+        )
+    assert resp.status_code == 504
+    assert "Deadline exceeded" in resp.json()["detail"]
+    assert time.monotonic() - started < 1.5
+    assert fake.state.requests["POST /v2/mcm/gaia/ask"] == 1
+    assert deadline_stats()["exceeded"] == before + 1
+
+
+def test_client_disconnect_cancels_the_ask(spawn):
+    gaia_port, port = free_port(), free_port()
+    spawn(["fake_gaia.py", "--port", str(gaia_port), "--latency", "5"])
+    wait_for_port(gaia_port)
+    spawn(
+        ["gaia_serve.py", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        env={"GAIA_HOST": f"http://127.0.0.1:{gaia_port}"},
+    )
+    wait_for_port(port)
+    base = f"http://127.0.0.1:{port}"
+
+    # The client gives up (and closes its connection) long before Gaia answers
+    with pytest.raises(httpx.ReadTimeout):
+        httpx.post(f"{base}/gaia_qa", params={"question": "abandoned", "use_cache": "false"}, timeout=0.5)
+
+    deadline = time.monotonic() + 3
+    while True:
+        health = httpx.get(f"{base}/healthz", timeout=5).json()
+        if health["drain"]["in_flight"] == 0 or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    # Cancelled well before the 5s upstream answer would have arrived
+    assert health["drain"]["in_flight"] == 0
+    assert health["deadline"]["client_disconnects"] == 1
+    # The shared upstream ask lost its only waiter and was cancelled with it
+    assert health["cache"]["coalescing"]["ask"]["abandoned"] == 1
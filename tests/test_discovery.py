@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+import gaia_service
+
+DISCOVERY = "GET /v2/mcm/gaia/dataset/{ds_id}/discovery"
+
+
+@pytest.mark.anyio
+async def test_slow_discovery_is_pending_then_served_from_the_cache(gaia):
+    app = await gaia(datasets=3, latency=0.3)
+    await gaia_service.get_datasets()
+
+    partial = await gaia_service.list_datasets_descriptions(deadline=0.1)
+    assert partial.pending == ["dataset_0", "dataset_1", "dataset_2"]
+    assert {t.status for t in partial.tools} == {"pending"}
+
+    # The abandoned fetches finish in the background and fill the cache
+    await asyncio.sleep(0.4)
+    complete = await gaia_service.list_datasets_descriptions(deadline=0.1)
+    assert complete.pending == []
+    assert [t.description for t in complete.tools] == [f"Documents about topic ds-{i}" for i in range(3)]
+    assert app.state.requests[DISCOVERY] == 3
+
+
+@pytest.mark.anyio
+async def test_discovery_fan_out_is_bounded_by_concurrency(gaia):
+    app = await gaia(datasets=4, latency=0.1)
+    await gaia_service.get_datasets()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await gaia_service.list_datasets_descriptions(concurrency=2, deadline=5)
+    # Four datasets, two at a time: two rounds of Gaia latency
+    assert loop.time() - started >= 0.2
+    assert result.pending == []
+    assert app.state.requests[DISCOVERY] == 4
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from gaia_service import ExecuteParams, TopK, search_federated
+
+
+def test_topk_keeps_the_best_rank_per_key():
+    top = TopK(3)
+    top.offer("a", (1, 0.5), "a@0.5")
+    top.offer("b", (1, 0.9), "b@0.9")
+    top.offer("c", (0, -1), "c unscored")
+    top.offer("a", (1, 0.95), "a@0.95")
+    # A worse duplicate never replaces the better copy
+    assert not top.offer("b", (1, 0.1), "b@0.1")
+    top.offer("d", (1, 0.7), "d@0.7")
+    assert top.items() == ["a@0.95", "b@0.9", "d@0.7"]
+    assert top.count_scored(0.8) == 2
+    # Below the current k-th best: rejected outright
+    assert not top.offer("e", (1, 0.6), "e@0.6")
+    assert len(top) == 3
+
+
+@pytest.mark.anyio
+async def test_merges_datasets_into_one_deduplicated_top_k(gaia):
+    # Dataset d returns obj-(3d), obj-(3d+1), ... scored slightly lower per dataset
+    await gaia(datasets=3, objects=10)
+    result = await search_federated(
+        ExecuteParams(semantic_search_string="merge"),
+        dataset_names=["dataset_0", "dataset_1", "dataset_2", "no_such_dataset"],
+        k=5,
+        min_score=None,
+    )
+    ranked = [(d.id, d.dataset_name) for d in result.documents]
+    assert ranked == [
+        ("obj-0", "dataset_0"),
+        ("obj-3", "dataset_1"),
+        ("obj-6", "dataset_2"),
+        ("obj-1", "dataset_0"),
+        ("obj-4", "dataset_1"),
+    ]
+    scores = [d.score for d in result.documents]
+    assert scores == sorted(scores, reverse=True)
+    assert result.searched == ["dataset_0", "dataset_1", "dataset_2"]
+    assert result.pending == [] and result.failed == []
+    assert result.unknown == ["no_such_dataset"]
+
+
+@pytest.mark.anyio
+async def test_returns_early_once_k_results_score_high_enough(gaia):
+    app = await gaia(datasets=4, objects=10, latency=0.3)
+    started = time.monotonic()
+    result = await search_federated(
+        ExecuteParams(semantic_search_string="early"), k=2, min_score=0.9, concurrency=1
+    )
+    # One dataset's first page has two objects scoring >= 0.9
+    assert [d.id for d in result.documents] == ["obj-0", "obj-1"]
+    assert result.pending
+    assert time.monotonic() - started < 1.5
+    assert app.state.requests["GET /v2/mcm/gaia/objects"] < 4
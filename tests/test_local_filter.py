@@ -0,0 +1,52 @@
+import pytest
+
+import gaia_service
+from gaia_service import ExecuteParams, build_local_filter
+
+OBJECTS = "GET /v2/mcm/gaia/objects"
+
+
+async def _search(**params) -> gaia_service.ExecuteResult:
+    return await gaia_service.search_objects(ExecuteParams(semantic_search_string="filter", **params))
+
+
+@pytest.mark.anyio
+async def test_file_type_is_enforced_locally_when_gaia_ignores_it(gaia):
+    # fake_gaia ignores fileTypes; objects cycle through .txt, .pdf, .docx
+    app = await gaia(objects=12)
+    result = await _search(file_type=[".PDF"], page_size=5, max_results=None)
+    assert [d.id for d in result.documents] == ["obj-1", "obj-4", "obj-7", "obj-10"]
+    assert result.pruned == 8
+    assert app.state.requests[OBJECTS] == 3
+
+
+@pytest.mark.anyio
+async def test_size_bounds_are_exclusive_and_enforced_locally(gaia):
+    # obj-i is (i + 1) KB
+    await gaia(objects=12)
+    result = await _search(file_greater_than_kb=3, file_less_than_kb=7, max_results=None)
+    assert [d.id for d in result.documents] == ["obj-3", "obj-4", "obj-5"]
+    assert result.pruned == 9
+
+
+def test_objects_without_the_metadata_are_kept():
+    keep = build_local_filter(ExecuteParams(file_type=["pdf"], file_greater_than_kb=10))
+    assert keep({"id": "bare"})
+    assert keep({"id": "no-size", "name": "report.pdf"})
+    assert keep({"id": "no-name", "sizeBytes": 20 * 1024})
+    assert not keep({"id": "wrong-type", "name": "notes.txt"})
+    assert not keep({"id": "too-small", "fileType": "PDF", "size": 1024})
+    assert build_local_filter(ExecuteParams()) is None
+
+
+@pytest.mark.anyio
+async def test_next_cursor_stays_exact_after_pruning(gaia):
+    await gaia(objects=12)
+    first = await _search(file_type=["pdf"], page_size=5, max_results=2)
+    assert [d.id for d in first.documents] == ["obj-1", "obj-4"]
+    assert first.next_cursor == "5"
+
+    rest = await _search(file_type=["pdf"], page_size=5, cursor=first.next_cursor, max_results=None)
+    # Nothing skipped and nothing repeated across the two calls
+    assert [d.id for d in rest.documents] == ["obj-7", "obj-10"]
+    assert rest.next_cursor is None
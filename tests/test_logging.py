@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+
+import gaia_http
+import gaia_logging
+from gaia_logging import REDACTED, preview, redact_headers, should_trace
+
+URL = "http://fake-gaia.local/v2/mcm/gaia/datasets"
+SECRETS = {"apiKey": "gaia-secret-key", "Authorization": "Bearer secret-token"}
+
+
+def test_credential_headers_are_redacted_in_any_case():
+    headers = redact_headers({"APIKEY": "k", "authorization": "t", "X-Api-Key": "x", "accept": "application/json"})
+    assert headers == {"APIKEY": REDACTED, "authorization": REDACTED, "X-Api-Key": REDACTED, "accept": "application/json"}
+    assert redact_headers(None) == {}
+
+
+@pytest.mark.anyio
+async def test_debug_traces_never_contain_credentials(gaia, caplog):
+    await gaia()
+    with caplog.at_level(logging.DEBUG, logger="gaia_http"):
+        resp = await gaia_http.get_pool().get(URL, headers=dict(SECRETS))
+    assert resp.status_code == 200
+    traces = [r.getMessage() for r in caplog.records if r.name == "gaia_http"]
+    assert any(t.startswith("Gaia request GET") for t in traces)
+    assert any(t.startswith("Gaia response GET") and "dataset_0" in t for t in traces)
+    for secret in SECRETS.values():
+        assert secret not in caplog.text
+    assert REDACTED in caplog.text
+
+
+def test_previews_are_capped_in_bytes():
+    assert preview(b"x" * 5000, limit=100) == "x" * 100 + "... [4900 more]"
+    assert preview("y" * 10, limit=100) == "y" * 10
+    assert preview({"k": "v"}) == '{"k": "v"}'
+    # 2-byte characters: the one cut in half by the 51-byte limit is dropped
+    text = preview("é".encode() * 100, limit=51)
+    assert text == "é" * 25 + "... [149 more]"
+    # Invalid bytes inside the limit are still shown
+    assert preview(b"\xff ok", limit=100) == "� ok"
+
+
+@pytest.mark.anyio
+async def test_nothing_is_formatted_when_debug_is_off(gaia, caplog, monkeypatch):
+    await gaia()
+    formatted = []
+
+    def counting_preview(*args, **kwargs):
+        formatted.append(args)
+        return preview(*args, **kwargs)
+
+    monkeypatch.setattr(gaia_logging, "preview", counting_preview)
+    monkeypatch.setattr(gaia_logging, "redact_headers", lambda h: formatted.append(h) or {})
+    logger = logging.getLogger("gaia_http")
+    with caplog.at_level(logging.INFO, logger="gaia_http"):
+        assert not should_trace(logger)
+        await gaia_http.get_pool().get(URL, headers=dict(SECRETS))
+    assert formatted == []
+    assert not [r for r in caplog.records if r.levelno == logging.DEBUG]
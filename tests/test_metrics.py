@@ -0,0 +1,125 @@
+import math
+import re
+from typing import Dict, List, Tuple
+
+import httpx
+import pytest
+
+from gaia_metrics import Counter, Histogram, Registry
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+_UNESCAPE = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def parse(text: str) -> Tuple[Dict[str, str], List[Sample]]:
+    """
+    Parse Prometheus text exposition into ({family: type}, samples), checking
+    that every sample belongs to a family declared (HELP, then TYPE) before it.
+    """
+    assert text.endswith("\n")
+    types: Dict[str, str] = {}
+    helped = set()
+    samples: List[Sample] = []
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            helped.add(line.split(" ")[2])
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name in helped and kind in ("counter", "gauge", "histogram")
+            types[name] = kind
+        else:
+            match = _SAMPLE.match(line)
+            assert match, line
+            name, raw_labels, value = match.groups()
+            labels = {}
+            if raw_labels:
+                pairs = _LABEL.findall(raw_labels)
+                assert ",".join(f'{k}="{v}"' for k, v in pairs) == raw_labels, line
+                labels = {k: re.sub(r'\\[\\"n]', lambda m: _UNESCAPE[m.group()], v) for k, v in pairs}
+            family = re.sub(r"_(bucket|sum|count)$", "", name) if name not in types else name
+            assert family in types, f"{name} has no TYPE"
+            samples.append((name, labels, float(value)))
+    return types, samples
+
+
+def check_histograms(types: Dict[str, str], samples: List[Sample]) -> int:
+    """
+    Check every histogram series: cumulative buckets ending in +Inf, and
+    _count equal to the +Inf bucket. Returns the number of series checked.
+    """
+    series: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, object]] = {}
+    for name, labels, value in samples:
+        family = re.sub(r"_(bucket|sum|count)$", "", name)
+        if types.get(family) != "histogram":
+            continue
+        key = (family, tuple(sorted((k, v) for k, v in labels.items() if k != "le")))
+        entry = series.setdefault(key, {"buckets": []})
+        if name.endswith("_bucket"):
+            entry["buckets"].append((float(labels["le"]), value))
+        else:
+            entry[name[len(family) + 1:]] = value
+    for entry in series.values():
+        bounds = [b for b, _ in entry["buckets"]]
+        counts = [c for _, c in entry["buckets"]]
+        assert bounds == sorted(bounds) and math.isinf(bounds[-1])
+        assert counts == sorted(counts)
+        assert entry["count"] == counts[-1]
+        assert "sum" in entry
+    return len(series)
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Test counter", ("path",)))
+    tricky = 'a "quoted"\\path\nwith newline'
+    counter.inc(2, path=tricky)
+    text = registry.render()
+    assert '\\"quoted\\"\\\\path\\nwith' in text
+    _, samples = parse(text)
+    assert samples == [("test_total", {"path": tricky}, 2.0)]
+
+
+def test_histogram_exposes_cumulative_buckets_sum_and_count():
+    registry = Registry()
+    hist = registry.register(Histogram("test_seconds", "Test histogram", ("op",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, op="x")
+    types, samples = parse(registry.render())
+    assert types == {"test_seconds": "histogram"}
+    by_name = {(n, l.get("le")): v for n, l, v in samples}
+    # le is inclusive: 0.1 falls in the 0.1 bucket
+    assert by_name[("test_seconds_bucket", "0.1")] == 2
+    assert by_name[("test_seconds_bucket", "1.0")] == 3
+    assert by_name[("test_seconds_bucket", "+Inf")] == 4
+    assert by_name[("test_seconds_count", None)] == 4
+    assert by_name[("test_seconds_sum", None)] == pytest.approx(3.65)
+    assert check_histograms(types, samples) == 1
+
+
+@pytest.mark.anyio
+async def test_metrics_scrape_parses_after_real_traffic(gaia):
+    import gaia_mcp_server
+
+    await gaia()
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        ask = await client.post("/gaia_qa", params={"question": "metrics", "use_cache": "false"})
+        assert ask.status_code == 200
+        scrape = await client.get("/metrics")
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    types, samples = parse(scrape.text)
+    assert types["gaia_tool_seconds"] == "histogram"
+    assert types["gaia_upstream_requests_total"] == "counter"
+    assert check_histograms(types, samples) >= 2
+
+    def value(name: str, **labels: str) -> float:
+        return sum(v for n, l, v in samples if n == name and all(l.get(k) == x for k, x in labels.items()))
+
+    assert value("gaia_tool_requests_total", tool="/gaia_qa", status="200") >= 1
+    assert value("gaia_tool_seconds_count", tool="/gaia_qa", status="200") >= 1
+    assert value("gaia_upstream_requests_total", endpoint="POST /v2/mcm/gaia/ask", status="200") >= 1
+    assert value("gaia_tool_response_bytes_total", tool="/gaia_qa") >= len(ask.content)
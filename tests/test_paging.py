@@ -0,0 +1,72 @@
+import httpx
+import pytest
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+from pydantic import ValidationError
+
+import gaia_service
+from gaia_service import GAIA_OBJECTS_MAX_PAGE_SIZE, ExecuteParams
+
+OBJECTS = "GET /v2/mcm/gaia/objects"
+
+
+async def _pages(**params):
+    return [page async for page in gaia_service.iter_search_objects(ExecuteParams(**params))]
+
+
+@pytest.mark.anyio
+async def test_pagination_cookie_is_followed_to_a_short_last_page(gaia):
+    app = await gaia(objects=25)
+    pages = await _pages(semantic_search_string="all", page_size=10, max_results=None)
+    assert [len(p.documents) for p in pages] == [10, 10, 5]
+    assert [p.next_cursor for p in pages] == ["10", "20", None]
+    ids = [d.id for p in pages for d in p.documents]
+    assert ids == [f"obj-{i}" for i in range(25)]
+    assert app.state.requests[OBJECTS] == 3
+
+
+@pytest.mark.anyio
+async def test_max_results_stops_mid_page_and_next_cursor_resumes_exactly(gaia):
+    app = await gaia(objects=25)
+    first = await gaia_service.search_objects(ExecuteParams(semantic_search_string="q", page_size=10, max_results=12))
+    assert [d.id for d in first.documents] == [f"obj-{i}" for i in range(12)]
+    # The last page is only requested for what is still wanted
+    assert first.next_cursor == "12"
+    assert app.state.requests[OBJECTS] == 2
+
+    rest = await gaia_service.search_objects(
+        ExecuteParams(semantic_search_string="q", page_size=10, cursor=first.next_cursor, max_results=None)
+    )
+    assert [d.id for d in rest.documents] == [f"obj-{i}" for i in range(12, 25)]
+    assert rest.next_cursor is None
+
+
+@pytest.mark.parametrize("bad", [
+    {"page_size": 0},
+    {"page_size": GAIA_OBJECTS_MAX_PAGE_SIZE + 1},
+    {"max_results": 0},
+    {"max_results": -5},
+])
+def test_page_size_and_max_results_are_bounded(bad):
+    with pytest.raises(ValidationError):
+        ExecuteParams(**bad)
+
+
+@pytest.mark.anyio
+async def test_search_objects_is_served_over_rest_and_mcp(gaia):
+    import gaia_mcp_server
+
+    await gaia(objects=25)
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        ok = await client.post("/search_objects", params={"keyword": "k", "page_size": 5, "max_results": 7})
+        assert ok.status_code == 200
+        assert len(ok.json()["documents"]) == 7
+        assert ok.json()["next_cursor"] == "7"
+        assert (await client.post("/search_objects", params={"page_size": 0})).status_code == 422
+
+    async with Client(gaia_mcp_server.mcp) as mcp:
+        result = await mcp.call_tool("search_objects", {"keyword": "k", "page_size": 5, "max_results": 3})
+        assert '"next_cursor":"3"' in result[0].text
+        with pytest.raises(ToolError):
+            await mcp.call_tool("search_objects", {"keyword": "k", "max_results": 0})
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+
+import gaia_http
+from fake_gaia import create_app
+from gaia_http import GaiaHTTPPool, endpoint_name
+from gaia_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+URL = "http://fake-gaia.local/v2/mcm/gaia/datasets"
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+
+
+def _switchable_pool(apps: dict, **options) -> GaiaHTTPPool:
+    # One pool (and breaker) in front of whichever fake app is current
+    async def app(scope, receive, send):
+        await apps["current"](scope, receive, send)
+
+    return GaiaHTTPPool(transport=httpx.ASGITransport(app=app), breaker_factory=_breaker, **options)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.opened_at -= 0.05
+    breaker.check()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker.opened_at -= 0.05
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.rejected == 2
+
+
+@pytest.mark.anyio
+async def test_retries_then_opens_the_circuit_until_gaia_recovers(anyio_backend):
+    failing, healthy = create_app(error_rate=1.0), create_app()
+    apps = {"current": failing}
+    pool = _switchable_pool(apps, retry=RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.001))
+    await gaia_http.init_pool(pool)
+    try:
+        # Every attempt fails: retried, then the last 503 is returned
+        resp = await pool.get(URL)
+        assert resp.status_code == 503
+        assert pool.requests_total == 3
+        assert pool.retries == 2
+        assert pool.breaker(URL).state == CircuitBreaker.OPEN
+
+        # Open: rejected without reaching Gaia
+        with pytest.raises(CircuitOpenError):
+            await pool.get(URL)
+        assert pool.requests_total == 3
+
+        # Half-open: one trial; its failure re-opens the circuit, so its retry is rejected
+        await asyncio.sleep(0.2)
+        with pytest.raises(CircuitOpenError):
+            await pool.get(URL)
+        assert pool.requests_total == 4
+        assert pool.breaker(URL).state == CircuitBreaker.OPEN
+
+        # Half-open again with Gaia back: the trial succeeds and closes the circuit
+        apps["current"] = healthy
+        await asyncio.sleep(0.2)
+        assert (await pool.get(URL)).status_code == 200
+        assert pool.breaker(URL).state == CircuitBreaker.CLOSED
+        assert pool.requests_total == 5
+    finally:
+        await gaia_http.close_pool()
+
+
+@pytest.mark.anyio
+async def test_non_idempotent_requests_are_not_retried(gaia):
+    await gaia(error_rate=1.0, pool={"retry": RetryPolicy(attempts=3, base_delay=0.001)})
+    pool = gaia_http.get_pool()
+    resp = await pool.post("http://fake-gaia.local/v2/mcm/gaia/ask", json={"queryString": "q"})
+    assert resp.status_code == 503
+    assert pool.requests_total == 1
+    assert pool.retries == 0
+
+
+@pytest.mark.anyio
+async def test_slow_request_is_hedged(gaia):
+    await gaia(latency=0.3, pool={"hedge": True})
+    pool = gaia_http.get_pool()
+    # Recent requests were fast, so a 0.3s one outlives the p95 and is hedged
+    for _ in range(20):
+        pool.latency(endpoint_name("GET", URL)).record(0.001)
+
+    assert (await pool.get(URL)).status_code == 200
+    assert pool.hedges == 1
+    assert pool.requests_total == 2
+    assert pool.retries == 0
@@ -0,0 +1,68 @@
+import signal
+import threading
+import time
+
+import httpx
+import pytest
+
+from conftest import free_port, wait_for_port
+
+
+def test_sigterm_fails_readiness_and_finishes_in_flight_asks(spawn):
+    gaia_port, port = free_port(), free_port()
+    spawn(["fake_gaia.py", "--port", str(gaia_port), "--latency", "2"])
+    wait_for_port(gaia_port)
+    server = spawn(
+        ["gaia_serve.py", "--port", str(port), "--workers", "1", "--drain-grace", "3", "--drain-timeout", "20.5", "--log-level", "warning"],
+        # The first readiness probe result is reused for the whole test
+        env={"GAIA_HOST": f"http://127.0.0.1:{gaia_port}", "GAIA_READY_TIMEOUT": "10", "GAIA_READY_TTL": "60"},
+    )
+    wait_for_port(port)
+    base = f"http://127.0.0.1:{port}"
+    assert httpx.get(f"{base}/readyz", timeout=20).status_code == 200
+
+    answers = []
+    ask = threading.Thread(target=lambda: answers.append(
+        httpx.post(f"{base}/gaia_qa", params={"question": "in flight", "use_cache": "false"}, timeout=30)
+    ))
+    ask.start()
+    time.sleep(0.5)
+    server.send_signal(signal.SIGTERM)
+    time.sleep(0.5)
+
+    ready = httpx.get(f"{base}/readyz", timeout=10)
+    assert ready.status_code == 503
+    assert ready.json()["checks"]["draining"] is True
+    assert httpx.post(f"{base}/gaia_qa", params={"question": "late"}, timeout=10).status_code == 503
+
+    ask.join(30)
+    assert answers and answers[0].status_code == 200
+    assert "in flight" in answers[0].json()["responseString"]
+    assert server.wait(30) is not None
+
+
+@pytest.mark.anyio
+async def test_drain_rejects_every_tool_route_but_not_probes(monkeypatch):
+    import gaia_mcp_server
+    from gaia_serve import drain
+
+    monkeypatch.setattr(drain, "draining", True)
+    transport = httpx.ASGITransport(app=gaia_mcp_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://server") as client:
+        for method, path in [
+            ("POST", "/gaia_qa"),
+            ("POST", "/gaia_qa/batch"),
+            ("POST", "/gaia_qa/stream"),
+            ("POST", "/gaia_qa/batch/stream"),
+            ("POST", "/search_objects"),
+            ("POST", "/search_objects/stream"),
+            ("POST", "/search_objects/federated"),
+            ("POST", "/discover_tools/stream"),
+            ("POST", "/documents"),
+            ("POST", "/select_datasets"),
+        ]:
+            resp = await client.request(method, path)
+            assert resp.status_code == 503, path
+            assert resp.headers["connection"] == "close"
+        assert (await client.get("/healthz")).status_code == 200
+        assert (await client.get("/metrics")).status_code == 200
@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import gaia_http
+import gaia_service
+from gaia_service import AskParams, gaia_qa_session
+from gaia_sessions import SessionStore
+from gaia_tenants import Credentials, use_credentials
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASK = "POST /v2/mcm/gaia/ask"
+
+
+def _params(question: str) -> AskParams:
+    return AskParams(llmName="llm", datasetNames=["dataset_0"], llmId="llm-1", queryString=question)
+
+
+def _record(store: SessionStore, session, turns, size: int = 10):
+    for i in range(turns):
+        session = store.record(session, f"question {i}?", f"Answer {i}. " + "x" * size)
+    return session
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # A fresh store per test, small enough to exercise the window and compaction
+    store = SessionStore(max_turns=4, window_turns=2, window_chars=10_000, summary_chars=1_000)
+    monkeypatch.setattr(gaia_service, "sessions", store)
+    return store
+
+
+def test_window_defaults_come_from_the_environment():
+    env = dict(os.environ, GAIA_SESSION_WINDOW_TURNS="3", GAIA_SESSION_WINDOW_CHARS="1234")
+    out = subprocess.run(
+        [sys.executable, "-c", "from gaia_sessions import SessionStore; s = SessionStore(); print(s.window_turns, s.window_chars)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    assert out.stdout.split() == ["3", "1234"]
+
+
+def test_window_keeps_the_most_recent_turns_within_both_bounds():
+    store = SessionStore(window_turns=3, window_chars=10_000)
+    session = _record(store, store.open(None, "scope"), 5)
+    history = store.window(session)
+    # Turns outside the window are summarized, the last three are verbatim
+    assert history[0]["role"] == "system"
+    assert "Q: question 0? A: Answer 0." in history[0]["content"]
+    assert "question 2?" not in history[0]["content"]
+    assert [h["content"] for h in history[1::2]] == ["question 2?", "question 3?", "question 4?"]
+
+    # A character budget that fits two of the turns wins over window_turns
+    store = SessionStore(window_turns=3, window_chars=2 * (len("question 0?") + len("Answer 0. ") + 100))
+    session = _record(store, store.open(None, "scope"), 5, size=100)
+    assert [h["content"] for h in store.window(session)[1::2]] == ["question 3?", "question 4?"]
+
+    # The newest turn is always sent, even if it alone is over budget
+    store = SessionStore(window_turns=3, window_chars=10)
+    session = _record(store, store.open(None, "scope"), 2, size=100)
+    assert [h["content"] for h in store.window(session)[1::2]] == ["question 1?"]
+
+
+def test_old_turns_are_compacted_into_a_capped_summary(store):
+    session = _record(store, store.open(None, "scope"), 7)
+    assert len(session) == 7
+    assert len(session.turns) == store.max_turns
+    assert session.summarized_turns == 3
+    assert session.summary.split("\n") == [f"Q: question {i}? A: Answer {i}." for i in range(3)]
+
+    store.summary_chars = 60
+    session = _record(store, session, 10)
+    assert (len(session), session.summarized_turns) == (17, 13)
+    assert len(session.summary) <= 60
+    # The oldest summary lines go first; the newest is the second batch's question 5
+    assert session.summary.endswith("Q: question 5? A: Answer 5.")
+
+
+@pytest.mark.anyio
+async def test_session_carries_history_and_is_scoped_to_credentials(gaia, store):
+    await gaia()
+    first = await gaia_qa_session(_params("first question"), "", use_cache=False)
+    assert (first.turns, len(store)) == (1, 1)
+    second = await gaia_qa_session(_params("second question"), first.session_id, use_cache=False)
+    assert (second.session_id, second.turns) == (first.session_id, 2)
+
+    # The same id under other credentials never sees (or extends) that history
+    with use_credentials(Credentials(gaia_service.tenants.default.host, "another-key")):
+        other = await gaia_qa_session(_params("third question"), first.session_id, gaia_http.get_pool(), use_cache=False)
+    assert other.session_id != first.session_id
+    assert other.turns == 1
+    assert len(store.open(first.session_id, gaia_service.digest(*gaia_service._identity()))) == 2
+
+
+@pytest.mark.anyio
+async def test_failed_ask_stores_no_session(gaia, store):
+    app = await gaia(error_rate=1.0)
+    with pytest.raises(Exception):
+        await gaia_qa_session(_params("question"), "new-session", use_cache=False)
+    assert app.state.requests[ASK] >= 1
+    assert len(store) == 0
+    assert store.stats()["created"] == 0
+
+
+@pytest.mark.anyio
+async def test_history_sent_to_gaia_levels_off(gaia, store, monkeypatch):
+    await gaia()
+    sent = []
+    gaia_qa = gaia_service.gaia_qa
+
+    async def recording_qa(params, pool=None, use_cache=True):
+        sent.append(params.history)
+        return await gaia_qa(params, pool, use_cache)
+
+    monkeypatch.setattr(gaia_service, "gaia_qa", recording_qa)
+    store.summary_chars = 200
+    session_id = ""
+    for i in range(12):
+        result = await gaia_qa_session(_params(f"question number {i}"), session_id, use_cache=False)
+        session_id = result.session_id
+    assert result.turns == 12
+
+    # Summary + window_turns verbatim turns, however long the conversation gets
+    assert [len(history) for history in sent] == [0, 2, 4, 5, 5, 5, 5, 5, 5, 5, 5, 5]
+    sizes = [len(json.dumps(history)) for history in sent]
+    assert max(sizes[4:]) - min(sizes[4:]) <= store.summary_chars
+
+
+@pytest.mark.anyio
+async def test_ask_stream_tool_reports_turns_from_its_own_session(gaia, store):
+    from fastmcp import Client
+
+    import gaia_mcp_server
+
+    await gaia()
+    async with Client(gaia_mcp_server.mcp) as mcp:
+        first = json.loads((await mcp.call_tool("ask_stream", {"question": "one", "session_id": "", "use_cache": False}))[0].text)
+        second = json.loads((await mcp.call_tool(
+            "ask_stream", {"question": "two", "session_id": first["session_id"], "use_cache": False}
+        ))[0].text)
+    assert first["turns"] == 1
+    assert (second["session_id"], second["turns"]) == (first["session_id"], 2)
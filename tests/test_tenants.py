@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from fake_gaia import create_app
+from gaia_http import GaiaHTTPPool
+from gaia_tenants import Credentials, FairScheduler, TenantMiddleware, TenantRegistry, use_credentials
+
+GAIA = "http://fake-gaia.local"
+
+
+@pytest.mark.anyio
+async def test_scheduler_serves_waiting_tenants_round_robin():
+    scheduler = FairScheduler(capacity=1, per_tenant=1)
+    granted = []
+
+    async def call(tenant: str, name: str, hold: asyncio.Event) -> None:
+        async with scheduler.slot(tenant):
+            granted.append(name)
+            await hold.wait()
+
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(call("a", "a0", release))
+    await asyncio.sleep(0)
+    # Tenant a queues a backlog before b shows up
+    go = asyncio.Event()
+    go.set()
+    waiters = [asyncio.ensure_future(call("a", f"a{i}", go)) for i in (1, 2, 3)]
+    await asyncio.sleep(0)
+    waiters.append(asyncio.ensure_future(call("b", "b1", go)))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"] == 4
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert granted == ["a0", "a1", "b1", "a2", "a3"]
+    assert scheduler.stats()["in_use"] == 0
+
+
+@pytest.mark.anyio
+async def test_busy_tenant_does_not_starve_another_against_fake_gaia(anyio_backend):
+    app = create_app(latency=0.05)
+    registry = TenantRegistry(
+        default=Credentials(GAIA, "server-key"),
+        scheduler=FairScheduler(capacity=1, per_tenant=1),
+        pool_factory=lambda: GaiaHTTPPool(transport=httpx.ASGITransport(app=app)),
+    )
+    finished = []
+
+    async def fetch(key: str, name: str) -> None:
+        with use_credentials(Credentials(GAIA, key)):
+            resp = await registry.pool().get(f"{GAIA}/v2/mcm/gaia/datasets")
+        assert resp.status_code == 200
+        finished.append(name)
+
+    try:
+        busy = [asyncio.ensure_future(fetch("busy", f"busy{i}")) for i in range(6)]
+        await asyncio.sleep(0.01)
+        await asyncio.gather(fetch("quiet", "quiet"), *busy)
+    finally:
+        await registry.close()
+    # Served after at most one more of the busy tenant's requests, not after all of them
+    assert finished.index("quiet") <= 2
+    assert app.state.requests["GET /v2/mcm/gaia/datasets"] == 7
+
+
+@pytest.mark.anyio
+async def test_rate_limited_tenant_gets_429_with_retry_after(anyio_backend):
+    gaia = create_app()
+    registry = TenantRegistry(
+        default=Credentials(GAIA, "server-key"),
+        rate=0.5,
+        burst=2,
+        pool_factory=lambda: GaiaHTTPPool(transport=httpx.ASGITransport(app=gaia)),
+    )
+    api = FastAPI()
+
+    @api.get("/datasets")
+    async def datasets():
+        resp = await registry.pool().get(f"{GAIA}/v2/mcm/gaia/datasets")
+        return resp.json()
+
+    @api.get("/healthz")
+    async def healthz():
+        return {"ok": True}
+
+    app = TenantMiddleware(api, registry, exempt={"/healthz"})
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://server") as client:
+            alice = {"x-api-key": "alice"}
+            assert [(await client.get("/datasets", headers=alice)).status_code for _ in range(2)] == [200, 200]
+
+            limited = await client.get("/datasets", headers=alice)
+            assert limited.status_code == 429
+            assert limited.headers["retry-after"] == "2"
+            assert "Rate limit exceeded" in limited.json()["detail"]
+
+            # Other tenants and exempt paths have their own budget
+            assert (await client.get("/datasets", headers={"x-api-key": "bob"})).status_code == 200
+            assert (await client.get("/healthz", headers=alice)).status_code == 200
+        assert registry.stats()["rate_limited"] == 1
+    finally:
+        await registry.close()
+    # The rejected call never reached Gaia
+    assert gaia.state.requests["GET /v2/mcm/gaia/datasets"] == 3
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import gaia_service
+from gaia_cache import AsyncTTLCache
+
+DATASETS = "GET /v2/mcm/gaia/datasets"
+
+
+class Upstream:
+    """
+    Counts fetches; each returns the next version number.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def fetch(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.calls
+
+
+@pytest.mark.anyio
+async def test_fresh_entries_are_served_until_the_ttl_passes():
+    cache = AsyncTTLCache("test", ttl=0.1, stale_ttl=0)
+    upstream = Upstream()
+    assert await cache.get_or_fetch("k", upstream.fetch) == 1
+    assert await cache.get_or_fetch("k", upstream.fetch) == 1
+    await asyncio.sleep(0.12)
+    # Past ttl + stale_ttl: a plain miss
+    assert await cache.get_or_fetch("k", upstream.fetch) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.anyio
+async def test_stale_entry_is_served_while_one_background_refresh_runs():
+    cache = AsyncTTLCache("test", ttl=0.05, stale_ttl=10)
+    upstream = Upstream(delay=0.1)
+    assert await cache.get_or_fetch("k", upstream.fetch) == 1
+    await asyncio.sleep(0.06)
+
+    stale = await asyncio.gather(*(cache.get_or_fetch("k", upstream.fetch) for _ in range(5)))
+    assert stale == [1] * 5
+    assert cache.stats()["stale_hits"] == 5
+    assert cache.stats()["in_flight"] == 1
+
+    await asyncio.sleep(0.15)
+    assert upstream.calls == 2
+    assert await cache.get_or_fetch("k", upstream.fetch) == 2
+
+
+@pytest.mark.anyio
+async def test_failed_refresh_keeps_the_stale_value():
+    cache = AsyncTTLCache("test", ttl=0.01, stale_ttl=10)
+    assert await cache.get_or_fetch("k", Upstream().fetch) == 1
+    await asyncio.sleep(0.02)
+
+    async def broken() -> int:
+        raise RuntimeError("Gaia is down")
+
+    assert await cache.get_or_fetch("k", broken) == 1
+    await asyncio.sleep(0.01)
+    assert cache.stats()["refresh_errors"] == 1
+    assert await cache.get_or_fetch("k", broken) == 1
+
+
+@pytest.mark.anyio
+async def test_least_recently_used_entry_is_evicted():
+    cache = AsyncTTLCache("test", maxsize=2)
+    upstream = Upstream()
+    await cache.get_or_fetch("a", upstream.fetch)
+    await cache.get_or_fetch("b", upstream.fetch)
+    # Touch a, so b is the least recently used
+    await cache.get_or_fetch("a", upstream.fetch)
+    await cache.get_or_fetch("c", upstream.fetch)
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    calls = upstream.calls
+    await cache.get_or_fetch("a", upstream.fetch)
+    assert upstream.calls == calls
+    await cache.get_or_fetch("b", upstream.fetch)
+    assert upstream.calls == calls + 1
+
+
+@pytest.mark.anyio
+async def test_dataset_listing_is_cached_and_refresh_bypasses_it(gaia):
+    app = await gaia(datasets=3)
+    first = await gaia_service.get_datasets()
+    assert await gaia_service.get_datasets() == first
+    assert app.state.requests[DATASETS] == 1
+
+    assert len(await gaia_service.get_datasets(refresh=True)) == 3
+    assert app.state.requests[DATASETS] == 2